@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import InventoryItem, InventoryChangeLog
+from django.db import transaction
+from .services import apply_bulk
+from .models import (
+    Category, InventoryItem, InventoryChangeLog, InventoryChangeRollup, InventoryCheckpoint, CategoryThreshold, StockAlert,
+)
 
 # Admin configuration for InventoryItem
 # Controls how inventory items are displayed & managed in django Admin
@@ -8,12 +12,103 @@ class InventoryItemAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'owner', 'quantity', 'price', 'category', 'last_updated')
     list_filter = ('category', 'owner')
     search_fields = ('name', 'description', 'category', 'owner__username')
+    list_select_related = ('owner',)
     ordering = ('-last_updated',)
 
+    def get_readonly_fields(self, request, obj=None):
+        # moving an item to another owner isn't a write the services know how to count
+        return ('owner',) if obj is not None else ()
+
+    # saves and deletes go through the same write path as the API (inventory/services.py):
+    # categories, summary counters, thresholds and alerts, change log, cache and events
+    def save_model(self, request, obj, form, change):
+        data = {name: form.cleaned_data[name] for name in form.changed_data if name != 'owner'}
+        if change:
+            _, updated, _ = apply_bulk(obj.owner, updates=[(obj, data)], changed_by=request.user)
+            item = updated[0]
+        else:
+            fields = {name: value for name, value in form.cleaned_data.items() if name != 'owner'}
+            created, _, _ = apply_bulk(obj.owner, creates=[fields], changed_by=request.user)
+            item = created[0]
+        # the admin goes on with `obj` (messages, redirect, log entry)
+        for field in InventoryItem._meta.concrete_fields:
+            setattr(obj, field.attname, getattr(item, field.attname))
+        obj._state.adding = False
+
+    def delete_model(self, request, obj):
+        apply_bulk(obj.owner, deletes=[obj], changed_by=request.user)
+
+    def delete_queryset(self, request, queryset):
+        # the "delete selected" action, one batch per owner
+        owners = {}
+        for item in queryset.select_related('owner'):
+            owners.setdefault(item.owner_id, []).append(item)
+        with transaction.atomic():
+            for items in owners.values():
+                apply_bulk(items[0].owner, deletes=items, changed_by=request.user)
+
+# Item categories (read-only, created from the items' category strings)
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'full_name', 'owner', 'item_count')
+    list_filter = ('owner',)
+    search_fields = ('full_name', 'owner__username')
+    list_select_related = ('owner',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # Admin configuration for InventoryChangeLog
 @admin.register(InventoryChangeLog)
 class InventoryChangeLogAdmin(admin.ModelAdmin):
     list_display = ('id', 'item', 'changed_by', 'old_quantity', 'new_quantity', 'change_type', 'change_date')
     list_filter = ('change_type', 'changed_by')
     search_fields = ('item__name', 'changed_by__username')
+    # item (its __str__ is the name) and changed_by are shown on every row
+    list_select_related = ('item', 'changed_by')
     ordering = ('-change_date',)
+
+# Daily rollups of the pruned change history (read-only, written by rollup_changes)
+@admin.register(InventoryChangeRollup)
+class InventoryChangeRollupAdmin(admin.ModelAdmin):
+    list_display = ('id', 'item', 'owner', 'day', 'opening_quantity', 'closing_quantity', 'net_change', 'change_count')
+    list_filter = ('owner',)
+    list_select_related = ('item', 'owner')
+    ordering = ('-day', '-id')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# Point-in-time checkpoints (written by build_snapshots)
+@admin.register(InventoryCheckpoint)
+class InventoryCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('id', 'owner', 'taken_at', 'item_count')
+    list_filter = ('owner',)
+    list_select_related = ('owner',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# Admin configuration for the reorder thresholds and the alert feed
+@admin.register(CategoryThreshold)
+class CategoryThresholdAdmin(admin.ModelAdmin):
+    list_display = ('id', 'owner', 'category', 'threshold')
+    list_filter = ('owner',)
+    list_select_related = ('owner',)
+
+
+@admin.register(StockAlert)
+class StockAlertAdmin(admin.ModelAdmin):
+    list_display = ('id', 'item', 'owner', 'kind', 'quantity', 'threshold', 'created_at')
+    list_filter = ('kind', 'owner')
+    list_select_related = ('item', 'owner')
+    ordering = ('-id',)
@@ -0,0 +1,212 @@
+from datetime import date, timedelta
+from itertools import accumulate
+from operator import sub
+from django.db.models import Case, Count, F, IntegerField, Max, Q, Sum, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from .categories import category_key
+from .models import InventoryItem, InventoryChangeRollup
+from .rollups import day_bounds
+
+# Stock movement analytics (/api/changes/analytics/)
+# Bucketing and per-bucket sums run in SQL (GROUP BY key, bucket), so only one row
+# per series and bucket reaches Python, however long the change log. The rolling
+# math then works on dense per-series arrays: moving averages come from prefix sums
+# (one pass, whatever the window) instead of re-summing every window.
+
+# bucket size in days
+BUCKETS = {'day': 1, 'week': 7}
+GROUPS = {'item': 'item_id', 'category': 'item__category'}
+METRICS = ('sold', 'restocked', 'net', 'sales', 'restocks')
+DEFAULT_DAYS = 90
+DEFAULT_WINDOW = 7
+MAX_BUCKETS = 400
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+# since/until range: the default period, the Monday before `since` and the end of
+# `until` (in any timezone) must all stay within what date and datetime can hold
+EARLIEST_DATE = date(1900, 1, 1)
+LATEST_DATE = date(9999, 12, 30)
+
+
+def moving_average(values, window):
+    # trailing mean over `window` buckets (fewer at the start), from prefix sums
+    prefix = [0, *accumulate(values)]
+    head = [total / count for count, total in enumerate(prefix[1:window + 1], 1)]
+    tail = [total / window for total in map(sub, prefix[window + 1:], prefix[1:len(values) - window + 1])]
+    return head + tail
+
+
+def bucket_starts(since, until, bucket):
+    # local start day of every bucket, weeks start on Monday
+    first = since - timedelta(days=since.weekday()) if bucket == 'week' else since
+    return [first + timedelta(days=offset) for offset in range(0, (until - first).days + 1, BUCKETS[bucket])]
+
+
+def bucket_bounds(starts, until):
+    # local midnight of every bucket start as an aware datetime, then the end of `until`
+    return [day_bounds(start)[0] for start in starts] + [day_bounds(until)[1]]
+
+
+def bucket_index(bounds, low=0, high=None):
+    # position of change_date between the bounds, as a balanced CASE tree: log2(buckets)
+    # plain comparisons per row, exact across DST changes and the same on every database
+    # (Trunc* runs a Python function per row on SQLite, ~8x slower here)
+    if high is None:
+        high = len(bounds) - 1
+    if high - low == 1:
+        return Value(low)
+    middle = (low + high) // 2
+    return Case(
+        When(change_date__lt=bounds[middle], then=bucket_index(bounds, low, middle)),
+        default=bucket_index(bounds, middle, high),
+        output_field=IntegerField(),
+    )
+
+
+def bucket_totals(changes, bounds, group):
+    # one row per (series key, bucket position) with the movement sums of that bucket
+    delta = F('new_quantity') - F('old_quantity')
+    return (
+        changes.filter(change_date__gte=bounds[0], change_date__lt=bounds[-1])
+        .order_by()
+        .annotate(bucket=bucket_index(bounds))
+        .values_list(GROUPS[group], 'bucket')
+        .annotate(
+            sold=Sum(-delta, filter=Q(change_type='sale')),
+            restocked=Sum(delta, filter=Q(change_type='restock')),
+            net=Sum(delta),
+            sales=Count('id', filter=Q(change_type='sale')),
+            restocks=Count('id', filter=Q(change_type='restock')),
+        )
+    )
+
+
+def dense_series(rows, size):
+    # {key: {metric: [value per bucket]}}, zeros for buckets without changes
+    series = {}
+    for key, position, *values in rows:
+        arrays = series.get(key)
+        if arrays is None:
+            arrays = series[key] = {metric: [0] * size for metric in METRICS}
+        for metric, value in zip(METRICS, values):
+            arrays[metric][position] = value or 0
+    return series
+
+
+def on_hand(user, group, keys, category=None):
+    items = InventoryItem.objects.filter(owner=user)
+    if category is not None:
+        items = items.filter(category_node__key=category_key(category))
+    if group == 'item':
+        return dict(items.filter(id__in=keys).values_list('id', 'quantity'))
+    return dict(items.filter(category__in=keys).order_by().values_list('category').annotate(Sum('quantity')))
+
+
+def summarize(arrays, starts, quantity, days_per_bucket, window, period_days, today):
+    sold_avg = moving_average(arrays['sold'], window)
+    # units per day over the last `window` buckets
+    velocity = sold_avg[-1] / days_per_bucket if sold_avg else 0.0
+    days_of_cover = quantity / velocity if velocity > 0 else None
+    # no stockout date past the calendar (a trickle of sales against a large stock)
+    stockout_date = None
+    if days_of_cover is not None and days_of_cover < (date.max - today).days:
+        stockout_date = today + timedelta(days=int(days_of_cover))
+    return {
+        'quantity': quantity,
+        'sold': sum(arrays['sold']),
+        'restocked': sum(arrays['restocked']),
+        'sales': sum(arrays['sales']),
+        'restocks': sum(arrays['restocks']),
+        'velocity': round(velocity, 3),
+        'restocks_per_week': round(sum(arrays['restocks']) * 7 / period_days, 3),
+        'days_of_cover': round(days_of_cover, 1) if days_of_cover is not None else None,
+        'stockout_date': stockout_date,
+        'buckets': [
+            {'start': start, **{metric: arrays[metric][position] for metric in METRICS},
+             'sold_avg': round(sold_avg[position], 3)}
+            for position, start in enumerate(starts)
+        ],
+    }
+
+
+def _param(params, name, choices=None, cast=None, default=None):
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    if choices is not None and value not in choices:
+        raise ValidationError({name: [f"Choose one of: {', '.join(choices)}."]})
+    if cast is not None:
+        try:
+            value = cast(value)
+        except ValueError:
+            value = None
+        if value is None:
+            raise ValidationError({name: ["Invalid value."]})
+    return value
+
+
+def _date_in_range(params, name, default):
+    day = _param(params, name, cast=parse_date, default=default)
+    if not EARLIEST_DATE <= day <= LATEST_DATE:
+        raise ValidationError({name: [f"Must be between {EARLIEST_DATE} and {LATEST_DATE}."]})
+    return day
+
+
+def _positive_int(value):
+    value = int(value)
+    return value if value > 0 else None
+
+
+def movement_analytics(user, changes, params):
+    """
+    Per-series (item or category) movement buckets and rolling statistics.
+
+    `changes` is the owner's change log queryset (already narrowed to ?item=);
+    the remaining query parameters are read from `params`.
+    """
+    bucket = _param(params, 'bucket', BUCKETS, default='day')
+    group = _param(params, 'group', GROUPS, default='item')
+    category = _param(params, 'category')
+    window = _param(params, 'window', cast=_positive_int, default=DEFAULT_WINDOW)
+    limit = min(_param(params, 'limit', cast=_positive_int, default=DEFAULT_LIMIT), MAX_LIMIT)
+    today = timezone.localdate()
+    until = _date_in_range(params, 'until', today)
+    since = _date_in_range(params, 'since', max(until - timedelta(days=DEFAULT_DAYS - 1), EARLIEST_DATE))
+    if since > until:
+        raise ValidationError({'since': ["Must not be after until."]})
+
+    starts = bucket_starts(since, until, bucket)
+    if len(starts) > MAX_BUCKETS:
+        raise ValidationError({'since': [f"At most {MAX_BUCKETS} {bucket} buckets per request."]})
+    # days rolled up by rollup_changes may have lost their detail rows, and the rollups
+    # don't keep the units sold and restocked: refuse rather than report no movement
+    rolled_up = InventoryChangeRollup.objects.filter(owner=user).aggregate(day=Max('day'))['day']
+    if rolled_up is not None and starts[0] <= rolled_up:
+        earliest = rolled_up + timedelta(days=1)
+        if bucket == 'week':
+            earliest += timedelta(days=-earliest.weekday() % 7)
+        raise ValidationError({'since': [
+            f"Movements up to {rolled_up} are only kept as daily rollups (/api/changes/daily/), "
+            f"use since={earliest} or later."
+        ]})
+
+    if category is not None:
+        # matched like item categories are written, "electronics " is Electronics
+        changes = changes.filter(item__category_node__key=category_key(category))
+    series = dense_series(bucket_totals(changes, bucket_bounds(starts, until), group), len(starts))
+    quantities = on_hand(user, group, list(series), category)
+
+    days_per_bucket = BUCKETS[bucket]
+    period_days = len(starts) * days_per_bucket
+    results = [
+        {group: key, **summarize(arrays, starts, quantities.get(key, 0), days_per_bucket, window, period_days, today)}
+        for key, arrays in series.items()
+    ]
+    # fastest movers first
+    results.sort(key=lambda row: (-row['velocity'], str(row[group])))
+    return {
+        'bucket': bucket, 'group': group, 'since': starts[0], 'until': until, 'window': window,
+        'count': len(results), 'results': results[:limit],
+    }
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        # registers the cache invalidation and SQLite tuning signal handlers
+        from . import authentication, cache, database  # noqa: F401
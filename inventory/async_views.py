@@ -0,0 +1,345 @@
+import asyncio
+import functools
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import path, reverse
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException, AuthenticationFailed, MethodNotAllowed, NotAuthenticated, NotFound, Throttled, ValidationError,
+)
+from rest_framework.request import Request
+from .authentication import aauthenticate, aauthenticate_token
+from .events import get_broker
+from .models import InventoryItem, InventorySummary, CategorySummary, StockAlert
+from .renderers import FastJSONRenderer
+from .rows import row_builder, ITEM_COLUMNS
+from .search import get_search_backend
+from .serializers import InventoryItemSerializer, InventorySummarySerializer, StockAlertSerializer
+from .throttling import ScopedBucketThrottle
+from .views import InventoryItemViewSet, InventoryLevelViewSet, InventoryChangeLogViewSet
+
+# Async (ASGI) read endpoints under /api/async/
+# Same responses as the DRF read endpoints (filters, ordering, search and keyset
+# pagination come from the viewsets), but the view awaits the database through
+# Django's async ORM instead of holding a worker thread for the whole request.
+# Under WSGI they still work, Django runs them in an event loop per request.
+
+renderer = FastJSONRenderer()
+
+ALERT_PAGE_SIZE = 100
+# long-poll limits (seconds)
+ALERT_MAX_WAIT = 30
+# without an event broker the feed polls the table; with one it wakes up on the owner's
+# alert events and only re-checks this often, for alerts written by another process
+ALERT_POLL_INTERVAL = 0.5
+ALERT_BROKER_POLL_INTERVAL = 5
+# EventSource reconnect delay (milliseconds) and the time a WebSocket client gets to send its token
+EVENT_RETRY_MS = 3000
+WEBSOCKET_AUTH_TIMEOUT = 10
+
+
+def _json(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(renderer.render(data), status=status_code, content_type='application/json')
+
+
+def _error(exc):
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = _json(data, exc.status_code)
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        response['WWW-Authenticate'] = 'Token'
+    if isinstance(exc, Throttled) and exc.wait is not None:
+        response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+def async_api_view(handler):
+    # GET only, authenticated, throttled like the DRF reads, DRF style errors
+    @functools.wraps(handler)
+    async def view(request, *args, **kwargs):
+        try:
+            if request.method != 'GET':
+                raise MethodNotAllowed(request.method)
+            user = await aauthenticate(request)
+            if user is None:
+                raise NotAuthenticated()
+            drf_request = Request(request)
+            drf_request.user = user
+            throttle = ScopedBucketThrottle()
+            # the counters may be in a shared (network) cache
+            if not await sync_to_async(throttle.allow_request)(drf_request, None):
+                raise Throttled(throttle.wait())
+            return _json(await handler(drf_request, *args, **kwargs))
+        except APIException as exc:
+            return _error(exc)
+    return view
+
+
+def _viewset(viewset_class, request, action, **kwargs):
+    return viewset_class(request=request, args=(), kwargs=kwargs, format_kwarg=None, action=action)
+
+
+async def _list(request, viewset_class, columns=None):
+    view = _viewset(viewset_class, request, 'list')
+    if request.query_params.get('search'):
+        # the backend checks once per process whether its index exists
+        await sync_to_async(get_search_backend)()
+    # ValuesListMixin viewsets pick their columns per request (e.g. ?as_of=), all of them honour ?fields=
+    builder = row_builder(view.get_serializer_class(), view.sparse_columns(columns or view.get_list_columns()))
+    if request.query_params.get('as_of'):
+        # ?as_of= looks the owner's checkpoint up while building the queryset
+        queryset = await sync_to_async(lambda: view.filter_queryset(view.get_queryset()))()
+    elif request.query_params.get('category') or request.query_params.get('category_tree'):
+        # the category filters look the category ids up while filtering
+        queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+    else:
+        queryset = view.filter_queryset(view.get_queryset())
+    queryset = builder.values(queryset, view.get_key_lookups(queryset))
+    page = await view.paginator.apaginate_queryset(queryset, request, view)
+    return view.paginator.get_paginated_response(builder.build(page)).data
+
+
+async def _item(request, pk, queryset=None, columns=ITEM_COLUMNS):
+    view = _viewset(InventoryItemViewSet, request, 'retrieve', pk=pk)
+    builder = row_builder(InventoryItemSerializer, view.sparse_columns(columns))
+    if queryset is None:
+        queryset = InventoryItem.objects.filter(owner=request.user)
+    try:
+        row = await builder.values(queryset).aget(pk=pk)
+    except InventoryItem.DoesNotExist:
+        raise NotFound(detail="Item not found.")
+    return builder.build([row])[0]
+
+
+@async_api_view
+async def item_list(request):
+    return await _list(request, InventoryItemViewSet, ITEM_COLUMNS)
+
+
+@async_api_view
+async def item_detail(request, pk):
+    return await _item(request, pk)
+
+
+@async_api_view
+async def inventory_level_list(request):
+    return await _list(request, InventoryLevelViewSet)
+
+
+@async_api_view
+async def inventory_level_detail(request, pk):
+    view = _viewset(InventoryLevelViewSet, request, 'retrieve', pk=pk)
+    # sync: ?as_of= looks the owner's checkpoint up
+    return await _item(request, pk, await sync_to_async(view.get_queryset)(), view.get_list_columns())
+
+
+@async_api_view
+async def inventory_summary(request):
+    user = request.user
+    summary = await InventorySummary.objects.filter(owner=user).afirst() or InventorySummary(owner=user)
+    categories = [row async for row in CategorySummary.objects.filter(owner=user, sku_count__gt=0).aiterator()]
+    return InventorySummarySerializer(summary, context={'categories': categories}).data
+
+
+@async_api_view
+async def change_list(request):
+    return await _list(request, InventoryChangeLogViewSet)
+
+
+def _query_number(request, name, default, cast):
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValidationError({name: ['A valid number is required.']})
+
+
+# Stock alert feed (/api/alerts/)
+# alerts with id > ?since=, oldest first. With ?wait=<seconds> an empty result is
+# held open until an alert arrives or the wait runs out (long poll); served as an
+# async view so a waiting client doesn't hold a worker thread under ASGI.
+@async_api_view
+async def alert_feed(request):
+    since = max(_query_number(request, 'since', 0, int), 0)
+    wait = min(max(_query_number(request, 'wait', 0, int), 0), ALERT_MAX_WAIT)
+    alerts = StockAlert.objects.filter(owner=request.user, id__gt=since).select_related('item').order_by('id')
+    broker = get_broker() if wait else None
+    # subscribed before the first query, so an alert committed in between still wakes us
+    subscription = broker.subscribe(request.user.pk) if broker is not None else None
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    try:
+        while True:
+            page = [alert async for alert in alerts[:ALERT_PAGE_SIZE + 1].aiterator()]
+            remaining = deadline - loop.time()
+            if page or remaining <= 0:
+                break
+            if subscription is None:
+                await asyncio.sleep(min(ALERT_POLL_INTERVAL, remaining))
+            else:
+                await _alert_published(subscription, min(ALERT_BROKER_POLL_INTERVAL, remaining))
+    finally:
+        if subscription is not None:
+            subscription.close()
+    results = page[:ALERT_PAGE_SIZE]
+    return {
+        # pass back as ?since= on the next call
+        'since': results[-1].id if results else since,
+        'has_more': len(page) > ALERT_PAGE_SIZE,
+        'results': StockAlertSerializer(results, many=True).data,
+    }
+
+
+async def _alert_published(subscription, timeout):
+    # until an alert (or reload) event arrives or `timeout` seconds pass, other events are skipped
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        events = await subscription.get(deadline - loop.time())
+        if not events or any(event.type in ('alert', 'reload') for event in events):
+            return
+
+
+async def sse_events(broker, owner_id, last_event_id, ttl):
+    # the owner's events as SSE text until `ttl` seconds have passed, with keep-alive comments
+    keepalive = getattr(settings, 'INVENTORY_EVENT_KEEPALIVE', 15)
+    subscription = broker.subscribe(owner_id, last_event_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + ttl
+    try:
+        yield f'retry: {EVENT_RETRY_MS}\n\n'
+        while True:
+            remaining = deadline - loop.time()
+            events = await subscription.get(min(keepalive, remaining))
+            if events:
+                yield ''.join(event.sse() for event in events)
+            elif remaining <= keepalive:
+                break
+            else:
+                yield ': keep-alive\n\n'
+    finally:
+        subscription.close()
+
+
+# Change event stream (/api/events/)
+# Server-Sent Events with the requesting owner's item, change log and alert events
+# (inventory/events.py); resume with the Last-Event-ID header, which EventSource sends
+# on reconnect, or ?last_event_id=. Under ASGI the stream ends after
+# INVENTORY_EVENT_STREAM_TTL seconds and the client reconnects: Django doesn't notice a
+# client that went away mid-stream, this bounds how long its coroutine lingers and
+# checks the token again. Under WSGI, which can't hold thousands of connections open,
+# the response is what is already buffered and the client polls at the retry interval.
+async def event_stream(request):
+    try:
+        if request.method != 'GET':
+            raise MethodNotAllowed(request.method)
+        user = await aauthenticate(request)
+        if user is None:
+            raise NotAuthenticated()
+        broker = get_broker()
+        if broker is None:
+            raise NotFound(detail="The event stream is disabled.")
+    except APIException as exc:
+        return _error(exc)
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    if hasattr(request, 'scope'):
+        ttl = getattr(settings, 'INVENTORY_EVENT_STREAM_TTL', 300)
+        response = StreamingHttpResponse(
+            sse_events(broker, user.pk, last_event_id, ttl), content_type='text/event-stream'
+        )
+    else:
+        chunks = [chunk async for chunk in sse_events(broker, user.pk, last_event_id, 0)]
+        response = HttpResponse(''.join(chunks), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # keep proxies (nginx) from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def _websocket_credentials(scope, receive):
+    # (token key, last event id) from the headers, or else from the first message
+    headers = dict(scope.get('headers', ()))
+    auth = headers.get(b'authorization', b'').decode().split()
+    if len(auth) == 2 and auth[0].lower() == 'token':
+        return auth[1], headers.get(b'last-event-id', b'').decode() or None
+    message = await asyncio.wait_for(receive(), WEBSOCKET_AUTH_TIMEOUT)
+    if message['type'] != 'websocket.receive':
+        raise AuthenticationFailed()
+    try:
+        data = json.loads(message.get('text') or message.get('bytes') or '')
+        return str(data['token']), data.get('last_event_id') or None
+    except (ValueError, TypeError, KeyError):
+        raise AuthenticationFailed()
+
+
+# WebSocket variant of the event stream (ws://.../api/events/ws/, routed by
+# inventory_project/asgi.py). Browsers can't set headers on a WebSocket, so the token
+# may come as the first message instead: {"token": "...", "last_event_id": "..."}.
+# Events go out as JSON text frames {"id": ..., "event": ..., "data": ...}. Unlike SSE
+# the disconnect is seen right away, but the token is checked again every
+# INVENTORY_EVENT_STREAM_TTL seconds (the SSE stream's lifetime): a revoked token or a
+# deactivated user closes the socket with 4401.
+async def websocket_events(scope, receive, send):
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    broker = get_broker()
+    if broker is None or scope['path'] != reverse('event-stream') + 'ws/':
+        # rejects the handshake
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+    await send({'type': 'websocket.accept'})
+    try:
+        key, last_event_id = await _websocket_credentials(scope, receive)
+        token = await aauthenticate_token(key)
+    except (AuthenticationFailed, asyncio.TimeoutError):
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+    finally:
+        # no request_finished signal outside the HTTP handler
+        await sync_to_async(close_old_connections)()
+
+    subscription = broker.subscribe(token.user_id, last_event_id)
+    ttl = getattr(settings, 'INVENTORY_EVENT_STREAM_TTL', 300)
+
+    async def pump():
+        while True:
+            for event in await subscription.get(None):
+                await send({'type': 'websocket.send', 'text': event.json()})
+
+    async def reauthenticate():
+        while True:
+            await asyncio.sleep(ttl)
+            try:
+                await aauthenticate_token(key)
+            except AuthenticationFailed:
+                await send({'type': 'websocket.close', 'code': 4401})
+                return
+            finally:
+                await sync_to_async(close_old_connections)()
+
+    async def disconnected():
+        # nothing is expected from the client after the token, wait for it to leave
+        while (await receive())['type'] != 'websocket.disconnect':
+            pass
+
+    tasks = [asyncio.ensure_future(task()) for task in (pump, reauthenticate, disconnected)]
+    try:
+        await asyncio.wait(tasks[1:], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        subscription.close()
+
+
+urlpatterns = [
+    path('items/', item_list, name='async-item-list'),
+    path('items/<int:pk>/', item_detail, name='async-item-detail'),
+    path('inventory-levels/', inventory_level_list, name='async-inventory-level-list'),
+    path('inventory-levels/summary/', inventory_summary, name='async-inventory-level-summary'),
+    path('inventory-levels/<int:pk>/', inventory_level_detail, name='async-inventory-level-detail'),
+    path('changes/', change_list, name='async-change-list'),
+]
@@ -0,0 +1,166 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user, get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.authtoken.models import Token
+
+# Token authentication without the per-request token query
+# TokenAuthentication runs a Token + User join on every API call. Resolved tokens are
+# kept in a bounded in-process LRU (short TTL) and optionally in the shared cache, so
+# only a miss reaches the database. Deleting a token (logout) or saving/deleting its
+# user (deactivation) evicts it right away and again once the transaction commits.
+#
+# The local tier of *other* processes can't be reached from here, it expires after
+# INVENTORY_TOKEN_CACHE_TTL seconds. Set it to 0 to rely on the shared tier only
+# when several workers must see a logout immediately.
+
+
+class TokenCache:
+
+    def __init__(self, max_size=1024, ttl=60, shared_alias=None, shared_ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self.shared_ttl = shared_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _shared_key(key):
+        # never put raw tokens in a shared cache
+        return 'inventory:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def _shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def get(self, key):
+        if self.ttl > 0:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    token, expires = entry
+                    if expires > time.monotonic():
+                        self._entries.move_to_end(key)
+                        return token
+                    del self._entries[key]
+        shared = self._shared()
+        if shared is not None:
+            token = shared.get(self._shared_key(key))
+            if token is not None:
+                self._set_local(key, token)
+                return token
+        return None
+
+    def set(self, key, token):
+        self._set_local(key, token)
+        shared = self._shared()
+        if shared is not None:
+            shared.set(self._shared_key(key), token, timeout=self.shared_ttl)
+
+    def _set_local(self, key, token):
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (token, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        shared = self._shared()
+        if shared is not None:
+            shared.delete(self._shared_key(key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache(
+    max_size=getattr(settings, 'INVENTORY_TOKEN_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'INVENTORY_TOKEN_CACHE_TTL', 60),
+    shared_alias=getattr(settings, 'INVENTORY_TOKEN_CACHE_SHARED', None) or None,
+    shared_ttl=getattr(settings, 'INVENTORY_TOKEN_CACHE_SHARED_TTL', 300),
+)
+
+
+def invalidate_token(key):
+    token_cache.delete(key)
+    # a request that read the token before the delete committed may have cached it again
+    transaction.on_commit(lambda: token_cache.delete(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None or not token.user.is_active:
+            # misses (and cached users that went inactive) take the regular path and its errors
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token)
+        return token.user, token
+
+
+async def aauthenticate(request):
+    """
+    Async counterpart of the API authentication classes, for async views.
+
+    Token header first, then the session; returns the user or None and raises
+    AuthenticationFailed with the same messages as TokenAuthentication.
+    """
+    auth = request.headers.get('Authorization', '').split()
+    if auth and auth[0].lower() == 'token':
+        if len(auth) == 1:
+            raise AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        if len(auth) > 2:
+            raise AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+        return (await aauthenticate_token(auth[1])).user
+    # sessions are read with the sync session store
+    user = await sync_to_async(get_user)(request)
+    return user if user.is_authenticated else None
+
+
+async def aauthenticate_token(key):
+    # the local tier is memory only, the shared one is a network call
+    token = await sync_to_async(token_cache.get)(key) if token_cache.shared_alias else token_cache.get(key)
+    if token is None or not token.user.is_active:
+        try:
+            token = await Token.objects.select_related('user').aget(key=key)
+        except Token.DoesNotExist:
+            raise AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        if token_cache.shared_alias:
+            await sync_to_async(token_cache.set)(key, token)
+        else:
+            token_cache.set(key, token)
+    return token
+
+
+@receiver(post_delete, sender=Token, dispatch_uid='inventory_token_deleted')
+def _token_deleted(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver([post_save, post_delete], sender=get_user_model(), dispatch_uid='inventory_token_user_changed')
+def _user_changed(sender, instance, created=False, **kwargs):
+    # deactivation, password or permission changes: drop the cached copy of the user
+    if created:
+        return
+    for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+        invalidate_token(key)
@@ -0,0 +1,27 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+# SQLite backend with OPTIONS['transaction_mode'] (built into Django from 5.1 on)
+# Django starts transactions with a plain (DEFERRED) BEGIN. A transaction that reads
+# and then writes, like an item update, only asks for the write lock at its first
+# write; if another connection committed in between, SQLite can't wait for the lock
+# and fails at once with "database is locked", whatever the busy timeout. With
+# IMMEDIATE every transaction takes the write lock at BEGIN and waits its turn there.
+class DatabaseWrapper(base.DatabaseWrapper):
+    transaction_mode = None
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        transaction_mode = kwargs.pop('transaction_mode', None)
+        if transaction_mode is not None and transaction_mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"settings.DATABASES OPTIONS['transaction_mode'] must be one of {', '.join(TRANSACTION_MODES)}."
+            )
+        self.transaction_mode = transaction_mode and transaction_mode.upper()
+        return kwargs
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}' if self.transaction_mode else 'BEGIN')
@@ -0,0 +1,887 @@
+import asyncio
+import io
+import itertools
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+import django
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.throttling import SimpleRateThrottle
+from .async_views import sse_events
+from .analytics import METRICS, bucket_bounds, bucket_starts, bucket_totals, dense_series, movement_analytics
+from .categories import resolve_categories
+from .changelog import ChangeLogWriter
+from .database import sqlite_pragma_statements
+from .events import LocalBroker
+from .importers import import_items, iter_rows
+from .models import Category, InventoryItem, InventoryChangeLog, InventoryChangeOutbox, LOW_STOCK_THRESHOLD
+from .renderers import FastJSONRenderer
+from .rows import row_builder, ITEM_COLUMNS, CHANGE_COLUMNS
+from .serializers import InventoryItemSerializer, InventoryChangeLogSerializer
+from .throttling import TokenBucketThrottle
+
+User = get_user_model()
+
+# Benchmark scenarios
+# Each scenario is a function taking the command options and returning a dict of
+# measurements; `python manage.py benchmark` runs them inside a rolled back
+# transaction and writes the results as JSON so runs can be compared.
+
+SCENARIOS = {}
+
+
+def scenario(name, description):
+    def register(func):
+        SCENARIOS[name] = (func, description)
+        return func
+    return register
+
+
+def measure(func, rounds=5, warmup=1):
+    # wall time statistics of `rounds` calls to func(), in milliseconds
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'rounds': rounds,
+        'min_ms': round(samples[0], 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'max_ms': round(samples[-1], 3),
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+    }
+
+
+def benchmark_user(prefix='bench'):
+    return User.objects.create_user(username=f'{prefix}-{uuid.uuid4().hex[:12]}', password=uuid.uuid4().hex)
+
+
+def synthetic_csv(rows, quantity_offset=0):
+    buffer = io.StringIO()
+    buffer.write('name,description,quantity,price,category\n')
+    for i in range(rows):
+        buffer.write(f'Item {i},Synthetic item number {i},{(i + quantity_offset) % 50},{(i % 500) + 0.99},Category {i % 20}\n')
+    buffer.seek(0)
+    return buffer
+
+
+@scenario('import', 'Bulk CSV import throughput (rows/second) for creates, updates and dry runs')
+def import_benchmark(options):
+    rows = options['rows']
+    user = benchmark_user()
+    results = {'rows': rows}
+    for label, offset, dry_run in (('dry_run', 0, True), ('create', 0, False), ('update', 7, False)):
+        result = import_items(user, iter_rows(synthetic_csv(rows, offset), 'csv'), dry_run=dry_run)
+        assert result.error_count == 0, result.errors
+        results[label] = {
+            'elapsed_seconds': round(result.elapsed, 3),
+            'rows_per_second': round(rows / result.elapsed, 1),
+        }
+    return results
+
+
+@scenario('serialization', 'Per-row cost of list serialization: ModelSerializer + JSONRenderer vs values() rows + FastJSONRenderer')
+def serialization_benchmark(options):
+    rows = options['rows']
+    user = benchmark_user()
+    import_items(user, iter_rows(synthetic_csv(rows), 'csv'))
+    items = InventoryItem.objects.filter(owner=user).order_by('-last_updated', '-id')
+    changes = InventoryChangeLog.objects.filter(item__owner=user).order_by('-change_date', '-id')
+
+    results = {'rows': rows}
+    for label, queryset, serializer_class, columns in (
+        ('inventory_levels', items, InventoryItemSerializer, ITEM_COLUMNS),
+        ('changes', changes, InventoryChangeLogSerializer, CHANGE_COLUMNS),
+    ):
+        instances = list(serializer_class.setup_eager_loading(queryset))
+        builder = row_builder(serializer_class, columns)
+        values = list(builder.values(queryset))
+        serialized = serializer_class(instances, many=True).data
+        built = builder.build(values)
+        assert JSONRenderer().render(serialized) == FastJSONRenderer().render(built)
+
+        timings = {
+            # object construction is included, both paths start from the database rows
+            'fetch_instances': measure(lambda: list(serializer_class.setup_eager_loading(queryset)), options['rounds']),
+            'fetch_values': measure(lambda: list(builder.values(queryset)), options['rounds']),
+            'model_serializer': measure(lambda: serializer_class(instances, many=True).data, options['rounds']),
+            'row_builder': measure(lambda: builder.build(values), options['rounds']),
+            'json_renderer': measure(lambda: JSONRenderer().render(serialized), options['rounds']),
+            'fast_json_renderer': measure(lambda: FastJSONRenderer().render(built), options['rounds']),
+        }
+        before = timings['fetch_instances']['median_ms'] + timings['model_serializer']['median_ms'] + timings['json_renderer']['median_ms']
+        after = timings['fetch_values']['median_ms'] + timings['row_builder']['median_ms'] + timings['fast_json_renderer']['median_ms']
+        results[label] = {
+            **timings,
+            'before_us_per_row': round(before * 1000 / rows, 3),
+            'after_us_per_row': round(after * 1000 / rows, 3),
+            'speedup': round(before / after, 2) if after else None,
+        }
+    return results
+
+
+def latency_stats(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 3),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 3),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+    }
+
+
+@contextmanager
+def in_process_requests():
+    # like the test client: keep the benchmark's connection (and its rolled back
+    # transaction) open across requests
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+    try:
+        yield
+    finally:
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+
+
+def wsgi_environ(method, url, headers, body=b''):
+    path, _, query = url.partition('?')
+    return {
+        'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr, 'wsgi.multithread': False,
+        'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(body)), 'wsgi.input': io.BytesIO(body),
+        **{'HTTP_' + name.upper().replace('-', '_'): value for name, value in headers.items()},
+    }
+
+
+def wsgi_request(handler, method, url, headers, data=None):
+    # (status code, body) of one request through the WSGI handler, JSON request body
+    statuses = []
+    body = json.dumps(data).encode() if data is not None else b''
+    response = handler(wsgi_environ(method, url, headers, body), lambda status, headers: statuses.append(status))
+    content = b''.join(response)
+    response.close()
+    return int(statuses[0].split()[0]), content
+
+
+def wsgi_load(url, headers, concurrency, total):
+    # one sync worker with one thread: concurrent arrivals queue behind each other
+    handler = WSGIHandler()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(0, total, concurrency):
+        batch_started = time.perf_counter()
+        for _ in range(concurrency):
+            status_code, _ = wsgi_request(handler, 'GET', url, headers)
+            assert status_code == 200, status_code
+            latencies.append(time.perf_counter() - batch_started)
+    return latency_stats(latencies, time.perf_counter() - started)
+
+
+def asgi_load(url, headers, concurrency, total):
+    # one ASGI worker (one event loop) with `concurrency` requests in flight
+    handler = ASGIHandler()
+    path, _, query = url.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver')] + [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+
+    async def request():
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        statuses = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()  # the client never disconnects
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        started = time.perf_counter()
+        await handler(dict(scope), receive, send)
+        assert statuses == [200], statuses
+        return time.perf_counter() - started
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited():
+            async with semaphore:
+                return await request()
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*[limited() for _ in range(total)])
+        return latency_stats(latencies, time.perf_counter() - started)
+
+    return async_to_sync(run)()
+
+
+@scenario('asgi', 'Concurrent item list requests on one worker: WSGI vs sync views under ASGI vs the /api/async/ views')
+def asgi_benchmark(options):
+    user = benchmark_user()
+    import_items(user, iter_rows(synthetic_csv(min(options['rows'], 10000)), 'csv'))
+    headers = {'Authorization': 'Token ' + Token.objects.create(user=user).key}
+    total = options['rounds'] * 40
+    results = {'requests_per_level': total}
+    with in_process_requests():
+        for concurrency in (1, 10, 50):
+            results[f'concurrency_{concurrency}'] = {
+                'wsgi': wsgi_load('/api/items/?page_size=50', headers, concurrency, total),
+                'asgi_sync_view': asgi_load('/api/items/?page_size=50', headers, concurrency, total),
+                'asgi_async_view': asgi_load('/api/async/items/?page_size=50', headers, concurrency, total),
+            }
+    return results
+
+
+def random_changes(rng, item_ids, user_id, rows, days=90):
+    # (item_id, changed_by_id, old, new, change_type, change_date) rows spread over the last `days` days
+    now = timezone.now()
+    for _ in range(rows):
+        old = rng.randint(0, 100)
+        change_type = rng.choice(('sale', 'sale', 'sale', 'restock', 'adjustment'))
+        new = old - rng.randint(1, 5) if change_type == 'sale' else old + rng.randint(1, 20)
+        yield rng.choice(item_ids), user_id, old, new, change_type, now - timedelta(seconds=rng.randint(0, days * 86400))
+
+
+def insert_changes(rows, chunk_size=20000):
+    # plain executemany INSERTs: millions of rows without building a model instance per row
+    # (rows: (item_id, changed_by_id, old_quantity, new_quantity, change_type, change_date))
+    sql = (
+        f'INSERT INTO {InventoryChangeLog._meta.db_table} '
+        '(item_id, changed_by_id, old_quantity, new_quantity, change_type, change_date) VALUES (%s, %s, %s, %s, %s, %s)'
+    )
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while batch := [
+            (*row[:5], connection.ops.adapt_datetimefield_value(row[5])) for row in itertools.islice(rows, chunk_size)
+        ]:
+            cursor.executemany(sql, batch)
+
+
+def synthetic_changes(user, rows, days=90):
+    # `rows` change log rows spread over the last `days` days, on rows // 1000 items
+    items = InventoryItem.objects.bulk_create([
+        InventoryItem(owner=user, name=f'Item {i}', quantity=100, price=1, category=f'Category {i % 20}')
+        for i in range(max(rows // 1000, 10))
+    ])
+    item_ids = [item.id for item in items]
+    insert_changes(random_changes(random.Random(42), item_ids, user.pk, rows, days))
+    return item_ids
+
+
+def python_movement_totals(changes, starts, window):
+    # the per-row baseline: every change through Python, every window re-summed
+    index = {start: position for position, start in enumerate(starts)}
+    series = {}
+    for item_id, change_date, change_type, old, new in changes.values_list(
+            'item_id', 'change_date', 'change_type', 'old_quantity', 'new_quantity').iterator(chunk_size=10000):
+        arrays = series.setdefault(item_id, {metric: [0] * len(starts) for metric in METRICS})
+        position = index[timezone.localdate(change_date)]
+        arrays['net'][position] += new - old
+        if change_type == 'sale':
+            arrays['sold'][position] += old - new
+            arrays['sales'][position] += 1
+        elif change_type == 'restock':
+            arrays['restocked'][position] += new - old
+            arrays['restocks'][position] += 1
+    for arrays in series.values():
+        sold = arrays['sold']
+        arrays['sold_avg'] = [sum(sold[max(0, i - window + 1):i + 1]) / min(i + 1, window) for i in range(len(sold))]
+    return series
+
+
+@scenario('analytics', 'Movement analytics over a --rows change log: per-row Python vs SQL buckets + prefix-sum windows')
+def analytics_benchmark(options):
+    rows = options['rows']
+    user = benchmark_user()
+    started = time.perf_counter()
+    synthetic_changes(user, rows)
+    setup_seconds = time.perf_counter() - started
+
+    changes = InventoryChangeLog.objects.filter(item__owner=user)
+    until = timezone.localdate()
+    since = until - timedelta(days=89)
+    starts = bucket_starts(since, until, 'day')
+    bounds = bucket_bounds(starts, until)
+    in_range = changes.filter(change_date__gte=bounds[0])
+    params = {'since': since.isoformat(), 'until': until.isoformat(), 'window': '7', 'limit': '500'}
+
+    # same numbers both ways
+    expected = python_movement_totals(in_range, starts, 7)
+    actual = dense_series(bucket_totals(changes, bounds, 'item'), len(starts))
+    assert all(actual[key][metric] == expected[key][metric] for key in expected for metric in METRICS)
+
+    rounds = options['rounds']
+    results = {
+        'rows': rows,
+        'setup_seconds': round(setup_seconds, 2),
+        'python_per_row': measure(lambda: python_movement_totals(in_range, starts, 7), rounds),
+        'sql_buckets': measure(lambda: dense_series(bucket_totals(changes, bounds, 'item'), len(starts)), rounds),
+        'endpoint_item_day': measure(lambda: movement_analytics(user, changes, params), rounds),
+        'endpoint_category_week': measure(
+            lambda: movement_analytics(user, changes, {**params, 'group': 'category', 'bucket': 'week'}), rounds
+        ),
+    }
+    results['speedup'] = round(results['python_per_row']['median_ms'] / results['endpoint_item_day']['median_ms'], 2)
+    return results
+
+
+
+@scenario('events', 'Change event stream: memory and idle CPU of --rows open SSE streams, publish-to-delivery latency, vs dashboards polling the item list')
+def events_benchmark(options):
+    streams = options['rows']
+    owners = max(streams // 100, 1)
+    broker = LocalBroker()
+
+    async def run():
+        received = {}
+
+        async def client(number):
+            owner_id = number % owners
+            async for chunk in sse_events(broker, owner_id, None, ttl=3600):
+                if chunk.startswith('id: '):
+                    received.setdefault(chunk, []).append(time.perf_counter())
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        tasks = [asyncio.ensure_future(client(number)) for number in range(streams)]
+        await asyncio.sleep(0.5)
+        memory = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        # nothing happens: the streams are suspended on their queues
+        cpu = time.process_time()
+        await asyncio.sleep(1)
+        idle_cpu = time.process_time() - cpu
+
+        # one write of owner 0, from a worker thread like a sync view's on_commit
+        latencies = []
+        for _ in range(options['rounds']):
+            received.clear()
+            started = time.perf_counter()
+            await asyncio.to_thread(broker.publish, 0, [('item', '{"id":1}')])
+            while sum(map(len, received.values())) < streams // owners:
+                await asyncio.sleep(0.001)
+            latencies.append(max(max(times) for times in received.values()) - started)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return memory, idle_cpu, latencies
+
+    memory, idle_cpu, latencies = async_to_sync(run)()
+    assert broker.subscriber_count() == 0
+
+    # the alternative: every dashboard re-fetching the item list on a timer
+    user = benchmark_user()
+    import_items(user, iter_rows(synthetic_csv(50), 'csv'))
+    headers = {'Authorization': 'Token ' + Token.objects.create(user=user).key}
+    with in_process_requests():
+        poll = wsgi_load('/api/items/?page_size=50', headers, 1, options['rounds'] * 20)
+    return {
+        'streams': streams,
+        'owners': owners,
+        'bytes_per_idle_stream': round(memory / streams),
+        'idle_cpu_seconds_per_second': round(idle_cpu, 4),
+        'publish_to_delivery_ms': {
+            'subscribers': streams // owners,
+            'median': round(statistics.median(latencies) * 1000, 3),
+            'max': round(max(latencies) * 1000, 3),
+        },
+        'polling_request_p50_ms': poll['p50_ms'],
+        # CPU seconds per second if every stream were a dashboard polling every 5 seconds
+        'polling_5s_cpu_seconds_per_second': round(streams / 5 * poll['p50_ms'] / 1000, 2),
+    }
+
+
+SEED_PASSWORD = 'benchmark-password'
+SEED_WORDS = (
+    'stapler', 'widget', 'cable', 'monitor', 'chair', 'lamp', 'notebook', 'printer', 'keyboard', 'bracket',
+    'drill', 'battery', 'charger', 'router', 'desk', 'marker',
+)
+
+
+def seed_dataset(users, items_per_user, changes_per_item, prefix='seed'):
+    """
+    Synthetic dataset: `users` accounts x `items_per_user` items x about
+    `changes_per_item` change log rows per item, bulk inserted.
+
+    Every account has the password SEED_PASSWORD and an API token; the summary
+    counters and low stock flags match the items. Returns the users.
+    """
+    tag = uuid.uuid4().hex[:8]
+    # hashing is deliberately slow, one hash serves every account
+    password = make_password(SEED_PASSWORD)
+    accounts = User.objects.bulk_create([User(username=f'{prefix}-{tag}-{n}', password=password) for n in range(users)])
+    Token.objects.bulk_create([Token(user=account, key=Token.generate_key()) for account in accounts])
+    rng = random.Random(42)
+    for account in accounts:
+        categories = resolve_categories(account.pk, [f'Category {n}' for n in range(20)])
+        items = []
+        for i in range(items_per_user):
+            quantity = rng.randint(0, 60)
+            word = rng.choice(SEED_WORDS)
+            items.append(InventoryItem(
+                owner=account, name=f'{word.title()} {i}', description=f'{rng.choice(SEED_WORDS)} for {word} {i}',
+                quantity=quantity, price=f'{rng.randint(1, 50000) / 100:.2f}', category=f'Category {i % 20}',
+                category_node=categories[f'Category {i % 20}'], below_threshold=quantity < LOW_STOCK_THRESHOLD,
+            ))
+        item_ids = [item.id for item in InventoryItem.objects.bulk_create(items, batch_size=2000)]
+        if item_ids and changes_per_item:
+            insert_changes(random_changes(rng, item_ids, account.pk, len(item_ids) * changes_per_item))
+        call_command('rebuild_inventory_summary', owner=account.username, stdout=io.StringIO())
+    return accounts
+
+
+def timed_requests(handler, calls, expected_status):
+    # calls: (method, url, headers, data); latency stats of running them one after another
+    latencies = []
+    bodies = []
+    started = time.perf_counter()
+    for method, url, headers, data in calls:
+        request_started = time.perf_counter()
+        status_code, content = wsgi_request(handler, method, url, headers, data)
+        latencies.append(time.perf_counter() - request_started)
+        assert status_code == expected_status, (method, url, status_code, content[:200])
+        bodies.append(content)
+    return latency_stats(latencies, time.perf_counter() - started), bodies
+
+
+def query_time(handler, url, headers, rounds):
+    # micro-benchmark of the SQL behind one GET: the request's statements re-run on
+    # their own, without the HTTP, auth, serialization and rendering around them
+    with CaptureQueriesContext(connection) as queries:
+        status_code, _ = wsgi_request(handler, 'GET', url, headers)
+    assert status_code == 200, (url, status_code)
+    statements = [query['sql'] for query in queries.captured_queries]
+
+    def run():
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+                cursor.fetchall()
+    return {'queries': len(statements), **measure(run, rounds)}
+
+
+# read endpoints of the endpoints scenario, {item} is an item of the benchmark user
+READ_ENDPOINTS = (
+    ('items_list', '/api/items/'),
+    ('items_retrieve', '/api/items/{item}/'),
+    ('items_min_price', '/api/items/?min_price=400'),
+    ('items_max_price', '/api/items/?max_price=10'),
+    ('items_price_range', '/api/items/?min_price=100&max_price=120'),
+    ('items_low_stock', '/api/items/?low_stock=true'),
+    ('items_category', '/api/items/?category=Category%207'),
+    ('items_search', '/api/items/?search=stapler'),
+    ('items_order_price', '/api/items/?ordering=-price'),
+    ('items_order_name', '/api/items/?ordering=name'),
+    ('items_order_quantity', '/api/items/?ordering=quantity'),
+    ('changes_list', '/api/changes/'),
+    ('changes_item_history', '/api/changes/?item={item}'),
+    ('inventory_levels', '/api/inventory-levels/'),
+    ('inventory_levels_summary', '/api/inventory-levels/summary/'),
+)
+
+
+@scenario('endpoints', 'Latency/throughput of every API endpoint (CRUD, filters, search, ordering, changes, levels, login, register) on a seeded --users x --items x --changes dataset')
+def endpoints_benchmark(options):
+    started = time.perf_counter()
+    users = seed_dataset(options['users'], options['items'], options['changes'])
+    setup_seconds = time.perf_counter() - started
+    user = users[0]
+    headers = {'Authorization': 'Token ' + user.auth_token.key}
+    item_ids = list(InventoryItem.objects.filter(owner=user).values_list('id', flat=True)[:100])
+    total = options['rounds'] * 20
+    handler = WSGIHandler()
+
+    results = {
+        'dataset': {
+            'users': options['users'], 'items_per_user': options['items'], 'changes_per_item': options['changes'],
+            'setup_seconds': round(setup_seconds, 2),
+        },
+        'requests_per_endpoint': total,
+    }
+    with in_process_requests():
+        for name, url in READ_ENDPOINTS:
+            calls = [('GET', url.format(item=item_ids[i % len(item_ids)]), headers, None) for i in range(total)]
+            stats, _ = timed_requests(handler, calls, 200)
+            results[name] = {**stats, 'sql': query_time(handler, calls[0][1], headers, options['rounds'])}
+
+        # CRUD on items created here
+        stats, bodies = timed_requests(handler, [
+            ('POST', '/api/items/', headers, {'name': f'Bench item {i}', 'quantity': 10, 'price': '9.99', 'category': 'Bench'})
+            for i in range(total)
+        ], 201)
+        results['items_create'] = stats
+        created = [json.loads(body)['id'] for body in bodies]
+        results['items_update'], _ = timed_requests(handler, [
+            ('PATCH', f'/api/items/{pk}/', headers, {'quantity': 3}) for pk in created
+        ], 200)
+        results['items_replace'], _ = timed_requests(handler, [
+            ('PUT', f'/api/items/{pk}/', headers, {'name': f'Bench item {pk}', 'quantity': 12, 'price': '8.50', 'category': 'Bench'})
+            for pk in created
+        ], 200)
+        results['items_delete'], _ = timed_requests(handler, [
+            ('DELETE', f'/api/items/{pk}/', headers, None) for pk in created
+        ], 204)
+
+        # password hashing dominates both, fewer rounds
+        results['login'], _ = timed_requests(handler, [
+            ('POST', '/api/login/', {}, {'username': users[i % len(users)].username, 'password': SEED_PASSWORD})
+            for i in range(options['rounds'])
+        ], 200)
+        tag = uuid.uuid4().hex[:8]
+        results['register'], _ = timed_requests(handler, [
+            ('POST', '/api/register/', {}, {'username': f'new-{tag}-{i}', 'email': f'new-{tag}-{i}@example.com', 'password': SEED_PASSWORD})
+            for i in range(options['rounds'])
+        ], 201)
+    return results
+
+
+# Regression check between two result files (benchmark --compare)
+# only the central latency figures: the median of measure() and the p50 of request runs
+COMPARED_METRICS = ('median_ms', 'p50_ms')
+
+
+def flatten_results(results, prefix=''):
+    for key, value in results.items():
+        path = f'{prefix}.{key}' if prefix else key
+        if isinstance(value, dict):
+            yield from flatten_results(value, path)
+        elif key in COMPARED_METRICS and isinstance(value, (int, float)):
+            yield path, value
+
+
+def compare_results(baseline, current, tolerance):
+    """
+    Latency metrics of `current` that got slower than `baseline` by more than
+    `tolerance` (0.25 = 25%). Returns (metric path, baseline, current) tuples.
+    """
+    before = dict(flatten_results(baseline.get('results', {})))
+    return [
+        (path, before[path], value)
+        for path, value in flatten_results(current.get('results', {}))
+        if path in before and before[path] > 0 and value > before[path] * (1 + tolerance)
+    ]
+
+
+# SQLite profiles of the concurrent_writes scenario
+SQLITE_WRITE_PROFILES = {
+    # what Django gives you out of the box: rollback journal, DEFERRED transactions, 5 s busy timeout
+    'default': ({'busy_timeout': 5000, 'journal_mode': 'delete', 'synchronous': 'full'}, 'BEGIN'),
+    # settings.INVENTORY_SQLITE_PRAGMAS alone: writers that read first still fail on the lock upgrade
+    'pragmas_only': (None, 'BEGIN'),
+    # settings.INVENTORY_SQLITE_PRAGMAS + OPTIONS transaction_mode
+    'tuned': (None, 'BEGIN IMMEDIATE'),
+}
+
+
+def sqlite_write_load(path, pragmas, begin, writers, readers, duration, items=1000):
+    # `writers` threads running perform_update shaped transactions (read the row, update it,
+    # log the change, bump the summary) and `readers` threads reading a list page, for `duration` seconds
+    def connect():
+        # like Django: autocommit, transactions started explicitly, sqlite3's default 5 s timeout
+        db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        try:
+            for statement in sqlite_pragma_statements(pragmas):
+                db.execute(statement)
+        except sqlite3.OperationalError:
+            # the PRAGMAs need a lock too, a thread that can't get one drops out
+            with lock:
+                counts['locked_errors'] += 1
+            db.close()
+            return None
+        return db
+
+    stop = time.perf_counter() + duration
+    counts = {'writes': 0, 'locked_errors': 0, 'reads': 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def writer(seed):
+        db = connect()
+        if db is None:
+            return
+        rng = random.Random(seed)
+        while time.perf_counter() < stop:
+            item_id = rng.randint(1, items)
+            started = time.perf_counter()
+            try:
+                db.execute(begin)
+                (quantity,) = db.execute('SELECT quantity FROM item WHERE id = ?', (item_id,)).fetchone()
+                db.execute('UPDATE item SET quantity = ?, last_updated = ? WHERE id = ?', (quantity + 1, time.time(), item_id))
+                db.execute('INSERT INTO change_log (item_id, old_quantity, new_quantity, change_date) VALUES (?, ?, ?, ?)',
+                           (item_id, quantity, quantity + 1, time.time()))
+                db.execute('UPDATE summary SET total_units = total_units + 1 WHERE id = 1')
+                db.execute('COMMIT')
+                outcome = 'writes'
+            except sqlite3.OperationalError:
+                if db.in_transaction:
+                    db.execute('ROLLBACK')
+                outcome = 'locked_errors'
+            with lock:
+                counts[outcome] += 1
+                if outcome == 'writes':
+                    latencies.append(time.perf_counter() - started)
+        db.close()
+
+    def reader():
+        db = connect()
+        if db is None:
+            return
+        while time.perf_counter() < stop:
+            try:
+                db.execute('SELECT id, quantity FROM item ORDER BY last_updated DESC LIMIT 50').fetchall()
+                with lock:
+                    counts['reads'] += 1
+            except sqlite3.OperationalError:
+                with lock:
+                    counts['locked_errors'] += 1
+        db.close()
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = latency_stats(latencies, duration) if latencies else {}
+    return {
+        'writes_per_second': round(counts['writes'] / duration, 1),
+        'reads_per_second': round(counts['reads'] / duration, 1),
+        'locked_errors': counts['locked_errors'],
+        'write_p50_ms': stats.get('p50_ms'),
+        'write_p99_ms': stats.get('p99_ms'),
+    }
+
+
+@scenario('concurrent_writes', 'Concurrent item updates + list reads on a scratch SQLite file: Django\'s SQLite defaults vs the tuned profile')
+def concurrent_writes_benchmark(options):
+    # a scratch database file: the writers need committed data and their own connections,
+    # which the command's rolled back transaction can't give them
+    duration = max(options['rounds'] * 0.4, 1)
+    results = {'seconds_per_run': duration, 'readers': 4}
+    for name, (pragmas, begin) in SQLITE_WRITE_PROFILES.items():
+        pragmas = pragmas if pragmas is not None else settings.INVENTORY_SQLITE_PRAGMAS
+        results[name] = {'pragmas': pragmas, 'begin': begin}
+        for writers in (1, 4, 16):
+            with tempfile.TemporaryDirectory() as directory:
+                path = f'{directory}/bench.sqlite3'
+                db = sqlite3.connect(path, isolation_level=None)
+                db.executescript('''
+                    CREATE TABLE item (id INTEGER PRIMARY KEY, quantity INTEGER, last_updated REAL);
+                    CREATE INDEX item_last_updated ON item (last_updated);
+                    CREATE TABLE change_log (id INTEGER PRIMARY KEY, item_id INTEGER, old_quantity INTEGER,
+                                             new_quantity INTEGER, change_date REAL);
+                    CREATE TABLE summary (id INTEGER PRIMARY KEY, total_units INTEGER);
+                    INSERT INTO summary VALUES (1, 0);
+                ''')
+                db.executemany('INSERT INTO item VALUES (?, 0, ?)', [(i, time.time()) for i in range(1, 1001)])
+                db.close()
+                results[name][f'writers_{writers}'] = sqlite_write_load(path, pragmas, begin, writers, 4, duration)
+    return results
+
+
+@scenario('changelog', 'Item PATCH latency with the change log written in the request (sync) vs queued vs outbox, and batched outbox drain throughput')
+def changelog_benchmark(options):
+    # the background writer stays off: queued rows are only handed over on commit, which
+    # the command's rolled back transaction never reaches, the outbox is drained by hand
+    users = seed_dataset(1, options['items'], 0)
+    user = users[0]
+    headers = {'Authorization': 'Token ' + user.auth_token.key}
+    item_ids = list(InventoryItem.objects.filter(owner=user).values_list('id', flat=True))
+    total = options['rounds'] * 40
+    handler = WSGIHandler()
+    results = {'requests_per_mode': total}
+    with in_process_requests():
+        # warm up (first requests pay for imports and cold caches)
+        timed_requests(handler, [('PATCH', f'/api/items/{item_ids[0]}/', headers, {'quantity': 1})] * 20, 200)
+        for mode in ('sync', 'queue', 'outbox'):
+            with override_settings(INVENTORY_CHANGELOG_MODE=mode, INVENTORY_CHANGELOG_WORKER=False):
+                results[mode], _ = timed_requests(handler, [
+                    ('PATCH', f'/api/items/{item_ids[i % len(item_ids)]}/', headers, {'quantity': i % 60})
+                    for i in range(total)
+                ], 200)
+
+    # drain a --rows outbox backlog
+    rng = random.Random(42)
+    now = timezone.now()
+    InventoryChangeOutbox.objects.bulk_create([
+        InventoryChangeOutbox(
+            owner_id=user.pk, item_id=rng.choice(item_ids), changed_by_id=user.pk, old_quantity=i % 60,
+            new_quantity=(i + 1) % 60, change_type='restock', change_date=now,
+        )
+        for i in range(options['rows'])
+    ], batch_size=2000)
+    backlog = InventoryChangeOutbox.objects.count()
+    started = time.perf_counter()
+    written = ChangeLogWriter().flush()
+    elapsed = time.perf_counter() - started
+    results['drain'] = {
+        'rows': written,
+        'batch_size': settings.INVENTORY_CHANGELOG_BATCH_SIZE,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(written / elapsed, 1),
+        'backlog_left': InventoryChangeOutbox.objects.count(),
+    }
+    assert written == backlog, (written, backlog)
+    return results
+
+
+def throttle_cost(throttle_class, rate, calls):
+    # mean microseconds per allow_request() for one client making `calls` requests under `rate`
+    key = f'bench:{uuid.uuid4().hex}'
+    throttle = type('BenchThrottle', (throttle_class,), {
+        'rate': rate, 'scope': 'bench', 'get_cache_key': lambda self, request, view: key,
+    })()
+    started = time.perf_counter()
+    allowed = sum(throttle.allow_request(None, None) for _ in range(calls))
+    elapsed = time.perf_counter() - started
+    throttle.cache.delete(key)
+    return {'allowed': allowed, 'us_per_request': round(elapsed / calls * 1e6, 2)}
+
+
+@scenario('throttle', 'Rate limit overhead per request: token bucket (one float) vs DRF\'s timestamp-list throttle at growing rates, and an item list with/without throttling')
+def throttle_benchmark(options):
+    calls = options['rounds'] * 1000
+    results = {'cache': settings.INVENTORY_THROTTLE_CACHE}
+    with override_settings(INVENTORY_THROTTLE=True):
+        for per_minute in (60, 1200, 10000):
+            rate = f'{per_minute}/min'
+            results[rate] = {
+                'token_bucket': throttle_cost(TokenBucketThrottle, rate, calls),
+                'timestamp_list': throttle_cost(SimpleRateThrottle, rate, calls),
+            }
+
+        user = benchmark_user()
+        InventoryItem.objects.bulk_create([
+            InventoryItem(owner=user, name=f'Item {i}', quantity=i % 50, price='1.00', category=f'Category {i % 5}')
+            for i in range(100)
+        ])
+        headers = {'Authorization': 'Token ' + Token.objects.create(user=user).key}
+        handler = WSGIHandler()
+        total = options['rounds'] * 100
+        with in_process_requests(), override_settings(REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'read': '1000000/min'},
+        }):
+            for enabled in (False, True):
+                with override_settings(INVENTORY_THROTTLE=enabled):
+                    results['items_list_throttled' if enabled else 'items_list'], _ = timed_requests(
+                        handler, [('GET', '/api/items/', headers, None)] * total, 200
+                    )
+    return results
+
+
+# (name, URL) pairs of the sparse_fields scenario
+SPARSE_FIELD_REQUESTS = (
+    ('items_all_fields', '/api/items/?page_size=100'),
+    ('items_scanner_fields', '/api/items/?page_size=100&fields=id,name,quantity'),
+    ('items_omit_description', '/api/items/?page_size=100&omit=description'),
+    ('levels_all_fields', '/api/inventory-levels/?page_size=100'),
+    ('levels_scanner_fields', '/api/inventory-levels/?page_size=100&fields=id,name,quantity'),
+    ('changes_all_fields', '/api/changes/?page_size=100'),
+    ('changes_expand_item', '/api/changes/?page_size=100&expand=item'),
+    ('changes_compact', '/api/changes/?page_size=100&fields=id,item,new_quantity,change_date'),
+)
+
+
+@scenario('sparse_fields', 'Payload size and latency of item/level/change pages with every field vs ?fields=/?omit=, and the cost of ?expand=item')
+def sparse_fields_benchmark(options):
+    user = benchmark_user()
+    rng = random.Random(42)
+    # descriptions of a few hundred bytes, the field scanners don't need
+    items = InventoryItem.objects.bulk_create([
+        InventoryItem(
+            owner=user, name=f'Item {i}', description=' '.join(rng.choice(SEED_WORDS) for _ in range(60)),
+            quantity=i % 50, price='9.99', category=f'Category {i % 20}', below_threshold=i % 50 < LOW_STOCK_THRESHOLD,
+        )
+        for i in range(options['items'])
+    ])
+    insert_changes(random_changes(rng, [item.id for item in items], user.pk, options['items'] * 2))
+    headers = {'Authorization': 'Token ' + Token.objects.create(user=user).key}
+    handler = WSGIHandler()
+    total = options['rounds'] * 20
+    results = {'items': options['items'], 'page_size': 100}
+    with in_process_requests():
+        for name, url in SPARSE_FIELD_REQUESTS:
+            stats, bodies = timed_requests(handler, [('GET', url, headers, None)] * total, 200)
+            with CaptureQueriesContext(connection) as queries:
+                wsgi_request(handler, 'GET', url, headers)
+            # columns of the page query (the last one)
+            columns = queries.captured_queries[-1]['sql'].split(' FROM ')[0].count(',') + 1
+            results[name] = {'bytes': len(bodies[0]), 'selected_columns': columns, **stats}
+    return results
+
+
+@scenario('categories', 'Item list ?category= as the old icontains scan vs the indexed category join, ?category_tree= subtrees, and the category tree endpoint')
+def categories_benchmark(options):
+    user = benchmark_user()
+    # 10 departments x 20 categories
+    names = [f'Dept {i % 10}/Category {i % 200 // 10}' for i in range(options['rows'])]
+    categories = resolve_categories(user.pk, names)
+    InventoryItem.objects.bulk_create([
+        InventoryItem(
+            owner=user, name=f'Item {i}', quantity=i % 50, price='9.99', category=name,
+            category_node=categories[name], below_threshold=i % 50 < LOW_STOCK_THRESHOLD,
+        )
+        for i, name in enumerate(names)
+    ], batch_size=2000)
+    call_command('rebuild_inventory_summary', owner=user.username, stdout=io.StringIO())
+    headers = {'Authorization': 'Token ' + Token.objects.create(user=user).key}
+    handler = WSGIHandler()
+    rounds = options['rounds'] * 10
+    # the page query ?category= used to run
+    scan = InventoryItem.objects.filter(owner=user, category__icontains='dept 3/category 7').order_by('-last_updated', '-id')
+    results = {
+        'items': options['rows'], 'categories': Category.objects.filter(owner=user).count(),
+        'icontains_scan': measure(lambda: list(scan[:101]), rounds),
+    }
+    with in_process_requests():
+        for name, url in (
+            ('category_exact', '/api/items/?category=dept%203/category%207'),
+            ('category_tree', '/api/items/?category_tree=Dept%203'),
+        ):
+            results[name] = query_time(handler, url, headers, rounds)
+        results['category_list'], _ = timed_requests(handler, [('GET', '/api/categories/', headers, None)] * rounds, 200)
+    return results
@@ -0,0 +1,109 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from .models import InventoryItem
+
+# Read-through response cache for the inventory read endpoints
+# Entries are keyed by owner + a per-owner generation + the normalized request.
+# Every item/change log write bumps the owner's generation (after commit), which
+# makes all of that owner's cached responses unreachable at once; they then expire
+# on their own. The generation doubles as the ETag/Last-Modified of the response.
+
+
+def _cache():
+    return caches[getattr(settings, 'INVENTORY_CACHE_ALIAS', 'default')]
+
+
+def _generation_key(owner_id):
+    return f'inventory:gen:{owner_id}'
+
+
+def get_generation(owner_id):
+    cache = _cache()
+    generation = cache.get(_generation_key(owner_id))
+    if generation is None:
+        # cold or evicted: start a new generation, nothing older can be served
+        cache.add(_generation_key(owner_id), time.time_ns(), timeout=None)
+        generation = cache.get(_generation_key(owner_id))
+    return generation
+
+
+def bump_generation(owner_id):
+    _cache().set(_generation_key(owner_id), time.time_ns(), timeout=None)
+
+
+def invalidate_owner(owner_id):
+    # bump once the writing transaction commits, so no reader can cache pre-commit data
+    # under the new generation
+    transaction.on_commit(lambda: bump_generation(owner_id))
+
+
+# the API write paths go through services.record_item_writes, these catch single
+# saves made elsewhere (admin, shell); bulk writes don't send signals
+@receiver([post_save, post_delete], sender=InventoryItem, dispatch_uid='inventory_cache_item_write')
+def _item_written(sender, instance, **kwargs):
+    invalidate_owner(instance.owner_id)
+
+
+def response_cache_key(request, view, generation):
+    params = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+    parts = [
+        view.basename or view.__class__.__name__, view.action or '', request.path, repr(params),
+        request.get_host(), request.accepted_renderer.format or '',
+    ]
+    digest = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return f'inventory:resp:{request.user.pk}:{generation}:{digest}', digest
+
+
+def _not_modified(request, etag):
+    # only the ETag is trusted for revalidation: Last-Modified has one second
+    # resolution, two writes within the same second would look unmodified
+    if_none_match = request.headers.get('If-None-Match', '')
+    return etag in [tag.strip() for tag in if_none_match.split(',')]
+
+
+# Mixin for viewsets whose responses only depend on the requesting owner's inventory
+# caches the list/retrieve responses when settings.INVENTORY_RESPONSE_CACHE is on
+class CachedResponseMixin:
+    cached_actions = ('list', 'retrieve')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        if not getattr(settings, 'INVENTORY_RESPONSE_CACHE', False) or self.action not in self.cached_actions:
+            return handler(request, *args, **kwargs)
+
+        generation = get_generation(request.user.pk)
+        key, digest = response_cache_key(request, self, generation)
+        etag = quote_etag(f'{generation}-{digest[:12]}')
+        headers = {
+            'ETag': etag,
+            'Last-Modified': http_date(generation / 1e9),
+            'Cache-Control': 'private, no-cache',
+        }
+
+        if _not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        data = _cache().get(key)
+        if data is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            _cache().set(key, response.data, timeout=getattr(settings, 'INVENTORY_CACHE_TIMEOUT', 300))
+        else:
+            response = Response(data)
+        for header, value in headers.items():
+            response[header] = value
+        return response
@@ -0,0 +1,114 @@
+from .models import Category, CATEGORY_PATH_STEP
+
+# Per-owner category hierarchy (see Category in inventory/models.py)
+# Items are written with a category string as before; "Electronics / Phones" nests
+# Phones under Electronics. The string is matched case- and whitespace-insensitively
+# against the owner's categories (creating the missing ones and their parents) and
+# replaced by the category's full name, so "electronics " and "Electronics" are one
+# category everywhere: filters, summaries, thresholds and analytics.
+
+SEPARATOR = '/'
+MAX_DEPTH = 10
+# a materialized path is the zero-padded ids of the root ... the category, digits only
+# so that it sorts the same under any database collation
+PATH_STEP = CATEGORY_PATH_STEP
+
+
+def category_parts(name):
+    # "  Electronics /  mobile  phones" -> ['Electronics', 'mobile phones']
+    parts = (' '.join(part.split()) for part in name.split(SEPARATOR))
+    return [part for part in parts if part]
+
+
+def category_key(name):
+    # the lookup key of a category string, '' for no category
+    return SEPARATOR.join(category_parts(name)).casefold()
+
+
+def path_ids(path):
+    # category ids from the root down to the category itself
+    return [int(path[i:i + PATH_STEP]) for i in range(0, len(path), PATH_STEP)]
+
+
+def subtree_range(path):
+    # (low, high): the paths of the category and all its descendants are low <= path < high
+    return path, str(int(path) + 1).zfill(len(path))
+
+
+def resolve_categories(owner_id, names, queryset=None):
+    """
+    Map category strings as written with items to the owner's categories.
+
+    Returns {name: Category or None (no category)}, creating the categories
+    that don't exist yet, parents first; a new category is spelled like the first
+    of `names` that leads to it. `queryset` defaults to Category.objects (the
+    backfill migration passes its historical model's).
+    """
+    if queryset is None:
+        queryset = Category.objects
+    wanted = {name: category_parts(name) for name in dict.fromkeys(names)}
+    # every level of every name: {key: parts}
+    levels = {}
+    for parts in wanted.values():
+        for depth in range(1, len(parts) + 1):
+            levels.setdefault(SEPARATOR.join(parts[:depth]).casefold(), parts[:depth])
+    nodes = {node.key: node for node in queryset.filter(owner_id=owner_id, key__in=list(levels))} if levels else {}
+    missing = [key for key in levels if key not in nodes]
+    for depth in sorted({len(levels[key]) for key in missing}):
+        # a child's path starts with its parent's, so one level at a time
+        level = [key for key in missing if len(levels[key]) == depth]
+        queryset.bulk_create([
+            queryset.model(
+                owner_id=owner_id,
+                parent=nodes[SEPARATOR.join(levels[key][:-1]).casefold()] if depth > 1 else None,
+                name=levels[key][-1],
+                full_name=SEPARATOR.join(levels[key]),
+                key=key,
+            )
+            for key in level
+        ], ignore_conflicts=True)
+        # re-read for the ids (a concurrent write may have created some of them first)
+        created = []
+        for node in queryset.filter(owner_id=owner_id, key__in=level):
+            if not node.path:
+                parent_path = nodes[node.key.rpartition(SEPARATOR)[0]].path if depth > 1 else ''
+                node.path = parent_path + str(node.pk).zfill(PATH_STEP)
+                created.append(node)
+            nodes[node.key] = node
+        queryset.bulk_update(created, ['path'])
+    return {
+        name: nodes[SEPARATOR.join(parts).casefold()] if parts else None
+        for name, parts in wanted.items()
+    }
+
+
+def categorize(owner_id, rows):
+    """
+    Resolve the category of validated item field dicts, in place.
+
+    `category` becomes the category's full name and `category_node_id` is set;
+    rows without a category field (partial updates) are left alone.
+    """
+    rows = [data for data in rows if 'category' in data]
+    if not rows:
+        return
+    nodes = resolve_categories(owner_id, [data['category'] for data in rows])
+    for data in rows:
+        node = nodes[data['category']]
+        data['category'] = node.full_name if node is not None else ''
+        data['category_node_id'] = node.pk if node is not None else None
+
+
+def canonical_category(owner_id, name):
+    # the full name `name` is stored as (creating the category), for CategoryThreshold
+    node = resolve_categories(owner_id, [name])[name]
+    return node.full_name if node is not None else ''
+
+
+def subtree_counts(owner_id):
+    # {category id: items in the category and its descendants}, from the stored per-category counts
+    totals = {}
+    for path, count in Category.objects.filter(owner_id=owner_id).values_list('path', 'item_count'):
+        for pk in path_ids(path):
+            totals[pk] = totals.get(pk, 0) + count
+    return totals
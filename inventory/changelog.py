@@ -0,0 +1,224 @@
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import NamedTuple
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from .cache import invalidate_owner
+from .events import publish_changes
+from .models import InventoryItem, InventoryChangeLog, InventoryChangeOutbox
+
+logger = logging.getLogger(__name__)
+
+# Deferred change log writes (INVENTORY_CHANGELOG_MODE)
+# sync (default): the change log rows are inserted by the item write itself, in its
+# transaction; the strict audit mode.
+# queue: the rows are handed to an in-process writer once the item write commits and
+# inserted in batches by its background thread. Cheapest, but whatever is still queued
+# when the process dies without running its exit handlers (SIGKILL, OOM) is lost.
+# outbox: the item write inserts the rows into InventoryChangeOutbox, in its transaction,
+# and the writer moves them to the change log in batches. Nothing is lost on a crash:
+# leftover rows are drained by the next worker (or `python manage.py flush_changelog`).
+#
+# Either way the rows keep the time of the item write as change_date, the response
+# cache is invalidated and the change events go out once they land. Until then the
+# change list, ?as_of= levels and analytics don't show them yet.
+
+MODES = ('sync', 'queue', 'outbox')
+
+
+class ChangeRecord(NamedTuple):
+    owner_id: int
+    item_id: int
+    changed_by_id: int
+    old_quantity: int
+    new_quantity: int
+    change_type: str
+    change_date: datetime
+
+
+def changelog_mode():
+    return getattr(settings, 'INVENTORY_CHANGELOG_MODE', 'sync')
+
+
+def write_changes(records):
+    """
+    Insert change log rows for `records` (ChangeRecord or outbox rows) with one bulk insert.
+
+    Rows of items deleted in the meantime are dropped, like the cascade would have
+    deleted them; a deleted user becomes changed_by NULL. Returns the new rows.
+    """
+    items = set(InventoryItem.objects.filter(pk__in={r.item_id for r in records}).values_list('pk', flat=True))
+    user_ids = {r.changed_by_id for r in records if r.changed_by_id is not None}
+    users = set(get_user_model().objects.filter(pk__in=user_ids).values_list('pk', flat=True)) if user_ids else set()
+    logs = [
+        InventoryChangeLog(
+            item_id=r.item_id,
+            changed_by_id=r.changed_by_id if r.changed_by_id in users else None,
+            old_quantity=r.old_quantity,
+            new_quantity=r.new_quantity,
+            change_type=r.change_type,
+            change_date=r.change_date,
+        )
+        for r in records if r.item_id in items
+    ]
+    if logs:
+        InventoryChangeLog.objects.bulk_create(logs)
+    return logs
+
+
+def _written(records, logs):
+    # same transaction as the insert: caches and events follow its commit
+    owners = {}
+    item_owners = {r.item_id: r.owner_id for r in records}
+    for log in logs:
+        owners.setdefault(item_owners[log.item_id], []).append(log.pk)
+    for owner_id in owners:
+        invalidate_owner(owner_id)
+    publish_changes(owners)
+
+
+class ChangeLogWriter:
+    """
+    Batches deferred change log rows into bulk inserts.
+
+    A daemon thread, started by the first deferred write, flushes every
+    INVENTORY_CHANGELOG_FLUSH_INTERVAL seconds, or as soon as a batch is full; the
+    process flushes once more on exit. With INVENTORY_CHANGELOG_WORKER off nothing
+    runs in the background and flush() is left to the caller.
+    """
+
+    def __init__(self, batch_size=None, interval=None):
+        self.batch_size = batch_size or getattr(settings, 'INVENTORY_CHANGELOG_BATCH_SIZE', 500)
+        self.interval = interval or getattr(settings, 'INVENTORY_CHANGELOG_FLUSH_INTERVAL', 1.0)
+        self._queue = deque()
+        # outbox rows committed since the last flush
+        self._pending = 0
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        # one flush at a time, whichever thread runs it
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def enqueue(self, records):
+        # queue mode, after the item write committed
+        self._queue.extend(records)
+        self._notify()
+
+    def notify(self, count):
+        # outbox mode, after the item write committed `count` outbox rows
+        self._pending += count
+        self._notify()
+
+    def _notify(self):
+        if not getattr(settings, 'INVENTORY_CHANGELOG_WORKER', True):
+            return
+        self._start()
+        if len(self._queue) + self._pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None and not self._stopping.is_set():
+                self._thread = threading.Thread(target=self._run, name='changelog-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Change log flush failed, retrying in %ss", self.interval)
+            finally:
+                # no request cycle here to recycle the connection
+                close_old_connections()
+        connection.close()
+
+    def flush(self):
+        # write everything queued and drain the outbox; returns the number of rows written
+        with self._flush_lock:
+            self._pending = 0
+            return self._flush_queue() + self._drain_outbox()
+
+    def _flush_queue(self):
+        written = 0
+        while self._queue:
+            batch = []
+            while self._queue and len(batch) < self.batch_size:
+                batch.append(self._queue.popleft())
+            try:
+                with transaction.atomic():
+                    _written(batch, write_changes(batch))
+            except Exception:
+                # back to the front, in order, for the next attempt
+                self._queue.extendleft(reversed(batch))
+                raise
+            written += len(batch)
+        return written
+
+    def _drain_outbox(self):
+        written = 0
+        while True:
+            with transaction.atomic():
+                rows = InventoryChangeOutbox.objects.order_by('pk')
+                # several processes may drain at once, each takes other rows (SQLite has a
+                # single writer, a second drainer fails its write and retries next cycle)
+                if connection.features.has_select_for_update_skip_locked:
+                    rows = rows.select_for_update(skip_locked=True)
+                batch = list(rows[:self.batch_size])
+                if batch:
+                    _written(batch, write_changes(batch))
+                    InventoryChangeOutbox.objects.filter(pk__in=[row.pk for row in batch]).delete()
+            written += len(batch)
+            if len(batch) < self.batch_size:
+                return written
+
+    def close(self, timeout=10):
+        # stop the thread and flush what is left (atexit)
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Change log flush on shutdown failed, %s queued row(s) lost", len(self._queue))
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ChangeLogWriter()
+    return _writer
+
+
+def defer_changes(user, changes):
+    # changes: (item, old_quantity, new_quantity, change_type) as for services.log_changes
+    now = timezone.now()
+    records = [
+        ChangeRecord(item.owner_id, item.pk, user.pk, old_quantity, new_quantity, change_type, now)
+        for item, old_quantity, new_quantity, change_type in changes
+    ]
+    if not records:
+        return
+    if changelog_mode() == 'outbox':
+        InventoryChangeOutbox.objects.bulk_create([InventoryChangeOutbox(**record._asdict()) for record in records])
+        transaction.on_commit(lambda: get_writer().notify(len(records)), robust=True)
+    else:
+        transaction.on_commit(lambda: get_writer().enqueue(records), robust=True)
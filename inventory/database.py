@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# SQLite tuning, applied to every new connection (settings.INVENTORY_SQLITE_PRAGMAS)
+# journal_mode=WAL lets readers run while a write is in progress (and is stored in the
+# database file); synchronous=NORMAL is safe with WAL and skips an fsync per commit;
+# busy_timeout makes a connection wait for the write lock instead of failing; mmap_size
+# and cache_size keep more of the database in memory.
+
+
+def sqlite_pragma_statements(pragmas):
+    # empty values are left at SQLite's default
+    return [f'PRAGMA {name} = {value}' for name, value in pragmas.items() if value not in (None, '')]
+
+
+@receiver(connection_created, dispatch_uid='inventory_sqlite_pragmas')
+def _tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in sqlite_pragma_statements(getattr(settings, 'INVENTORY_SQLITE_PRAGMAS', {})):
+            cursor.execute(statement)
@@ -0,0 +1,228 @@
+import asyncio
+import threading
+import uuid
+from collections import deque
+from typing import NamedTuple
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from .models import InventoryChangeLog
+from .renderers import FastJSONRenderer
+from .rows import row_builder, CHANGE_COLUMNS
+from .serializers import InventoryItemSerializer, InventoryChangeLogSerializer, StockAlertSerializer
+
+# Owner-scoped change stream (/api/events/, see inventory/async_views.py)
+# Item writes publish the committed item rows, change log rows and stock alerts to a
+# broker once their transaction commits. A streaming client waits on its own asyncio
+# queue, so an idle connection is a suspended coroutine: no polling, no database work.
+#
+# Event ids are "<broker epoch>-<sequence>". A client reconnecting with Last-Event-ID
+# gets the events it missed from the broker's history; when that is no longer
+# possible (broker restarted, history rolled over, client fell too far behind) it
+# gets a `reload` event instead and refetches what it shows.
+#
+# Event types: item (item row, clients upsert it by id), item_deleted ({"id": ...}),
+# change (change log row), alert (stock alert), reload ({}).
+
+renderer = FastJSONRenderer()
+
+
+class Event(NamedTuple):
+    id: str
+    type: str
+    # JSON text, encoded once for every subscriber
+    data: str
+
+    def sse(self):
+        return f'id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n'
+
+    def json(self):
+        return f'{{"id":"{self.id}","event":"{self.type}","data":{self.data}}}'
+
+
+class Subscription:
+    # one streaming connection; lives on the event loop that created it,
+    # the broker may deliver to it from any thread
+
+    def __init__(self, broker, owner_id, max_pending):
+        self.broker = broker
+        self.owner_id = owner_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_pending)
+
+    def deliver(self, events):
+        try:
+            self.loop.call_soon_threadsafe(self._put, events)
+        except RuntimeError:
+            # the loop is closed, the connection is gone
+            self.close()
+
+    def _put(self, events):
+        if self.queue.full():
+            # a client that can't keep up: drop what's queued and have it refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            events = [self.broker.reload_event(events[-1].id)]
+        self.queue.put_nowait(events)
+
+    async def get(self, timeout):
+        # every pending event, waiting up to `timeout` seconds (None: no limit) for the first; [] on timeout
+        events = []
+        if self.queue.empty():
+            if timeout is not None and timeout <= 0:
+                return events
+            try:
+                events.extend(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                return events
+        while not self.queue.empty():
+            events.extend(self.queue.get_nowait())
+        return events
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """
+    In-process broker for a single worker process.
+
+    Only subscribers in the process that made the write see its events, so run
+    one ASGI process (any number of threads and connections) or plug in a shared
+    broker with the same publish/subscribe/unsubscribe/reload_event methods.
+    """
+
+    def __init__(self, history=None, max_pending=None):
+        if history is None:
+            history = getattr(settings, 'INVENTORY_EVENT_HISTORY', 10000)
+        self.max_pending = max_pending or getattr(settings, 'INVENTORY_EVENT_MAX_PENDING', 1000)
+        # a new epoch per broker: ids from before a restart can't be resumed
+        self.epoch = uuid.uuid4().hex[:12]
+        self._seq = 0
+        # (sequence, owner_id, event), shared by all owners
+        self._history = deque(maxlen=history)
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def _event_id(self, seq):
+        return f'{self.epoch}-{seq}'
+
+    def reload_event(self, event_id=None):
+        return Event(event_id or self._event_id(self._seq), 'reload', '{}')
+
+    def publish(self, owner_id, events):
+        # events: (type, JSON text) pairs
+        with self._lock:
+            published = []
+            for event_type, data in events:
+                self._seq += 1
+                event = Event(self._event_id(self._seq), event_type, data)
+                self._history.append((self._seq, owner_id, event))
+                published.append(event)
+            subscribers = list(self._subscribers.get(owner_id, ()))
+        for subscription in subscribers:
+            subscription.deliver(published)
+
+    def subscribe(self, owner_id, last_event_id=None):
+        # call from the event loop that will read the subscription
+        subscription = Subscription(self, owner_id, self.max_pending)
+        with self._lock:
+            self._subscribers.setdefault(owner_id, set()).add(subscription)
+            # under the same lock as publish: nothing is missed or sent twice
+            backlog = self._backlog(owner_id, last_event_id) if last_event_id else []
+        if backlog:
+            subscription._put(backlog)
+        return subscription
+
+    def _backlog(self, owner_id, last_event_id):
+        epoch, _, seq = last_event_id.partition('-')
+        try:
+            seq = int(seq)
+        except ValueError:
+            return [self.reload_event()]
+        # whatever was published after `seq` is still in the history only if nothing newer was evicted
+        oldest = self._history[0][0] if self._history else self._seq + 1
+        if epoch != self.epoch or seq > self._seq or seq < oldest - 1:
+            return [self.reload_event()]
+        backlog = []
+        for event_seq, event_owner_id, event in reversed(self._history):
+            if event_seq <= seq:
+                break
+            if event_owner_id == owner_id:
+                backlog.append(event)
+        backlog.reverse()
+        return backlog
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.owner_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.owner_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+_brokers = {}
+
+
+def get_broker():
+    # None when INVENTORY_EVENT_BROKER is empty (stream disabled)
+    path = getattr(settings, 'INVENTORY_EVENT_BROKER', '')
+    if not path:
+        return None
+    if path not in _brokers:
+        _brokers[path] = import_string(path)()
+    return _brokers[path]
+
+
+def _json(data):
+    return renderer.render(data).decode()
+
+
+def write_events(user, items=(), changes=(), alerts=(), deleted=()):
+    # the events of one committed write; past INVENTORY_EVENT_MAX_ITEMS rows a single
+    # reload is cheaper than serializing every row of a bulk import
+    if len(items) + len(deleted) + len(alerts) > getattr(settings, 'INVENTORY_EVENT_MAX_ITEMS', 100):
+        return [('reload', '{}')]
+    for item in items:
+        # all of them belong to `user`, spares a query per row for owner.username
+        item.owner = user
+    return [
+        *(('item', _json(row)) for row in InventoryItemSerializer(items, many=True).data),
+        *(('item_deleted', _json({'id': pk})) for pk in deleted),
+        *(('change', _json(row)) for row in InventoryChangeLogSerializer(changes, many=True).data),
+        *(('alert', _json(row)) for row in StockAlertSerializer(alerts, many=True).data),
+    ]
+
+
+def publish_writes(user, items=(), changes=(), alerts=(), deleted=()):
+    # publish once the writing transaction commits, nothing is sent for a rollback
+    broker = get_broker()
+    if broker is None or not (items or changes or alerts or deleted):
+        return
+    items, changes, alerts, deleted = list(items), list(changes), list(alerts), list(deleted)
+    transaction.on_commit(
+        lambda: broker.publish(user.pk, write_events(user, items, changes, alerts, deleted)), robust=True
+    )
+
+
+def publish_changes(owner_changes):
+    # change log rows written outside the item write (inventory/changelog.py), {owner_id: [ids]}
+    broker = get_broker()
+    if broker is None or not owner_changes:
+        return
+
+    def publish():
+        builder = row_builder(InventoryChangeLogSerializer, CHANGE_COLUMNS)
+        ids = [pk for pks in owner_changes.values() for pk in pks]
+        rows = {row['id']: row for row in builder.build(builder.values(InventoryChangeLog.objects.filter(pk__in=ids)))}
+        for owner_id, pks in owner_changes.items():
+            if len(pks) > getattr(settings, 'INVENTORY_EVENT_MAX_ITEMS', 100):
+                broker.publish(owner_id, [('reload', '{}')])
+            else:
+                broker.publish(owner_id, [('change', _json(rows[pk])) for pk in pks if pk in rows])
+    transaction.on_commit(publish, robust=True)
@@ -0,0 +1,98 @@
+import csv
+import gzip
+import io
+import json
+import os
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from .rows import ITEM_COLUMNS, CHANGE_COLUMNS, column_formatters
+from .serializers import InventoryItemSerializer, InventoryChangeLogSerializer
+
+# Streaming exports
+# Rows come straight from values_list() through a server-side chunked iterator and
+# are written out chunk by chunk, so memory stays flat whatever the row count.
+# Values are formatted with the API serializers' own fields (see rows.py), so an
+# export matches what /api/items/ and /api/changes/ return.
+# Under ASGI Django consumes a plain iterator with sync_to_async(list), the whole
+# export at once; there the chunks are handed over one by one from an async iterator.
+
+EXPORT_CHUNK_SIZE = 2000
+
+def _rows(queryset, columns, formatters, chunk_size):
+    rows = queryset.values_list(*[lookup for _, lookup in columns]).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield [value if fmt is None or value is None else fmt(value) for value, fmt in zip(row, formatters)]
+
+
+def _csv_stream(queryset, columns, formatters, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    count = 0
+    for row in _rows(queryset, columns, formatters, chunk_size):
+        writer.writerow(row)
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_stream(queryset, columns, formatters, chunk_size):
+    names = [name for name, _ in columns]
+    lines = []
+    for row in _rows(queryset, columns, formatters, chunk_size):
+        lines.append(json.dumps(dict(zip(names, row)), ensure_ascii=False))
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+async def _async_chunks(chunks):
+    # each chunk is read in the thread the view ran in, where its database connection (and cursor) lives
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+def streaming_export(queryset, columns, serializer_class, export_format, filename, chunk_size=EXPORT_CHUNK_SIZE,
+                     asynchronous=False):
+    # asynchronous: the request came through ASGI
+    formatters = column_formatters(serializer_class().fields, columns)
+    if export_format == 'ndjson':
+        stream, content_type, extension = _ndjson_stream, 'application/x-ndjson', 'ndjson'
+    else:
+        stream, content_type, extension = _csv_stream, 'text/csv', 'csv'
+    chunks = stream(queryset, columns, formatters, chunk_size)
+    if asynchronous:
+        chunks = _async_chunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
+
+
+def export_items(queryset, export_format, asynchronous=False):
+    return streaming_export(
+        queryset, ITEM_COLUMNS, InventoryItemSerializer, export_format, 'items', asynchronous=asynchronous
+    )
+
+
+def export_changes(queryset, export_format, asynchronous=False):
+    return streaming_export(
+        queryset, CHANGE_COLUMNS, InventoryChangeLogSerializer, export_format, 'changes', asynchronous=asynchronous
+    )
+
+
+def archive_changes(queryset, path, chunk_size=EXPORT_CHUNK_SIZE):
+    # gzipped NDJSON copy of change log rows, oldest first, in the /api/changes/ format
+    formatters = column_formatters(InventoryChangeLogSerializer().fields, CHANGE_COLUMNS)
+    with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as handle:
+        for chunk in _ndjson_stream(queryset.order_by('change_date', 'id'), CHANGE_COLUMNS, formatters, chunk_size):
+            handle.write(chunk)
+    os.replace(path + '.tmp', path)
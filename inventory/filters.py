@@ -1,5 +1,6 @@
 import django_filters
-from .models import InventoryItem
+from .categories import category_key, subtree_range
+from .models import Category, InventoryItem, LOW_STOCK_THRESHOLD
 
 # FilterSet for InventoryItem
 # Provides advanced filtering for the inventory API
@@ -8,25 +9,46 @@ class InventoryItemFilter(django_filters.FilterSet):
     min_price = django_filters.NumberFilter(field_name='price', lookup_expr='gte') # Praice >= min_praice
     max_price = django_filters.NumberFilter(field_name='price', lookup_expr='lte') # Praice <= max_praice
     
-    category = django_filters.CharFilter(field_name='category', lookup_expr='icontains') # category Flexible Match
+    # exact category, matched like items are written ("electronics " is Electronics);
+    # category_tree= also takes its subcategories. Both join on the indexed category_node
+    category = django_filters.CharFilter(method='filter_category')
+    category_tree = django_filters.CharFilter(method='filter_category_tree')
     # Custom boolean filter for low stock items
-    # ﻻy default, returns items with quantity less than 5
+    # ﻻy default, returns items below their reorder threshold (quantity less than 5 unless configured)
     # هf the user provides a custom threshold (low_stock_threshold), use that instead
     low_stock = django_filters.BooleanFilter(method='filter_low_stock')
 
 
     class Meta:
         model = InventoryItem
-        fields = ['category', 'min_price', 'max_price', 'low_stock']
+        fields = ['category', 'category_tree', 'min_price', 'max_price', 'low_stock']
 
     
     def filter_low_stock(self, queryset, name, value):
         if value:  # filter only if user activated the boolean filter
+            if 'low_stock_threshold' not in self.request.query_params:
+                # items below their own reorder threshold (item, category or default), precomputed and indexed
+                return queryset.filter(below_threshold=True)
             try:
                 # try to get the user-defined threshold from query params
-                threshold = int(self.request.query_params.get('low_stock_threshold', 5))
+                threshold = int(self.request.query_params.get('low_stock_threshold', LOW_STOCK_THRESHOLD))
             except (TypeError, ValueError):
                 # fallback to default threshold if invalid input
-                threshold = 5
+                threshold = LOW_STOCK_THRESHOLD
             return queryset.filter(quantity__lt=threshold)  # return items below the threshold
-        return queryset  # return all items if filter not activated
\ No newline at end of file
+        return queryset  # return all items if filter not activated
+
+    # the category ids are looked up first: with literal ids the planner walks
+    # item_owner_category_idx, with a subquery it may walk all of the owner's items instead
+    def category_ids(self, **lookups):
+        return list(Category.objects.filter(owner=self.request.user, **lookups).values_list('id', flat=True))
+
+    def filter_category(self, queryset, name, value):
+        return queryset.filter(category_node__in=self.category_ids(key=category_key(value)))
+
+    def filter_category_tree(self, queryset, name, value):
+        path = Category.objects.filter(owner=self.request.user, key=category_key(value)).values_list('path', flat=True)
+        if not path:
+            return queryset.none()
+        low, high = subtree_range(path[0])
+        return queryset.filter(category_node__in=self.category_ids(path__gte=low, path__lt=high))
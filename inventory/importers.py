@@ -0,0 +1,250 @@
+import codecs
+import csv
+import io
+import json
+import time
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.fields import empty, SkipField
+from .models import InventoryItem
+from .serializers import (
+    InventoryItemSerializer, validate_item_category, validate_item_name, validate_item_quantity, validate_item_price,
+)
+from .services import apply_bulk
+
+# Bulk import of inventory items
+# Rows are parsed lazily from a CSV/NDJSON stream, validated with the same field
+# rules as InventoryItemSerializer and upserted by (owner, name) in chunks: one
+# lookup query, one bulk_create and one bulk_update per chunk, plus one change
+# log row per imported item (restock for new items and increases, adjustment otherwise).
+
+IMPORT_FIELDS = ('name', 'description', 'quantity', 'price', 'category')
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+CHECK_BLOCK_SIZE = 64 * 1024
+
+ITEM_RULES = {
+    'name': validate_item_name,
+    'quantity': validate_item_quantity,
+    'price': validate_item_price,
+    'category': validate_item_category,
+}
+
+
+class InvalidRow:
+    # placeholder yielded for lines that can't be parsed at all
+    def __init__(self, message):
+        self.message = message
+
+
+def import_change_type(old_quantity, new_quantity):
+    # an import resets stock levels, a decrease is an adjustment rather than a sale
+    return "restock" if new_quantity > old_quantity else "adjustment"
+
+
+def detect_format(filename, requested=None):
+    if requested:
+        return requested
+    if filename and filename.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'csv'
+
+
+def iter_rows(text_stream, file_format):
+    if file_format == 'ndjson':
+        return _iter_ndjson(text_stream)
+    return csv.DictReader(text_stream)
+
+
+def _iter_ndjson(text_stream):
+    for line in text_stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield InvalidRow('Invalid JSON.')
+            continue
+        yield row if isinstance(row, dict) else InvalidRow('Expected a JSON object.')
+
+
+def text_stream(binary_file):
+    # uploaded files are binary, the parsers want text (utf-8-sig drops an Excel BOM)
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+
+
+def check_upload(binary_file, file_format):
+    """
+    Read a whole upload once before anything is imported, then rewind it.
+
+    Raises a ValidationError naming the byte offset of the first invalid UTF-8
+    sequence, or the line of a CSV the csv module can't parse, so a broken file is
+    refused as a whole instead of failing halfway through the import.
+    """
+    stream = text_stream(binary_file)
+    try:
+        if file_format == 'csv':
+            reader = csv.reader(stream)
+            try:
+                for _ in reader:
+                    pass
+            except csv.Error as exc:
+                raise serializers.ValidationError({'file': [f'Line {reader.line_num}: {exc}.']})
+        else:
+            for _ in stream:
+                pass
+    except UnicodeDecodeError:
+        offset = invalid_utf8_offset(binary_file)
+        raise serializers.ValidationError({'file': [f'Not UTF-8 text: invalid byte sequence at byte {offset}.']})
+    finally:
+        # the wrapper would close the upload when it's collected
+        stream.detach()
+        binary_file.seek(0)
+
+
+def invalid_utf8_offset(binary_file):
+    # position of the first byte that isn't valid UTF-8 (the file's length for a truncated last character)
+    binary_file.seek(0)
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    offset = 0
+    for block in iter(lambda: binary_file.read(CHECK_BLOCK_SIZE), b''):
+        # bytes of a character split across blocks are still in the decoder
+        pending = len(decoder.getstate()[0])
+        try:
+            decoder.decode(block)
+        except UnicodeDecodeError as exc:
+            return offset - pending + exc.start
+        offset += len(block)
+    return offset - len(decoder.getstate()[0])
+
+
+# Validates raw rows with the serializer's field objects, built once per import
+class RowValidator:
+
+    def __init__(self):
+        # partial, so a missing column is skipped instead of required (updates may omit fields)
+        fields = InventoryItemSerializer(partial=True).fields
+        self.fields = {name: fields[name] for name in IMPORT_FIELDS}
+
+    def validate(self, row):
+        if isinstance(row, InvalidRow):
+            return None, {'non_field_errors': [row.message]}
+        data, errors = {}, {}
+        for name, field in self.fields.items():
+            value = row.get(name, empty)
+            if value is None or (value == '' and not isinstance(field, serializers.CharField)):
+                value = empty  # blank CSV cell for a number means "not provided"
+            try:
+                value = field.run_validation(value)
+                if name in ITEM_RULES:
+                    value = ITEM_RULES[name](value)
+            except SkipField:
+                continue
+            except serializers.ValidationError as exc:
+                errors[name] = exc.detail
+                continue
+            data[name] = value
+        return data, errors
+
+
+class ImportResult:
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add_error(self, row_number, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'dry_run': self.dry_run,
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows / self.elapsed, 1) if self.elapsed else None,
+        }
+
+
+def import_items(user, rows, dry_run=False, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Upsert `rows` (an iterable of dicts) into `user`'s inventory.
+
+    Invalid rows are skipped and reported; each chunk is written in its own
+    transaction. With dry_run nothing is written, the result shows what would happen.
+    """
+    result = ImportResult(dry_run)
+    validator = RowValidator()
+    # names created by earlier chunks, so a dry run counts later duplicates as updates
+    pending_names = set()
+    chunk = []
+    for number, row in enumerate(rows, start=1):
+        chunk.append((number, row))
+        if len(chunk) >= chunk_size:
+            _import_chunk(user, chunk, validator, result, pending_names)
+            chunk = []
+    if chunk:
+        _import_chunk(user, chunk, validator, result, pending_names)
+    result.elapsed = time.perf_counter() - result.started
+    return result
+
+
+def _import_chunk(user, chunk, validator, result, pending_names):
+    result.rows += len(chunk)
+    by_name = {}
+    for number, row in chunk:
+        data, errors = validator.validate(row)
+        if errors:
+            result.add_error(number, errors)
+        elif 'name' not in data:
+            result.add_error(number, {'name': ['This field is required.']})
+        elif data['name'] in by_name:
+            # a later valid row for the same name applies on top of the earlier one
+            by_name[data['name']] = (number, {**by_name[data['name']][1], **data})
+        else:
+            by_name[data['name']] = (number, data)
+
+    with transaction.atomic():
+        # the matches are locked and written in the same transaction, so an item edited
+        # or deleted by another request in between can't be matched from a stale copy
+        matched = InventoryItem.objects.filter(owner=user, name__in=list(by_name)).order_by('id')
+        if not result.dry_run:
+            matched = matched.select_for_update()
+        matches = {}
+        for item in matched:
+            item.owner = user
+            matches.setdefault(item.name, []).append(item)
+
+        creates, updates = [], []
+        for name, (number, data) in by_name.items():
+            found = matches.get(name, [])
+            if len(found) > 1:
+                result.add_error(number, {'name': [f'{len(found)} items are named {name!r}, cannot pick one to update.']})
+            elif found:
+                updates.append((found[0], data))
+            elif result.dry_run and name in pending_names:
+                result.updated += 1
+            else:
+                if 'price' not in data:
+                    result.add_error(number, {'price': ['This field is required.']})
+                    continue
+                creates.append(data)
+
+        if not result.dry_run:
+            apply_bulk(user, creates, updates, classify=import_change_type)
+        else:
+            pending_names.update(data['name'] for data in creates)
+    result.created += len(creates)
+    result.updated += len(updates)
@@ -0,0 +1,69 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from inventory.benchmarks import SCENARIOS, compare_results, environment
+
+
+# Runs the benchmark scenarios from inventory.benchmarks
+# every scenario runs in a transaction that is rolled back, so the database is left untouched.
+# With --compare the run fails when a latency got worse than in an earlier results file
+# by more than --tolerance, e.g. as a check before deploying.
+class Command(BaseCommand):
+    help = "Run inventory benchmarks and print (or save) the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', help="Scenarios to run (default: all). Use --list to see them.")
+        parser.add_argument('--list', action='store_true', help="List the available scenarios.")
+        parser.add_argument('--rows', type=int, default=10000, help="Dataset size for scenarios that generate rows.")
+        parser.add_argument('--rounds', type=int, default=5, help="Timed rounds for micro-benchmarks.")
+        parser.add_argument('--users', type=int, default=10, help="Users in the seeded dataset.")
+        parser.add_argument('--items', type=int, default=1000, help="Items per user in the seeded dataset.")
+        parser.add_argument('--changes', type=int, default=5, help="Change log rows per item in the seeded dataset.")
+        parser.add_argument('--output', help="Write the JSON results to this file.")
+        parser.add_argument('--compare', help="Earlier results file: fail on latency regressions against it.")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed slowdown for --compare, as a fraction (default 0.25).")
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name, (_, description) in SCENARIOS.items():
+                self.stdout.write(f"{name:<20} {description}")
+            return
+
+        names = options['scenarios'] or list(SCENARIOS)
+        unknown = [name for name in names if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(unknown)}")
+        if options['tolerance'] < 0:
+            raise CommandError("--tolerance must not be negative.")
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as handle:
+                baseline = json.load(handle)
+
+        report = {'started_at': timezone.now().isoformat(), 'environment': environment(), 'results': {}}
+        for name in names:
+            func, _ = SCENARIOS[name]
+            self.stderr.write(f"running {name}...")
+            # rate limits would cut the load scenarios short, the throttle scenario turns them back on
+            with transaction.atomic(), override_settings(INVENTORY_THROTTLE=False):
+                report['results'][name] = func(options)
+                transaction.set_rollback(True)
+
+        output = json.dumps(report, indent=2, default=str)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+        if baseline is not None:
+            regressions = compare_results(baseline, json.loads(output), options['tolerance'])
+            for path, before, after in regressions:
+                self.stderr.write(f"  {path}: {before} -> {after} ms ({after / before - 1:+.0%})")
+            if regressions:
+                raise CommandError(f"{len(regressions)} latency regression(s) against {options['compare']}.")
+            self.stdout.write(self.style.SUCCESS(f"No latency regressions against {options['compare']}."))
@@ -0,0 +1,72 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from inventory.models import InventoryItem
+from inventory.snapshots import SNAPSHOT_CHUNK_SIZE, build_checkpoint, parse_as_of
+
+User = get_user_model()
+
+
+# Point-in-time checkpoints for /api/inventory-levels/?as_of=
+# Run it periodically (e.g. daily) to take a checkpoint now, or with --since to
+# backfill one every --interval-days from the change log, oldest first.
+class Command(BaseCommand):
+    help = "Store the current (or, with --at/--since, historical) item quantities as inventory checkpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', help="Limit to one username.")
+        parser.add_argument('--at', help="Checkpoint time (ISO 8601 timestamp or date), default now.")
+        parser.add_argument('--since', help="Backfill checkpoints from this time up to --at.")
+        parser.add_argument('--interval-days', type=int, default=1, help="Days between backfilled checkpoints.")
+        parser.add_argument('--chunk-size', type=int, default=SNAPSHOT_CHUNK_SIZE)
+
+    def parse(self, options, name):
+        if not options[name]:
+            return None
+        value = parse_as_of(options[name])
+        if value is None:
+            raise CommandError(f"--{name.replace('_', '-')}: expected an ISO 8601 timestamp or date.")
+        return value
+
+    def handle(self, *args, **options):
+        # None: now, from the current quantities
+        at = self.parse(options, 'at')
+        since = self.parse(options, 'since')
+        if options['interval_days'] < 1:
+            raise CommandError("--interval-days must be at least 1.")
+        if at is not None and at > timezone.now():
+            raise CommandError("--at is in the future.")
+        moments = [at]
+        if since is not None:
+            end = at or timezone.now()
+            if since > end:
+                raise CommandError("--since is after --at.")
+            moments = []
+            while since < end:
+                moments.append(since)
+                since += timedelta(days=options['interval_days'])
+            moments.append(at)
+
+        owners = InventoryItem.objects.order_by('owner_id').values_list('owner_id', flat=True).distinct()
+        if options['owner']:
+            owner = User.objects.filter(username=options['owner']).first()
+            if owner is None:
+                raise CommandError(f"User {options['owner']!r} does not exist.")
+            owners = [owner.pk]
+
+        built = skipped = snapshots = 0
+        for owner_id in owners:
+            for moment in moments:
+                checkpoint = build_checkpoint(owner_id, moment, chunk_size=options['chunk_size'])
+                if checkpoint is None:
+                    skipped += 1
+                    continue
+                built += 1
+                snapshots += checkpoint.item_count
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"user {owner_id} at {checkpoint.taken_at.isoformat()}: {checkpoint.item_count} item(s)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {built} checkpoint(s) with {snapshots} item quantities"
+            + (f", {skipped} already existed." if skipped else ".")
+        ))
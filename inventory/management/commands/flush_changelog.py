@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from inventory.changelog import ChangeLogWriter
+
+
+# Outbox mode: moves the change log rows waiting in the outbox into the change log, e.g.
+# after a crash or from cron when INVENTORY_CHANGELOG_WORKER is off.
+# Safe to run next to the background writers.
+class Command(BaseCommand):
+    help = "Write the change log rows waiting in the outbox (INVENTORY_CHANGELOG_MODE=outbox)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Rows per bulk insert (default INVENTORY_CHANGELOG_BATCH_SIZE).")
+
+    def handle(self, *args, **options):
+        rows = ChangeLogWriter(batch_size=options['batch_size']).flush()
+        self.stdout.write(self.style.SUCCESS(f"Moved {rows} outbox row(s) into the change log."))
@@ -0,0 +1,48 @@
+import json
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from inventory.importers import IMPORT_CHUNK_SIZE, check_upload, detect_format, import_items, iter_rows, text_stream
+
+User = get_user_model()
+
+
+# Imports a supplier catalog from a CSV or NDJSON file into one user's inventory
+# Same validation and upsert rules as POST /api/items/import/
+class Command(BaseCommand):
+    help = "Import inventory items from a CSV or NDJSON file, upserting by item name."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or NDJSON file (columns: name, description, quantity, price, category).")
+        parser.add_argument('--user', required=True, help="Username that will own the items.")
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'ndjson'], help="Defaults to the file extension.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and report without writing.")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f"User {options['user']!r} does not exist.")
+        file_format = detect_format(options['path'], options['file_format'])
+
+        try:
+            with open(options['path'], 'rb') as binary_file:
+                check_upload(binary_file, file_format)
+                result = import_items(
+                    user, iter_rows(text_stream(binary_file), file_format),
+                    dry_run=options['dry_run'], chunk_size=options['chunk_size'],
+                )
+        except OSError as exc:
+            raise CommandError(str(exc))
+        except ValidationError as exc:
+            raise CommandError(exc.detail['file'][0])
+
+        self.stdout.write(json.dumps(result.as_dict(), indent=2, default=str))
+        summary = (
+            f"{result.rows} rows, {result.created} created, {result.updated} updated, "
+            f"{result.error_count} errors in {result.elapsed:.2f}s"
+        )
+        if result.error_count:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
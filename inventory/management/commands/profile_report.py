@@ -0,0 +1,59 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from inventory.profiling import load_profiles, percentile, METRICS
+
+PERCENTILES = (('p50', 0.50), ('p95', 0.95), ('p99', 0.99))
+
+
+# Per-endpoint latency / query report from the files written by ProfilingMiddleware
+# (INVENTORY_PROFILING=True). Endpoints are sorted by p95 wall time.
+class Command(BaseCommand):
+    help = "Print p50/p95/p99 wall time, DB time and query counts per endpoint and flag N+1 suspects."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=str(getattr(settings, 'INVENTORY_PROFILE_DIR', 'profiles')),
+                            help="Directory with the profile-<pid>.json files.")
+        parser.add_argument('--endpoint', help="Only endpoints containing this text.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        profiles = load_profiles(options['dir'])
+        if options['endpoint']:
+            profiles = {name: stats for name, stats in profiles.items() if options['endpoint'] in name}
+        if not profiles:
+            raise CommandError(f"No profile data in {options['dir']}, run the server with INVENTORY_PROFILING=True first.")
+
+        report = {}
+        for name, stats in profiles.items():
+            report[name] = {
+                'count': stats['count'],
+                **{metric: {label: round(percentile(stats['samples'][metric], fraction), 2) for label, fraction in PERCENTILES}
+                   for metric in METRICS},
+                'n_plus_one_requests': stats['n_plus_one'],
+                'repeated_queries': stats['repeated'],
+            }
+        ordered = sorted(report.items(), key=lambda entry: entry[1]['wall']['p95'], reverse=True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(dict(ordered), indent=2))
+            return
+
+        header = f"{'endpoint':<40} {'count':>7} {'wall p50/p95/p99 ms':>24} {'db p95 ms':>10} {'queries p95':>12} {'ser p95':>8} {'render p95':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, row in ordered:
+            wall = '/'.join(f"{row['wall'][label]:.1f}" for label, _ in PERCENTILES)
+            self.stdout.write(
+                f"{name:<40} {row['count']:>7} {wall:>24} {row['db']['p95']:>10.1f} "
+                f"{row['queries']['p95']:>12.0f} {row['serializer']['p95']:>8.1f} {row['render']['p95']:>10.1f}"
+            )
+
+        suspects = [(name, row) for name, row in ordered if row['n_plus_one_requests']]
+        if suspects:
+            self.stdout.write('')
+            self.stdout.write(self.style.WARNING("N+1 suspects (same SQL repeated within one request):"))
+            for name, row in suspects:
+                self.stdout.write(f"  {name}: {row['n_plus_one_requests']} request(s)")
+                for sql, count in sorted(row['repeated_queries'].items(), key=lambda entry: -entry[1]):
+                    self.stdout.write(f"    x{count}  {sql[:160]}")
@@ -0,0 +1,92 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from inventory.models import Category, InventoryItem, InventorySummary, CategorySummary
+from inventory.services import summary_rows
+
+User = get_user_model()
+
+FIELDS = ['sku_count', 'total_units', 'stock_value', 'low_stock_count']
+
+
+# Rebuilds (or only verifies) the incrementally maintained summary counters and
+# category item counts from the items table. Useful after writes that bypass the API (admin, raw SQL).
+class Command(BaseCommand):
+    help = "Rebuild the per-owner inventory summary counters, or check them with --verify."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help="Only compare the counters, don't write anything.")
+        parser.add_argument('--owner', help="Limit to one username.")
+
+    def handle(self, *args, **options):
+        items = InventoryItem.objects.all()
+        summaries = InventorySummary.objects.all()
+        categories = CategorySummary.objects.all()
+        nodes = Category.objects.all()
+        if options['owner']:
+            owner = User.objects.filter(username=options['owner']).first()
+            if owner is None:
+                raise CommandError(f"User {options['owner']!r} does not exist.")
+            items = items.filter(owner=owner)
+            summaries = summaries.filter(owner=owner)
+            categories = categories.filter(owner=owner)
+            nodes = nodes.filter(owner=owner)
+
+        expected = summary_rows(items)
+        totals = {}
+        for (owner_id, _), row in expected.items():
+            total = totals.setdefault(owner_id, [0, 0, Decimal(0), 0])
+            for i, value in enumerate(row):
+                total[i] += value
+        # Category.item_count
+        counts = dict(items.exclude(category_node=None).order_by().values_list('category_node').annotate(Count('id')))
+
+        if options['verify']:
+            mismatches = self.compare(expected, totals, summaries, categories)
+            for pk, full_name, item_count in nodes.values_list('pk', 'full_name', 'item_count'):
+                if item_count != counts.get(pk, 0):
+                    mismatches.append(f"category {full_name!r} ({pk}): {item_count} items stored, expected {counts.get(pk, 0)}")
+            for mismatch in mismatches:
+                self.stdout.write(mismatch)
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} summary counter(s) out of date, run without --verify to rebuild.")
+            self.stdout.write(self.style.SUCCESS(f"Summary counters verified for {len(totals)} owner(s)."))
+            return
+
+        with transaction.atomic():
+            summaries.delete()
+            categories.delete()
+            InventorySummary.objects.bulk_create([
+                InventorySummary(owner_id=owner_id, **dict(zip(FIELDS, total))) for owner_id, total in totals.items()
+            ], batch_size=1000)
+            CategorySummary.objects.bulk_create([
+                CategorySummary(owner_id=owner_id, category=category, **dict(zip(FIELDS, row)))
+                for (owner_id, category), row in expected.items()
+            ], batch_size=1000)
+            stale = [
+                node for node in nodes.only('pk', 'item_count') if node.item_count != counts.get(node.pk, 0)
+            ]
+            for node in stale:
+                node.item_count = counts.get(node.pk, 0)
+            Category.objects.bulk_update(stale, ['item_count'], batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt summary counters for {len(totals)} owner(s), {len(expected)} categories."
+        ))
+
+    def compare(self, expected, totals, summaries, categories):
+        mismatches = []
+        stored = {row[0]: list(row[1:]) for row in summaries.values_list('owner_id', *FIELDS)}
+        for owner_id in set(stored) | set(totals):
+            want = totals.get(owner_id, [0, 0, Decimal(0), 0])
+            have = stored.get(owner_id, [0, 0, Decimal(0), 0])
+            if want != have:
+                mismatches.append(f"owner {owner_id}: stored {have}, expected {want}")
+        stored = {(row[0], row[1]): list(row[2:]) for row in categories.values_list('owner_id', 'category', *FIELDS)}
+        for key in set(stored) | set(expected):
+            want = expected.get(key, [0, 0, Decimal(0), 0])
+            have = stored.get(key, [0, 0, Decimal(0), 0])
+            if want != have:
+                mismatches.append(f"owner {key[0]} category {key[1]!r}: stored {have}, expected {want}")
+        return mismatches
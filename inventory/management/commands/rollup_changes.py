@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from inventory.rollups import pending_days, retention_cutoff, rollup_day
+
+
+# Change log retention: folds detail rows older than the retention window into daily
+# per-item rollups (/api/changes/daily/), archiving and/or deleting them.
+# Meant to run daily (cron); safe to interrupt and re-run.
+class Command(BaseCommand):
+    help = "Roll change log rows older than the retention window into daily rollups and prune them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=settings.INVENTORY_CHANGELOG_RETENTION_DAYS,
+                            help="Days of detail rows to keep (default INVENTORY_CHANGELOG_RETENTION_DAYS).")
+        parser.add_argument('--archive-dir', default=settings.INVENTORY_CHANGELOG_ARCHIVE_DIR,
+                            help="Write the rolled-up rows to <dir>/changes-<day>.ndjson.gz before pruning.")
+        parser.add_argument('--keep-detail', action='store_true', help="Build the rollups but keep the detail rows.")
+
+    def handle(self, *args, **options):
+        if options['retention_days'] < 0:
+            raise CommandError("--retention-days can't be negative.")
+        cutoff = retention_cutoff(options['retention_days'])
+        prune = not options['keep_detail']
+        days = changes = rollups = 0
+        for day in pending_days(cutoff):
+            rows, day_rollups = rollup_day(day, archive_dir=options['archive_dir'] or None, prune=prune)
+            days += 1
+            changes += rows
+            rollups += day_rollups
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{day}: {rows} change(s) -> {day_rollups} rollup(s)")
+        action = "pruned" if prune else "kept"
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {changes} change(s) before {cutoff} into {rollups} daily rollup(s) over {days} day(s), detail rows {action}."
+        ))
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.15 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventorychangelog',
+            index=models.Index(fields=['item', '-change_date', '-id'], name='change_item_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['owner', '-last_updated', '-id'], name='item_owner_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['owner', 'quantity'], name='item_owner_quantity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['owner', 'price'], name='item_owner_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['owner', 'name'], name='item_owner_name_idx'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.15 on 2026-10-18 19:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from decimal import Decimal
+
+# low stock as it was counted when this migration was written
+# (0010 recounts it from below_threshold)
+LOW_STOCK_THRESHOLD = 5
+
+
+def summary_rows(items):
+    # {(owner_id, category): [sku_count, total_units, stock_value, low_stock_count]}
+    rows = {}
+    for owner_id, category, quantity, price in items.values_list('owner_id', 'category', 'quantity', 'price').iterator(chunk_size=2000):
+        row = rows.setdefault((owner_id, category), [0, 0, Decimal(0), 0])
+        row[0] += 1
+        row[1] += quantity
+        row[2] += quantity * price
+        row[3] += quantity < LOW_STOCK_THRESHOLD
+    return rows
+
+
+def backfill_summaries(apps, schema_editor):
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    InventorySummary = apps.get_model('inventory', 'InventorySummary')
+    CategorySummary = apps.get_model('inventory', 'CategorySummary')
+    fields = ['sku_count', 'total_units', 'stock_value', 'low_stock_count']
+    rows = summary_rows(InventoryItem.objects.all())
+    totals = {}
+    for (owner_id, _), row in rows.items():
+        total = totals.setdefault(owner_id, [0, 0, Decimal(0), 0])
+        for i, value in enumerate(row):
+            total[i] += value
+    InventorySummary.objects.bulk_create(
+        [InventorySummary(owner_id=owner_id, **dict(zip(fields, total))) for owner_id, total in totals.items()],
+        batch_size=1000,
+    )
+    CategorySummary.objects.bulk_create(
+        [CategorySummary(owner_id=owner_id, category=category, **dict(zip(fields, row))) for (owner_id, category), row in rows.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0003_item_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySummary',
+            fields=[
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='inventory_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('sku_count', models.IntegerField(default=0)),
+                ('total_units', models.BigIntegerField(default=0)),
+                ('stock_value', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('low_stock_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CategorySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(blank=True, max_length=120)),
+                ('sku_count', models.IntegerField(default=0)),
+                ('total_units', models.BigIntegerField(default=0)),
+                ('stock_value', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('low_stock_count', models.IntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['category'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='categorysummary',
+            constraint=models.UniqueConstraint(fields=('owner', 'category'), name='unique_owner_category_summary'),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,141 @@
+# Generated by Django 4.2.15 on 2026-10-18 19:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_below_threshold(apps, schema_editor):
+    # no thresholds are configured yet, every item uses the default one
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    InventoryItem.objects.filter(quantity__lt=5).update(below_threshold=True)
+
+
+# copy of the search index setup (inventory/search.py) as it was when this migration
+# was written: the app code may change, this migration must not
+FTS_TABLE = 'inventory_item_fts'
+ITEM_TABLE = 'inventory_inventoryitem'
+SQLITE_FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description, category,
+        content='{ITEM_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {ITEM_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {ITEM_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, description, category ON {ITEM_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+        INSERT INTO {FTS_TABLE}(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END""",
+]
+
+
+def install_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            try:
+                cursor.execute(SQLITE_FTS_SQL[0])
+            except Exception:
+                # SQLite built without FTS5, searches fall back to SearchFilter
+                return
+            for statement in SQLITE_FTS_SQL[1:]:
+                cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif vendor == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+        from django.contrib.postgres.search import SearchVector
+        index = GinIndex(SearchVector('name', 'description', 'category', config='simple'), name='item_search_vector_idx')
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [index.name])
+            if cursor.fetchone() is None:
+                schema_editor.add_index(apps.get_model('inventory', 'InventoryItem'), index)
+
+
+def reinstall_search_index(apps, schema_editor):
+    # adding/removing the item columns remakes the table on SQLite, which drops the search triggers
+    install_search_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0004_inventory_summary'),
+    ]
+
+    operations = [
+        # runs last when migrating backwards
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search_index),
+        migrations.CreateModel(
+            name='CategoryThreshold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(blank=True, max_length=120)),
+                ('threshold', models.PositiveIntegerField()),
+            ],
+            options={
+                'ordering': ['category'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('low', 'Below threshold'), ('restocked', 'Back above threshold')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('threshold', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='below_threshold',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='reorder_threshold',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(condition=models.Q(('below_threshold', True)), fields=['owner', '-last_updated', '-id'], name='item_owner_below_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockalert',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='inventory.inventoryitem'),
+        ),
+        migrations.AddField(
+            model_name='stockalert',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='categorythreshold',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_thresholds', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='stockalert',
+            index=models.Index(fields=['owner', 'id'], name='alert_owner_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='categorythreshold',
+            constraint=models.UniqueConstraint(fields=('owner', 'category'), name='unique_owner_category_threshold'),
+        ),
+        migrations.RunPython(backfill_below_threshold, migrations.RunPython.noop),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.15 on 2026-10-18 19:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0005_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryChangeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('opening_quantity', models.IntegerField()),
+                ('closing_quantity', models.IntegerField()),
+                ('net_change', models.IntegerField()),
+                ('change_count', models.PositiveIntegerField(default=0)),
+                ('restock_count', models.PositiveIntegerField(default=0)),
+                ('sale_count', models.PositiveIntegerField(default=0)),
+                ('adjustment_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day', '-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inventorychangelog',
+            index=models.Index(fields=['change_date', 'id'], name='change_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='inventorychangerollup',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='inventory.inventoryitem'),
+        ),
+        migrations.AddField(
+            model_name='inventorychangerollup',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='change_rollups', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='inventorychangerollup',
+            index=models.Index(fields=['owner', '-day', '-id'], name='rollup_owner_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorychangerollup',
+            index=models.Index(fields=['item', '-day', '-id'], name='rollup_item_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='inventorychangerollup',
+            constraint=models.UniqueConstraint(fields=('item', 'day'), name='unique_item_day_rollup'),
+        ),
+    ]
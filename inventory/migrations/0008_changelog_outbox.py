@@ -0,0 +1,32 @@
+# Generated by Django 4.2.15 on 2026-10-18 20:02
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_inventory_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryChangeOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner_id', models.IntegerField()),
+                ('item_id', models.BigIntegerField()),
+                ('changed_by_id', models.IntegerField(null=True)),
+                ('old_quantity', models.IntegerField()),
+                ('new_quantity', models.IntegerField()),
+                ('change_type', models.CharField(choices=[('restock', 'Restock'), ('sale', 'Sale'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('change_date', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='inventorychangelog',
+            name='change_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
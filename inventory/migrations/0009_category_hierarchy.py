@@ -0,0 +1,218 @@
+# Generated by Django 4.2.15 on 2026-10-18 20:18
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, Min, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+# copies of the category rules as they were when this migration was written
+# (inventory/categories.py may change, this backfill must not)
+SEPARATOR = '/'
+PATH_STEP = 10
+LOW_STOCK_THRESHOLD = 5
+
+
+def category_parts(name):
+    parts = (' '.join(part.split()) for part in name.split(SEPARATOR))
+    return [part for part in parts if part]
+
+
+def create_categories(Category, owner_id, names):
+    # {name: Category or None}, every level created with its materialized path
+    nodes = {}
+    resolved = {}
+    for name in names:
+        parts = category_parts(name)
+        parent = None
+        for depth in range(1, len(parts) + 1):
+            key = SEPARATOR.join(parts[:depth]).casefold()
+            node = nodes.get(key)
+            if node is None:
+                node = Category.objects.create(
+                    owner_id=owner_id, parent=parent, name=parts[depth - 1],
+                    full_name=SEPARATOR.join(parts[:depth]), key=key,
+                )
+                node.path = (parent.path if parent is not None else '') + str(node.pk).zfill(PATH_STEP)
+                node.save(update_fields=['path'])
+                nodes[key] = node
+            parent = node
+        resolved[name] = parent
+    return resolved
+
+
+def category_summary_rows(items):
+    # {(owner_id, category): [sku_count, total_units, stock_value, low_stock_count]}
+    rows = {}
+    for owner_id, category, quantity, price in items.values_list('owner_id', 'category', 'quantity', 'price').iterator(chunk_size=2000):
+        row = rows.setdefault((owner_id, category), [0, 0, Decimal(0), 0])
+        row[0] += 1
+        row[1] += quantity
+        row[2] += quantity * price
+        row[3] += quantity < LOW_STOCK_THRESHOLD
+    return rows
+
+
+def backfill_categories(apps, schema_editor):
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    Category = apps.get_model('inventory', 'Category')
+    CategorySummary = apps.get_model('inventory', 'CategorySummary')
+    CategoryThreshold = apps.get_model('inventory', 'CategoryThreshold')
+
+    # a merged category is spelled like most of its items (the oldest spelling on a tie)
+    names = {}
+    spellings = (
+        InventoryItem.objects.values_list('owner_id', 'category')
+        .annotate(items=Count('id'), first=Min('id')).order_by('owner_id', '-items', 'first')
+    )
+    for owner_id, name, _, _ in spellings:
+        names.setdefault(owner_id, []).append(name)
+    thresholds = list(CategoryThreshold.objects.order_by('pk'))
+    for threshold in thresholds:
+        names.setdefault(threshold.owner_id, []).append(threshold.category)
+
+    canonical = {}
+    for owner_id, owner_names in names.items():
+        for name, node in create_categories(Category, owner_id, owner_names).items():
+            full_name = node.full_name if node is not None else ''
+            canonical[owner_id, name] = full_name
+            if name != full_name or node is not None:
+                InventoryItem.objects.filter(owner_id=owner_id, category=name).update(
+                    category=full_name, category_node_id=node.pk if node is not None else None
+                )
+
+    # thresholds that now name the same category: keep the one already spelled that way, else the oldest
+    kept = {}
+    for threshold in sorted(thresholds, key=lambda t: t.category != canonical[t.owner_id, t.category]):
+        key = (threshold.owner_id, canonical[threshold.owner_id, threshold.category])
+        kept.setdefault(key, threshold)
+    CategoryThreshold.objects.exclude(pk__in=[threshold.pk for threshold in kept.values()]).delete()
+    for (_, category), threshold in kept.items():
+        if threshold.category != category:
+            CategoryThreshold.objects.filter(pk=threshold.pk).update(category=category)
+
+    for node_id, count in (
+        InventoryItem.objects.filter(category_node__isnull=False).order_by()
+        .values_list('category_node').annotate(Count('id'))
+    ):
+        Category.objects.filter(pk=node_id).update(item_count=count)
+
+    # merged categories: their summary rows and inherited thresholds change
+    fields = ['sku_count', 'total_units', 'stock_value', 'low_stock_count']
+    CategorySummary.objects.all().delete()
+    CategorySummary.objects.bulk_create(
+        [CategorySummary(owner_id=owner_id, category=category, **dict(zip(fields, row)))
+         for (owner_id, category), row in category_summary_rows(InventoryItem.objects.all()).items()],
+        batch_size=1000,
+    )
+    category_threshold = CategoryThreshold.objects.filter(
+        owner_id=OuterRef('owner_id'), category=OuterRef('category')
+    ).values('threshold')[:1]
+    InventoryItem.objects.update(below_threshold=Case(
+        When(quantity__lt=Coalesce('reorder_threshold', Subquery(category_threshold), Value(LOW_STOCK_THRESHOLD)), then=Value(True)),
+        default=Value(False),
+    ))
+
+
+# copy of the search index setup (inventory/search.py) as it was when this migration
+# was written: the app code may change, this migration must not
+FTS_TABLE = 'inventory_item_fts'
+ITEM_TABLE = 'inventory_inventoryitem'
+SQLITE_FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description, category,
+        content='{ITEM_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {ITEM_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {ITEM_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, description, category ON {ITEM_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+        INSERT INTO {FTS_TABLE}(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END""",
+]
+
+
+def install_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            try:
+                cursor.execute(SQLITE_FTS_SQL[0])
+            except Exception:
+                # SQLite built without FTS5, searches fall back to SearchFilter
+                return
+            for statement in SQLITE_FTS_SQL[1:]:
+                cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif vendor == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+        from django.contrib.postgres.search import SearchVector
+        index = GinIndex(SearchVector('name', 'description', 'category', config='simple'), name='item_search_vector_idx')
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [index.name])
+            if cursor.fetchone() is None:
+                schema_editor.add_index(apps.get_model('inventory', 'InventoryItem'), index)
+
+
+def reinstall_search_index(apps, schema_editor):
+    # removing the item column remakes the table on SQLite, which drops the search triggers
+    install_search_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0008_changelog_outbox'),
+    ]
+
+    operations = [
+        # runs last when migrating backwards
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search_index),
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=120)),
+                ('full_name', models.CharField(max_length=120)),
+                ('key', models.CharField(editable=False, max_length=255)),
+                ('path', models.CharField(editable=False, max_length=100)),
+                ('item_count', models.IntegerField(default=0, editable=False)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='categories', to=settings.AUTH_USER_MODEL)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='inventory.category')),
+            ],
+            options={
+                'verbose_name_plural': 'categories',
+                'ordering': ['path'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['owner', 'path'], name='category_owner_path_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='category',
+            constraint=models.UniqueConstraint(fields=('owner', 'key'), name='unique_owner_category_key'),
+        ),
+        # nullable, no default: a plain ADD COLUMN, the item table (and its search triggers) stay
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='category_node',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='items', to='inventory.category'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['owner', 'category_node', '-last_updated', '-id'], name='item_owner_category_idx'),
+        ),
+        migrations.RunPython(backfill_categories, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.15 on 2026-10-18 22:41
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def recount_low_stock(apps, schema_editor):
+    # low_stock_count was quantity < 5, it is now the items below their own reorder threshold
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    InventorySummary = apps.get_model('inventory', 'InventorySummary')
+    CategorySummary = apps.get_model('inventory', 'CategorySummary')
+    below = InventoryItem.objects.filter(below_threshold=True).order_by()
+    InventorySummary.objects.update(low_stock_count=0)
+    CategorySummary.objects.update(low_stock_count=0)
+    for owner_id, count in below.values_list('owner_id').annotate(Count('id')):
+        InventorySummary.objects.filter(owner_id=owner_id).update(low_stock_count=count)
+    for owner_id, category, count in below.values_list('owner_id', 'category').annotate(Count('id')):
+        CategorySummary.objects.filter(owner_id=owner_id, category=category).update(low_stock_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_category_hierarchy'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_low_stock, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 # types of inventory changes
@@ -11,6 +12,53 @@ CHANGE_TYPES = [
 
 User = settings.AUTH_USER_MODEL
 
+# items with quantity below this count as low stock
+# (the default reorder threshold when neither the item nor its category sets one)
+LOW_STOCK_THRESHOLD = 5
+
+# digits per level of a category's materialized path (Category.path)
+CATEGORY_PATH_STEP = 10
+
+# stock alert kinds, emitted when an item crosses its reorder threshold
+ALERT_KINDS = [
+    ("low", "Below threshold"),
+    ("restocked", "Back above threshold"),
+]
+
+# Item category, per owner
+# Created from the category strings items are written with (inventory/categories.py);
+# "Electronics/Phones" is Phones under Electronics. `key` is the case- and
+# whitespace-normalized full name the strings are matched on. `path` is the
+# materialized path (zero-padded ids from the root down), so a subtree is one index
+# range. item_count is the number of items directly in the category, maintained by
+# inventory.services with the summary counters.
+class Category(models.Model):
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='categories')
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    name = models.CharField(max_length=120)
+    full_name = models.CharField(max_length=120)
+    key = models.CharField(max_length=255, editable=False)
+    path = models.CharField(max_length=100, editable=False)
+    item_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        ordering = ['path']
+        verbose_name_plural = 'categories'
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'key'], name='unique_owner_category_key'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', 'path'], name='category_owner_path_idx'),
+        ]
+
+    @property
+    def depth(self):
+        return len(self.path) // CATEGORY_PATH_STEP - 1
+
+    def __str__(self):
+        return self.full_name
+
+
 # Inventory item model
 # Represents an item in the inventory
 # Tracks owner, quantity, price, category, & timestamps
@@ -20,12 +68,33 @@ class InventoryItem(models.Model):
     quantity = models.IntegerField(default=0)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     category = models.CharField(max_length=120, blank=True)
+    # the Category `category` names (its full name), null for no category; set by inventory.categories
+    # RESTRICT: a category with items can't be deleted on its own, but goes with its owner's items
+    category_node = models.ForeignKey(
+        Category, on_delete=models.RESTRICT, null=True, blank=True, editable=False, related_name='items'
+    )
+    # per-item reorder threshold, falls back to the category's (CategoryThreshold), then LOW_STOCK_THRESHOLD
+    reorder_threshold = models.PositiveIntegerField(null=True, blank=True)
+    # quantity < effective threshold, maintained by inventory.services on every write
+    below_threshold = models.BooleanField(default=False, editable=False)
     date_added = models.DateTimeField(auto_now_add=True)
     last_updated = models.DateTimeField(auto_now=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='inventory_items')
 
     class Meta:
         ordering = ['-last_updated']
+        # composite indexes matching the list/filter access paths, every query is scoped by owner
+        indexes = [
+            models.Index(fields=['owner', '-last_updated', '-id'], name='item_owner_updated_idx'),
+            models.Index(fields=['owner', 'quantity'], name='item_owner_quantity_idx'),
+            models.Index(fields=['owner', 'price'], name='item_owner_price_idx'),
+            models.Index(fields=['owner', 'name'], name='item_owner_name_idx'),
+            # ?category=, in list order
+            models.Index(fields=['owner', 'category_node', '-last_updated', '-id'], name='item_owner_category_idx'),
+            # partial: only the (few) items below their reorder threshold, in list order
+            models.Index(fields=['owner', '-last_updated', '-id'], name='item_owner_below_idx',
+                         condition=models.Q(below_threshold=True)),
+        ]
 
     def __str__(self):
         return f"{self.name} (qty={self.quantity})"
@@ -40,11 +109,166 @@ class InventoryChangeLog(models.Model):
     old_quantity = models.IntegerField()
     new_quantity = models.IntegerField()
     change_type = models.CharField(max_length=20, choices=CHANGE_TYPES)
-    change_date = models.DateTimeField(auto_now_add=True)
+    change_date = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ['-change_date']
+        indexes = [
+            # item history, newest first (also serves the join from item__owner)
+            models.Index(fields=['item', '-change_date', '-id'], name='change_item_date_idx'),
+            # whole-table date ranges (retention: python manage.py rollup_changes)
+            models.Index(fields=['change_date', 'id'], name='change_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.item.name}: {self.change_type} {self.old_quantity}->{self.new_quantity}"
-    
\ No newline at end of file
+
+
+# Change log outbox (INVENTORY_CHANGELOG_MODE=outbox)
+# Change log rows waiting for the background writer (inventory/changelog.py). Written in
+# the same transaction as the item write, so a crash can't lose them; plain columns, no
+# foreign keys and no secondary indexes keep that insert cheap. The writer moves them to
+# InventoryChangeLog in batches, dropping the rows of items deleted in the meantime.
+class InventoryChangeOutbox(models.Model):
+    owner_id = models.IntegerField()
+    item_id = models.BigIntegerField()
+    changed_by_id = models.IntegerField(null=True)
+    old_quantity = models.IntegerField()
+    new_quantity = models.IntegerField()
+    change_type = models.CharField(max_length=20, choices=CHANGE_TYPES)
+    change_date = models.DateTimeField()
+
+
+# Daily change-log rollup
+# One row per item and (local) day for history older than the retention window:
+# `python manage.py rollup_changes` folds the detail rows of a day into it and then
+# archives/prunes them. Served by /api/changes/daily/.
+class InventoryChangeRollup(models.Model):
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='change_rollups')
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='rollups')
+    day = models.DateField()
+    opening_quantity = models.IntegerField()
+    closing_quantity = models.IntegerField()
+    net_change = models.IntegerField()
+    change_count = models.PositiveIntegerField(default=0)
+    restock_count = models.PositiveIntegerField(default=0)
+    sale_count = models.PositiveIntegerField(default=0)
+    adjustment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day', '-id']
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'day'], name='unique_item_day_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-day', '-id'], name='rollup_owner_day_idx'),
+            models.Index(fields=['item', '-day', '-id'], name='rollup_item_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"item {self.item_id} on {self.day}: {self.opening_quantity}->{self.closing_quantity}"
+
+
+# Point-in-time inventory checkpoints
+# the quantity of every item of an owner at `taken_at` (python manage.py build_snapshots);
+# "quantity as of T" starts from the latest checkpoint before T and only replays the
+# change log after it (see inventory/snapshots.py)
+class InventoryCheckpoint(models.Model):
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='inventory_checkpoints')
+    taken_at = models.DateTimeField()
+    item_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-taken_at']
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'taken_at'], name='unique_owner_checkpoint'),
+        ]
+
+    def __str__(self):
+        return f"checkpoint for user {self.owner_id} at {self.taken_at}"
+
+
+class InventorySnapshot(models.Model):
+    checkpoint = models.ForeignKey(InventoryCheckpoint, on_delete=models.CASCADE, related_name='snapshots')
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='snapshots')
+    quantity = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['checkpoint', 'item'], name='unique_checkpoint_item'),
+        ]
+
+    def __str__(self):
+        return f"item {self.item_id} = {self.quantity} at checkpoint {self.checkpoint_id}"
+
+
+# Inventory summary model
+# Per-owner totals maintained incrementally by inventory.services on every item write,
+# so the dashboard reads one row instead of aggregating the whole inventory
+class InventorySummary(models.Model):
+    owner = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='inventory_summary')
+    sku_count = models.IntegerField(default=0)
+    total_units = models.BigIntegerField(default=0)
+    stock_value = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    low_stock_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"summary for user {self.owner_id}: {self.sku_count} items"
+
+
+# Per-owner, per-category breakdown of the summary
+class CategorySummary(models.Model):
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='category_summaries')
+    category = models.CharField(max_length=120, blank=True)
+    sku_count = models.IntegerField(default=0)
+    total_units = models.BigIntegerField(default=0)
+    stock_value = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    low_stock_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['category']
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'category'], name='unique_owner_category_summary'),
+        ]
+
+    def __str__(self):
+        return f"{self.category or '(none)'}: {self.sku_count} items"
+
+
+# Per-owner reorder threshold for a whole category
+# used by the items of that category that don't set their own reorder_threshold
+class CategoryThreshold(models.Model):
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='category_thresholds')
+    category = models.CharField(max_length=120, blank=True)
+    threshold = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['category']
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'category'], name='unique_owner_category_threshold'),
+        ]
+
+    def __str__(self):
+        return f"{self.category or '(none)'} < {self.threshold}"
+
+
+# Stock alert feed
+# one row each time an item crosses its reorder threshold, in either direction;
+# the id is the feed cursor (/api/alerts/?since=<id>)
+class StockAlert(models.Model):
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stock_alerts')
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='alerts')
+    kind = models.CharField(max_length=20, choices=ALERT_KINDS)
+    quantity = models.IntegerField()
+    threshold = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['owner', 'id'], name='alert_owner_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}: item {self.item_id} at {self.quantity} (threshold {self.threshold})"
@@ -0,0 +1,195 @@
+import json
+from urllib.parse import urlencode
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor
+from rest_framework.reverse import reverse
+from rest_framework.settings import api_settings
+
+# Keyset (cursor) pagination
+# DRF's CursorPagination only filters on the first ordering field and falls back
+# to an OFFSET for ties, which degrades when many rows share a timestamp (bulk writes).
+# Here the cursor holds the full (ordering..., id) tuple of the last row, so every
+# page is a plain index range scan: no OFFSET and no COUNT(*), whatever the depth.
+class KeysetPagination(CursorPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    # unique tie-breaker appended to every ordering
+    tiebreaker = 'id'
+    # annotation added by InventorySearchFilter, used when no ?ordering= is given
+    relevance_field = 'search_rank'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if self.relevance_field in queryset.query.annotations and not request.query_params.get(api_settings.ORDERING_PARAM):
+            ordering = (self.relevance_field,)
+        ordering = [field for field in ordering
+                    if field.lstrip('-') not in (self.tiebreaker, 'pk')]
+        descending = ordering[0].startswith('-') if ordering else True
+        ordering.append(('-' if descending else '') + self.tiebreaker)
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # same as paginate_queryset, for async views
+        page_queryset = self.page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        return self.set_page([row async for row in page_queryset.aiterator()])
+
+    def page_queryset(self, queryset, request, view=None):
+        # the queryset of the requested page, not evaluated yet
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            self.reverse, self.current_position = False, None
+        else:
+            self.reverse, self.current_position = self.cursor.reverse, self.cursor.position
+
+        ordering = tuple(f[1:] if f.startswith('-') else '-' + f for f in self.ordering) if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.current_position is not None:
+            values = self._decode_position(self.current_position, queryset)
+            queryset = queryset.filter(self._keyset_filter(ordering, values))
+
+        # fetch one extra row to know if there is a following page
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        reverse, current_position = self.reverse, self.current_position
+        self.page = results[:self.page_size]
+        has_following_position = len(results) > len(self.page)
+        following_position = self._get_position_from_instance(self.page[-1], self.ordering) if has_following_position else None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None
+            self.has_previous = has_following_position
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else self.next_position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else self.previous_position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(str(value))
+        return json.dumps(values)
+
+    def _decode_position(self, position, queryset):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            # stale cursor, e.g. the client changed ?ordering= between pages
+            raise NotFound(self.invalid_cursor_message)
+        # the cursor comes back from the client: each value must convert to its field's
+        # type here, or the database (or the lookup) fails on it with a 500
+        try:
+            return [
+                self._cursor_value(self._ordering_field(queryset, field.lstrip('-')), value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (FieldDoesNotExist, ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _ordering_field(self, queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def _cursor_value(self, field, value):
+        if isinstance(value, (list, dict)):
+            raise ValueError(value)
+        value = field.to_python(value)
+        if value is None and not field.null:
+            raise ValueError(value)
+        return value
+
+    def _keyset_filter(self, ordering, values):
+        # (a, b, id) after (x, y, z) ==  a > x  OR  (a = x AND b > y)  OR  (a = x AND b = y AND id > z)
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = '__lt' if field.startswith('-') else '__gt'
+            condition |= equal & Q(**{name + lookup: value})
+            equal &= Q(**{name: value})
+        return condition
+
+
+def _value(row, name, default=None):
+    # page rows are model instances or values() dicts (see rows.py)
+    return row.get(name, default) if isinstance(row, dict) else getattr(row, name, default)
+
+
+# items and inventory levels, newest change first
+class InventoryItemPagination(KeysetPagination):
+    ordering = ('-last_updated', '-id')
+
+
+# change log, newest entry first
+# When the detail rows run out, `next` continues into the daily rollups of the older,
+# pruned history (/api/changes/daily/?before=<day of the last row>). The list queryset
+# carries the oldest rollup day as `oldest_rollup_day` (see InventoryChangeLogViewSet),
+# so knowing whether there is anything to continue into costs no extra query.
+class InventoryChangeLogPagination(KeysetPagination):
+    ordering = ('-change_date', '-id')
+    rollup_field = 'oldest_rollup_day'
+    rollup_url_name = 'change-rollup-list'
+    forwarded_params = ('item', 'page_size')
+
+    def get_next_link(self):
+        link = super().get_next_link()
+        if link is not None or not self.page or self.ordering != type(self).ordering:
+            return link
+        last = self.page[-1]
+        oldest = _value(last, self.rollup_field)
+        before = timezone.localdate(_value(last, 'change_date'))
+        if oldest is None or oldest >= before:
+            return None
+        params = {name: self.request.query_params[name] for name in self.forwarded_params if name in self.request.query_params}
+        params['before'] = before.isoformat()
+        return reverse(self.rollup_url_name, request=self.request) + '?' + urlencode(params)
+
+
+# daily change log rollups, newest day first
+class InventoryChangeRollupPagination(KeysetPagination):
+    ordering = ('-day', '-id')
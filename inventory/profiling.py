@@ -0,0 +1,236 @@
+import atexit
+import contextvars
+import functools
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+from .rows import RowBuilder
+
+# Request profiling (opt-in with INVENTORY_PROFILING=True)
+# For every request the middleware records, per resolved endpoint (method + URL name):
+# SQL query count, DB time, serializer time (the DRF serializers, or the values()
+# row builder of the list fast path), render time and wall time. They are
+# returned in a Server-Timing header and kept in bounded per-endpoint sample windows,
+# which are written to INVENTORY_PROFILE_DIR (one file per process) for
+# `python manage.py profile_report`. Requests that run the same SQL template more
+# than INVENTORY_PROFILE_N_PLUS_ONE times are flagged as N+1 suspects.
+
+METRICS = ('wall', 'db', 'queries', 'serializer', 'render')
+MAX_SAMPLES = 2000
+FLUSH_EVERY = 100
+
+PLACEHOLDER_LIST_RE = re.compile(r'%s(?:\s*,\s*%s)+')
+NUMBER_RE = re.compile(r'\b\d+\b')
+
+_current = contextvars.ContextVar('inventory_profile', default=None)
+
+
+def sql_template(sql):
+    # queries are captured before parameter binding; only IN (...) lists and
+    # inlined numbers (LIMIT, OFFSET) vary between executions of the same template
+    return NUMBER_RE.sub('N', PLACEHOLDER_LIST_RE.sub('%s, ...', sql))
+
+
+class RequestProfile:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self.render = 0.0
+        self.render_started = None
+        self.templates = Counter()
+        self._serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+            self.templates[sql_template(sql)] += 1
+
+    def repeated_queries(self, threshold):
+        return {sql: count for sql, count in self.templates.items() if count > threshold}
+
+
+def _timed(function):
+    # serializer time of the current request; nested calls only count once
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return function(*args, **kwargs)
+        profile._serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profile._serializer_depth -= 1
+            if not profile._serializer_depth:
+                profile.serializer += time.perf_counter() - started
+    timed.profiled = True
+    return timed
+
+
+def install_serializer_timing():
+    # Serializer.data / ListSerializer.data, and RowBuilder.build for the list fast path (rows.py)
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.data.fget, 'profiled', False):
+            cls.data = property(_timed(cls.data.fget))
+    if not getattr(RowBuilder.build, 'profiled', False):
+        RowBuilder.build = _timed(RowBuilder.build)
+
+
+class EndpointStats:
+
+    def __init__(self):
+        self.count = 0
+        self.samples = {metric: deque(maxlen=MAX_SAMPLES) for metric in METRICS}
+        self.n_plus_one = 0
+        self.repeated = {}
+
+    def add(self, values, repeated):
+        self.count += 1
+        for metric in METRICS:
+            self.samples[metric].append(values[metric])
+        if repeated:
+            self.n_plus_one += 1
+            for sql, count in repeated.items():
+                self.repeated[sql] = max(count, self.repeated.get(sql, 0))
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'samples': {metric: list(values) for metric, values in self.samples.items()},
+            'n_plus_one': self.n_plus_one,
+            'repeated': self.repeated,
+        }
+
+
+class ProfileStore:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.endpoints = {}
+        self.lock = threading.Lock()
+        self.pending = 0
+
+    def add(self, endpoint, values, repeated):
+        with self.lock:
+            self.endpoints.setdefault(endpoint, EndpointStats()).add(values, repeated)
+            self.pending += 1
+            flush = self.pending >= FLUSH_EVERY
+        if flush:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            data = {'pid': os.getpid(), 'endpoints': {name: stats.as_dict() for name, stats in self.endpoints.items()}}
+            self.pending = 0
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'profile-{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as handle:
+            json.dump(data, handle)
+        os.replace(path + '.tmp', path)
+
+
+def endpoint_name(request):
+    match = request.resolver_match
+    if match is None:
+        return f'{request.method} <unresolved>'
+    return f'{request.method} {match.view_name or match._func_path}'
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INVENTORY_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'INVENTORY_PROFILE_N_PLUS_ONE', 5)
+        self.store = ProfileStore(str(getattr(settings, 'INVENTORY_PROFILE_DIR', 'profiles')))
+        atexit.register(self.store.flush)
+        install_serializer_timing()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        wall = time.perf_counter() - profile.started
+        repeated = profile.repeated_queries(self.threshold)
+        values = {
+            'wall': wall * 1000, 'db': profile.db * 1000, 'queries': profile.queries,
+            'serializer': profile.serializer * 1000, 'render': profile.render * 1000,
+        }
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={values["db"]:.2f};desc="{profile.queries} queries"',
+            f'serializer;dur={values["serializer"]:.2f}',
+            f'render;dur={values["render"]:.2f}',
+            f'total;dur={values["wall"]:.2f}',
+        ])
+        if repeated:
+            response['X-Inventory-N-Plus-One'] = str(max(repeated.values()))
+        self.store.add(endpoint_name(request), values, repeated)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns
+        profile = _current.get()
+        if profile is not None:
+            profile.render_started = time.perf_counter()
+
+            def rendered(response):
+                profile.render += time.perf_counter() - profile.render_started
+            response.add_post_render_callback(rendered)
+        return response
+
+
+def load_profiles(directory):
+    # merges the per-process files into {endpoint: {'count', 'samples', 'n_plus_one', 'repeated'}}
+    merged = {}
+    if not os.path.isdir(directory):
+        return merged
+    for filename in sorted(os.listdir(directory)):
+        if not (filename.startswith('profile-') and filename.endswith('.json')):
+            continue
+        with open(os.path.join(directory, filename)) as handle:
+            data = json.load(handle)
+        for name, stats in data['endpoints'].items():
+            target = merged.setdefault(name, {'count': 0, 'samples': {m: [] for m in METRICS}, 'n_plus_one': 0, 'repeated': {}})
+            target['count'] += stats['count']
+            target['n_plus_one'] += stats['n_plus_one']
+            for metric in METRICS:
+                target['samples'][metric].extend(stats['samples'].get(metric, []))
+            for sql, count in stats['repeated'].items():
+                target['repeated'][sql] = max(count, target['repeated'].get(sql, 0))
+    return merged
+
+
+def percentile(values, fraction):
+    # nearest-rank percentile
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # optional, FastJSONRenderer falls back to the stdlib encoder
+    orjson = None
+
+# Renderers for the streaming export endpoints
+# The export views stream their own body, these classes let DRF negotiate
+# ?format=csv / ?format=ndjson and render error responses in the same format.
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if rows and isinstance(rows[0], dict):
+            writer.writerow(rows[0].keys())
+            writer.writerows(row.values() for row in rows)
+        return buffer.getvalue().encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows).encode(self.charset)
+
+
+# JSONRenderer backed by orjson
+# Produces the same bytes as DRF's JSONRenderer for API data: compact separators,
+# UTF-8 text, U+2028/U+2029 escaped, and datetimes/Decimals/lazy strings handed
+# to DRF's encoder. Floats use orjson's shortest form (1e-05 is written 1e-5).
+# Falls back to JSONRenderer without orjson, for indented (browsable or
+# `; indent=` requests) or non-compact output, and for anything orjson rejects.
+class FastJSONRenderer(JSONRenderer):
+    encoder = encoders.JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder.default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,97 @@
+import os
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.utils import timezone
+from .cache import invalidate_owner
+from .exports import archive_changes
+from .models import InventoryChangeLog, InventoryChangeRollup
+
+# Change log retention
+# Detail rows older than the retention window are folded into one InventoryChangeRollup
+# per item and local day (opening/closing quantity, net change, count per change type),
+# optionally archived as gzipped NDJSON, then deleted. Days are processed one at a
+# time, each in its own transaction, so a run can be interrupted and resumed: a day
+# that is rolled up again (e.g. after --keep-detail) simply replaces its rollups.
+
+ROLLUP_CHUNK_SIZE = 2000
+ROLLUP_FIELDS = [
+    'owner', 'opening_quantity', 'closing_quantity', 'net_change',
+    'change_count', 'restock_count', 'sale_count', 'adjustment_count',
+]
+
+
+def day_bounds(day):
+    # [start, end) of a local day as aware datetimes
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def retention_cutoff(retention_days):
+    # first local day whose detail rows are kept
+    return timezone.localdate() - timedelta(days=retention_days)
+
+
+def pending_days(before):
+    # local days that still have detail rows, older than `before`, oldest first
+    end = day_bounds(before)[0]
+    start = None
+    while True:
+        rows = InventoryChangeLog.objects.filter(change_date__lt=end)
+        if start is not None:
+            rows = rows.filter(change_date__gte=start)
+        first = rows.order_by('change_date', 'id').values_list('change_date', flat=True).first()
+        if first is None:
+            return
+        day = timezone.localdate(first)
+        yield day
+        start = day_bounds(day)[1]
+
+
+def build_rollups(day, rows):
+    # rows: (item_id, owner_id, old_quantity, new_quantity, change_type) in change order per item
+    rollups = {}
+    for item_id, owner_id, old_quantity, new_quantity, change_type in rows:
+        rollup = rollups.get(item_id)
+        if rollup is None:
+            rollup = rollups[item_id] = InventoryChangeRollup(
+                item_id=item_id, owner_id=owner_id, day=day, opening_quantity=old_quantity,
+            )
+        rollup.closing_quantity = new_quantity
+        rollup.change_count += 1
+        counter = f'{change_type}_count'
+        if hasattr(rollup, counter):
+            setattr(rollup, counter, getattr(rollup, counter) + 1)
+    for rollup in rollups.values():
+        rollup.net_change = rollup.closing_quantity - rollup.opening_quantity
+    return list(rollups.values())
+
+
+def rollup_day(day, archive_dir=None, prune=True):
+    """
+    Roll the change log rows of one local day into daily rollups.
+
+    Writes them to <archive_dir>/changes-<day>.ndjson.gz first when archive_dir is
+    given and deletes them when prune is set. Returns (detail rows, rollups).
+    """
+    start, end = day_bounds(day)
+    details = InventoryChangeLog.objects.filter(change_date__gte=start, change_date__lt=end)
+    rows = details.order_by('item_id', 'change_date', 'id').values_list(
+        'item_id', 'item__owner_id', 'old_quantity', 'new_quantity', 'change_type',
+    )
+    rollups = build_rollups(day, rows.iterator(chunk_size=ROLLUP_CHUNK_SIZE))
+    if not rollups:
+        return 0, 0
+    if archive_dir:
+        os.makedirs(archive_dir, exist_ok=True)
+        archive_changes(details, os.path.join(archive_dir, f'changes-{day.isoformat()}.ndjson.gz'))
+
+    with transaction.atomic():
+        InventoryChangeRollup.objects.bulk_create(
+            rollups, batch_size=1000, update_conflicts=True,
+            unique_fields=['item', 'day'], update_fields=ROLLUP_FIELDS,
+        )
+        count = details.delete()[0] if prune else sum(rollup.change_count for rollup in rollups)
+        # cached /api/changes/ pages (and their next links) are stale now
+        for owner_id in {rollup.owner_id for rollup in rollups}:
+            invalidate_owner(owner_id)
+    return count, len(rollups)
@@ -0,0 +1,180 @@
+from functools import lru_cache
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import empty
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from .serializers import requested_fields
+
+# Read-only row builders
+# ModelSerializer spends most of a large list in per-field machinery. For read-only
+# lists and exports the rows are fetched with values() and turned into the same
+# dicts the API serializers produce: same keys in the same order, Decimal and
+# datetime values formatted by the serializer's own fields.
+
+# (output name, ORM lookup), in the serializers' field order; a tuple of such pairs
+# as the lookup makes the column a nested object (?expand=)
+ITEM_COLUMNS = (
+    ('id', 'id'), ('name', 'name'), ('description', 'description'), ('quantity', 'quantity'),
+    ('price', 'price'), ('category', 'category'), ('reorder_threshold', 'reorder_threshold'),
+    ('below_threshold', 'below_threshold'), ('date_added', 'date_added'),
+    ('last_updated', 'last_updated'), ('owner', 'owner__username'),
+)
+CHANGE_COLUMNS = (
+    ('id', 'id'), ('item', 'item_id'), ('changed_by', 'changed_by__username'), ('old_quantity', 'old_quantity'),
+    ('new_quantity', 'new_quantity'), ('change_type', 'change_type'), ('change_date', 'change_date'),
+)
+# inventory levels with ?as_of=: quantity at that time (inventory/snapshots.py)
+AS_OF_ITEM_COLUMNS = tuple(
+    (name, 'quantity_as_of' if name == 'quantity' else lookup) for name, lookup in ITEM_COLUMNS
+)
+# ?expand=item on the change log (ChangeItemSerializer), joined in the same query
+CHANGE_ITEM_COLUMNS = (('id', 'item_id'), ('name', 'item__name'), ('category', 'item__category'))
+ROLLUP_COLUMNS = (
+    ('id', 'id'), ('item', 'item_id'), ('day', 'day'), ('opening_quantity', 'opening_quantity'),
+    ('closing_quantity', 'closing_quantity'), ('net_change', 'net_change'), ('change_count', 'change_count'),
+    ('restock_count', 'restock_count'), ('sale_count', 'sale_count'), ('adjustment_count', 'adjustment_count'),
+)
+
+
+def _iso_datetime(field):
+    # DateTimeField.to_representation resolves the current timezone for every value;
+    # for the default ISO 8601 output do that once per batch, with the same result
+    if getattr(field, 'format', api_settings.DATETIME_FORMAT) != ISO_8601 or hasattr(field, 'timezone'):
+        return field.to_representation
+    field_timezone = field.default_timezone()
+    if field_timezone is None:
+        return field.to_representation
+
+    def to_representation(value):
+        if isinstance(value, str) or value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return to_representation
+
+
+def column_formatters(fields, columns):
+    # Decimal, date and datetime columns go through the serializer field, everything else is passed through.
+    # Call per request/export: datetime output depends on the active timezone.
+    formatters = []
+    for name, _ in columns:
+        field = fields.get(name)
+        if isinstance(field, serializers.DateTimeField):
+            formatters.append(_iso_datetime(field))
+        elif isinstance(field, (serializers.DecimalField, serializers.DateField)):
+            formatters.append(field.to_representation)
+        else:
+            formatters.append(None)
+    return formatters
+
+
+def _omitted_when_null(field):
+    # a field read through a relation (changed_by.username) is left out of the
+    # serializer's output when the relation is null, not rendered as null
+    return (
+        field is not None and len(getattr(field, 'source_attrs', ())) > 1
+        and not field.required and field.default is empty and not field.allow_null
+    )
+
+
+class RowBuilder:
+
+    def __init__(self, serializer_class, columns):
+        self.fields = serializer_class().fields
+        self.names = [name for name, _ in columns]
+        # nested columns take the value of their first lookup here, build() swaps in the object
+        self.lookups = [lookup[0][1] if isinstance(lookup, tuple) else lookup for _, lookup in columns]
+        self.nested = [(name, lookup) for name, lookup in columns if isinstance(lookup, tuple)]
+        self.query_lookups = [
+            *self.lookups, *(nested_lookup for _, lookups in self.nested for _, nested_lookup in lookups)
+        ]
+        self.columns = columns
+        self.optional = [name for name in self.names if _omitted_when_null(self.fields.get(name))]
+
+    def values(self, queryset, extra=()):
+        # annotations the ordering may need (search relevance) and `extra` lookups (the
+        # paginator's keys) are selected too, without being part of the rows
+        return queryset.values(*dict.fromkeys([*self.query_lookups, *extra, *queryset.query.annotations]))
+
+    def build(self, rows):
+        # rows: dicts from values()
+        columns = list(zip(self.names, self.lookups, column_formatters(self.fields, self.columns)))
+        if self.nested:
+            rows = list(rows)
+        built = [
+            {name: row[lookup] if formatter is None or row[lookup] is None else formatter(row[lookup])
+             for name, lookup, formatter in columns}
+            for row in rows
+        ]
+        # nested values are passed through unformatted (no Decimal or datetime fields so far)
+        for name, lookups in self.nested:
+            for result, row in zip(built, rows):
+                result[name] = {nested_name: row[lookup] for nested_name, lookup in lookups}
+        for name in self.optional:
+            for result in built:
+                if result[name] is None:
+                    del result[name]
+        return built
+
+
+@lru_cache(maxsize=None)
+def row_builder(serializer_class, columns):
+    return RowBuilder(serializer_class, columns)
+
+
+# Sparse fieldsets for viewsets
+# ?fields= / ?omit= / ?expand= (serializers.requested_fields) on reads: the serializer
+# drops the other fields and the list queries select only the kept columns, plus the
+# ones the keyset paginator reads from every row. Writes always use every field.
+class SparseFieldsMixin:
+    # {field name: nested columns} for ?expand=, see CHANGE_ITEM_COLUMNS
+    expanded_columns = {}
+
+    def get_requested_fields(self):
+        if not hasattr(self, '_requested_fields'):
+            if self.request.method in SAFE_METHODS:
+                self._requested_fields = requested_fields(self.request.query_params, self.get_serializer_class())
+            else:
+                self._requested_fields = (None, [])
+        return self._requested_fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.get_requested_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        if expand:
+            kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def sparse_columns(self, columns):
+        fields, expand = self.get_requested_fields()
+        return tuple(
+            (name, self.expanded_columns[name] if name in expand else lookup)
+            for name, lookup in columns if fields is None or name in fields
+        )
+
+    def get_key_lookups(self, queryset):
+        # fields the cursor is made of: the applied and the default ordering, and the id
+        ordering = [*queryset.query.order_by, *(getattr(self.paginator, 'ordering', None) or ())]
+        keys = ['id', *(field.lstrip('-') for field in ordering if isinstance(field, str))]
+        return [key for key in dict.fromkeys(keys) if key != 'pk' and key not in queryset.query.annotations]
+
+
+# List fast path for read-only viewsets
+# `list_columns` must produce exactly the fields of the viewset's serializer;
+# retrieve and every other action keep using the serializer.
+class ValuesListMixin(SparseFieldsMixin):
+    list_columns = None
+
+    def get_list_columns(self):
+        return self.list_columns
+
+    def list(self, request, *args, **kwargs):
+        builder = row_builder(self.get_serializer_class(), self.sparse_columns(self.get_list_columns()))
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = builder.values(queryset, self.get_key_lookups(queryset))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(builder.build(page))
+        return Response(builder.build(queryset))
@@ -0,0 +1,159 @@
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+# Full-text search for inventory items
+# SearchFilter turns ?search= into LIKE '%term%' on every search field, which always
+# scans the whole table. The backends below use an inverted index instead, so the
+# cost depends on the number of matches. Selected with settings.INVENTORY_SEARCH_BACKEND
+# (dotted path), by default picked from the database vendor.
+
+FTS_TABLE = 'inventory_item_fts'
+ITEM_TABLE = 'inventory_inventoryitem'
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# external content FTS5 table over name/description/category, the triggers keep it
+# in sync with every insert, update and delete (including bulk writes and the admin)
+SQLITE_FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description, category,
+        content='{ITEM_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {ITEM_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {ITEM_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+    END""",
+    # quantity/price updates don't touch the text columns, so they skip the index
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, description, category ON {ITEM_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+        INSERT INTO {FTS_TABLE}(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END""",
+]
+
+
+def install_search_index(schema_editor):
+    # Safe to call again: SQLite drops the triggers whenever a migration remakes
+    # the item table, so migrations that alter InventoryItem run this afterwards,
+    # each from its own copy (see 0003_item_search_index): never import it there.
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            try:
+                cursor.execute(SQLITE_FTS_SQL[0])
+            except Exception:
+                # SQLite built without FTS5, searches fall back to SearchFilter
+                return
+            for statement in SQLITE_FTS_SQL[1:]:
+                cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif vendor == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+        from .models import InventoryItem
+        index = GinIndex(PostgresSearchBackend.vector(), name='item_search_vector_idx')
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [index.name])
+            if cursor.fetchone() is None:
+                schema_editor.add_index(InventoryItem, index)
+
+
+def uninstall_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS item_search_vector_idx")
+
+
+# Backends
+# search() returns the queryset restricted to the matches and annotated with
+# `search_rank`, lower is more relevant
+class SQLiteFTSSearchBackend:
+
+    def is_available(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+            return cursor.fetchone() is not None
+
+    def search(self, queryset, terms):
+        # every term must match, each one as a prefix ("lap" finds "laptop")
+        match = ' '.join('"%s"*' % term for term in terms)
+        matches = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        rank = RawSQL(
+            f'SELECT rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = "{ITEM_TABLE}"."id"',
+            [match], output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank)
+
+
+class PostgresSearchBackend:
+
+    @staticmethod
+    def vector():
+        from django.contrib.postgres.search import SearchVector
+        return SearchVector('name', 'description', 'category', config='simple')
+
+    def is_available(self):
+        return True
+
+    def search(self, queryset, terms):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        query = SearchQuery(' & '.join('%s:*' % term for term in terms), search_type='raw', config='simple')
+        vector = self.vector()
+        return (
+            queryset.annotate(search_vector=vector)
+            .filter(search_vector=query)
+            .annotate(search_rank=SearchRank(vector, query) * -1)
+        )
+
+
+BACKENDS = {
+    'sqlite': 'inventory.search.SQLiteFTSSearchBackend',
+    'postgresql': 'inventory.search.PostgresSearchBackend',
+}
+
+_available = {}
+
+
+def get_search_backend():
+    path = getattr(settings, 'INVENTORY_SEARCH_BACKEND', None) or BACKENDS.get(connection.vendor)
+    if not path:
+        return None
+    key = (path, str(connection.settings_dict['NAME']))
+    if key not in _available:
+        backend = import_string(path)()
+        _available[key] = backend if backend.is_available() else None
+    return _available[key]
+
+
+# Drop-in replacement for SearchFilter on the item viewsets
+# uses the full-text backend when one is available and falls back to the
+# icontains search over `search_fields` otherwise. Without an explicit
+# ?ordering= the results come back by relevance.
+class InventorySearchFilter(SearchFilter):
+
+    def filter_queryset(self, request, queryset, view):
+        terms = [token for term in self.get_search_terms(request) for token in TOKEN_RE.findall(term)]
+        if not terms:
+            return super().filter_queryset(request, queryset, view)
+        backend = get_search_backend()
+        if backend is None:
+            return super().filter_queryset(request, queryset, view)
+        queryset = backend.search(queryset, terms)
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by('search_rank', 'id')
+        return queryset
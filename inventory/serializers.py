@@ -1,11 +1,106 @@
 from rest_framework import serializers
-from .models import InventoryItem, InventoryChangeLog
+from .categories import category_parts, MAX_DEPTH
+from .models import (
+    Category, InventoryItem, InventoryChangeLog, InventoryChangeRollup, InventorySummary, CategorySummary, CategoryThreshold,
+    StockAlert, CHANGE_TYPES,
+)
 from django.contrib.auth import get_user_model
 from rest_framework.validators import UniqueValidator
 
 User = get_user_model()
 
-class InventoryItemSerializer(serializers.ModelSerializer):
+# Related objects a serializer reads
+# list views pass their queryset through setup_eager_loading(), so the related
+# rows are loaded with the page instead of one query per serialized row
+class EagerLoadingMixin:
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+
+# Sparse fieldsets and expansions on reads
+# ?fields=id,name keeps only those fields, ?omit=description drops some, ?expand=item
+# inlines a related object where the serializer offers it (expandable_fields).
+# The views also narrow the SQL to the kept fields (see rows.SparseFieldsMixin).
+def requested_fields(params, serializer_class):
+    """
+    Parse ?fields=, ?omit= and ?expand= for `serializer_class`.
+
+    Returns (fields, expand): the kept field names in the serializer's order, or
+    None when no field was left out, and the expanded names. Unknown names raise
+    ValidationError.
+    """
+    def names(param):
+        return [name.strip() for name in params.get(param, '').split(',') if name.strip()]
+
+    available = serializer_class.Meta.fields
+    expandable = getattr(serializer_class, 'expandable_fields', {})
+    fields, omit, expand = names('fields'), names('omit'), names('expand')
+    errors = {}
+    for param, values, choices in (('fields', fields, available), ('omit', omit, available), ('expand', expand, expandable)):
+        unknown = [name for name in values if name not in choices]
+        if unknown:
+            choose = f" Choose from: {', '.join(choices)}." if choices else ""
+            errors[param] = [f"Unknown field(s): {', '.join(unknown)}.{choose}"]
+    if errors:
+        raise serializers.ValidationError(errors)
+    if not fields and not omit:
+        return None, expand
+    kept = [name for name in available if (not fields or name in fields) and name not in omit]
+    if not kept:
+        raise serializers.ValidationError({'fields': ["No fields left to return."]})
+    return kept, expand
+
+
+class DynamicFieldsMixin:
+    # {field name: serializer class} of the relations ?expand= can inline
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in expand:
+            self.fields[name] = self.expandable_fields[name](read_only=True)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+# Item field rules
+# shared by InventoryItemSerializer and the bulk importer, which validates rows
+# without building a serializer per row
+def validate_item_name(value):
+    if not value.strip():
+        raise serializers.ValidationError('Name is required.')
+    return value
+
+
+def validate_item_quantity(value):
+    if value < 0:
+        raise serializers.ValidationError('Quantity cannot be negative.')
+    return value
+
+
+def validate_item_price(value):
+    if value < 0:
+        raise serializers.ValidationError('Price cannot be negative.')
+    return value
+
+
+def validate_item_category(value):
+    if len(category_parts(value)) > MAX_DEPTH:
+        raise serializers.ValidationError(f'Categories nest at most {MAX_DEPTH} levels deep.')
+    return value
+
+
+class InventoryItemSerializer(DynamicFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('owner',)
     owner = serializers.ReadOnlyField(source='owner.username')
     date_added = serializers.DateTimeField(read_only=True)
     last_updated = serializers.DateTimeField(read_only=True)
@@ -14,30 +109,68 @@ class InventoryItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = InventoryItem
         fields = [
-            'id', 'name', 'description', 'quantity', 'price', 'category',
+            'id', 'name', 'description', 'quantity', 'price', 'category', 'reorder_threshold', 'below_threshold',
             'date_added', 'last_updated', 'owner'
         ]
 
     # Field-level validations
     def validate_name(self, value):
-        if not value.strip():
-            raise serializers.ValidationError('Name is required.')
-        return value
+        return validate_item_name(value)
 
     def validate_quantity(self, value):
-        if value < 0:
-            raise serializers.ValidationError('Quantity cannot be negative.')
-        return value
+        return validate_item_quantity(value)
 
     def validate_price(self, value):
-        if value < 0:
-            raise serializers.ValidationError('Price cannot be negative.')
+        return validate_item_price(value)
+
+    def validate_category(self, value):
+        return validate_item_category(value)
+
+# serializer for the bulk items endpoint
+# only checks the envelope, each row is validated with InventoryItemSerializer
+class InventoryItemBulkSerializer(serializers.Serializer):
+    create = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    update = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    delete = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def validate(self, attrs):
+        if not (attrs['create'] or attrs['update'] or attrs['delete']):
+            raise serializers.ValidationError('Nothing to do, provide create, update or delete rows.')
+        return attrs
+
+# serializer for stock movements
+# a signed delta applied to the current quantity, change_type is inferred from the sign if omitted
+class StockAdjustmentSerializer(serializers.Serializer):
+    delta = serializers.IntegerField()
+    change_type = serializers.ChoiceField(choices=CHANGE_TYPES, required=False)
+
+    def validate_delta(self, value):
+        if value == 0:
+            raise serializers.ValidationError('Delta cannot be zero.')
         return value
-    
+
+
+# one row of a multi-item stock movement
+class StockAdjustmentItemSerializer(StockAdjustmentSerializer):
+    item = serializers.IntegerField()
+
+
+class StockAdjustmentBatchSerializer(serializers.Serializer):
+    adjustments = StockAdjustmentItemSerializer(many=True, allow_empty=False)
+
+# the item of a change log row with ?expand=item
+class ChangeItemSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = InventoryItem
+        fields = ['id', 'name', 'category']
+
 # serializer for inventory Change logs
 # read-only, Display changes made to inventory items
 # shows the user who made the change & the item affected
-class InventoryChangeLogSerializer(serializers.ModelSerializer):
+class InventoryChangeLogSerializer(DynamicFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('changed_by',)
+    expandable_fields = {'item': ChangeItemSerializer}
     item = serializers.PrimaryKeyRelatedField(read_only=True)
     changed_by = serializers.ReadOnlyField(source='changed_by.username')
 
@@ -47,13 +180,76 @@ class InventoryChangeLogSerializer(serializers.ModelSerializer):
             'id', 'item', 'changed_by', 'old_quantity', 'new_quantity', 'change_type', 'change_date'
         ]
 
+# serializer for the daily change log rollups (history older than the retention window)
+class InventoryChangeRollupSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    item = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    class Meta:
+        model = InventoryChangeRollup
+        fields = [
+            'id', 'item', 'day', 'opening_quantity', 'closing_quantity', 'net_change',
+            'change_count', 'restock_count', 'sale_count', 'adjustment_count',
+        ]
+
+# serializers for the inventory summary endpoint
+# read-only, values come from the incrementally maintained counters
+class CategorySummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CategorySummary
+        fields = ['category', 'sku_count', 'total_units', 'stock_value', 'low_stock_count']
+
+
+class InventorySummarySerializer(serializers.ModelSerializer):
+    categories = serializers.SerializerMethodField()
+
+    class Meta:
+        model = InventorySummary
+        fields = ['sku_count', 'total_units', 'stock_value', 'low_stock_count', 'updated_at', 'categories']
+
+    def get_categories(self, obj):
+        # async views load the rows themselves and pass them in the context
+        categories = self.context.get('categories')
+        if categories is None:
+            categories = CategorySummary.objects.filter(owner_id=obj.owner_id, sku_count__gt=0)
+        return CategorySummarySerializer(categories, many=True).data
+
+# Item category with its stored item count and the count of its whole subtree
+# (context['subtree_counts'], see inventory.categories.subtree_counts)
+class CategorySerializer(serializers.ModelSerializer):
+    depth = serializers.IntegerField(read_only=True)
+    subtree_item_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'full_name', 'parent', 'depth', 'item_count', 'subtree_item_count']
+
+    def get_subtree_item_count(self, obj):
+        return self.context.get('subtree_counts', {}).get(obj.pk, obj.item_count)
+
+
+# Reorder threshold shared by the items of a category
+class CategoryThresholdSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CategoryThreshold
+        fields = ['id', 'category', 'threshold']
+
+
+# Stock alert feed entries
+class StockAlertSerializer(serializers.ModelSerializer):
+    item_name = serializers.ReadOnlyField(source='item.name')
+
+    class Meta:
+        model = StockAlert
+        fields = ['id', 'item', 'item_name', 'kind', 'quantity', 'threshold', 'created_at']
+
+
 # Serializer for Users
 # Admin-facing to manage users
 # Only includes basic fields for display and management
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'is_staff']
+        fields = ['id', 'username', 'email', 'is_staff', 'is_active']
 
 class UserRegisterSerializer(serializers.ModelSerializer):
     # ensure username is required and unique across all users
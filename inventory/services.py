@@ -0,0 +1,347 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ValidationError
+from .cache import invalidate_owner
+from .categories import categorize, category_key
+from .changelog import changelog_mode, defer_changes
+from .events import publish_writes
+from .models import (
+    Category, InventoryItem, InventoryChangeLog, InventorySummary, CategorySummary, CategoryThreshold, StockAlert,
+    LOW_STOCK_THRESHOLD,
+)
+
+# bulk_update builds one CASE WHEN per column with a branch per row,
+# small batches keep each statement cheap to evaluate
+BULK_UPDATE_BATCH_SIZE = 100
+
+# Shared write path for inventory items
+# Views (single item, bulk, ...) go through these helpers so every item
+# write produces its InventoryChangeLog rows and summary counter updates
+# in the same transaction
+
+
+def change_type_for(old_quantity, new_quantity):
+    # define change from the quantity movement
+    if new_quantity > old_quantity:
+        return "restock"
+    if new_quantity < old_quantity:
+        return "sale"
+    return "adjustment"
+
+
+def log_changes(user, changes):
+    # changes is an iterable of (item, old_quantity, new_quantity, change_type)
+    # all rows are written with a single bulk insert, or handed to the background
+    # writer (inventory/changelog.py) outside the sync mode, then nothing is returned
+    if changelog_mode() != 'sync':
+        defer_changes(user, changes)
+        return []
+    logs = [
+        InventoryChangeLog(
+            item=item,
+            changed_by=user,
+            old_quantity=old_quantity,
+            new_quantity=new_quantity,
+            change_type=change_type,
+        )
+        for item, old_quantity, new_quantity, change_type in changes
+    ]
+    if logs:
+        InventoryChangeLog.objects.bulk_create(logs)
+    return logs
+
+
+def item_state(item):
+    # the fields the summary counters depend on; below_threshold as stored, sync_thresholds
+    # moves the low stock count when it flips
+    return (item.category, item.quantity, item.price, item.below_threshold)
+
+
+def _summary_delta(transitions):
+    # per category [sku_count, total_units, stock_value, low_stock_count] deltas
+    deltas = {}
+    for before, after in transitions:
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None:
+                continue
+            category, quantity, price, below = state
+            delta = deltas.setdefault(category, [0, 0, Decimal(0), 0])
+            delta[0] += sign
+            delta[1] += sign * quantity
+            delta[2] += sign * quantity * Decimal(price)
+            delta[3] += sign * below
+    return {category: delta for category, delta in deltas.items() if any(delta)}
+
+
+def _apply_counters(model, lookup, delta, **extra):
+    values = dict(
+        sku_count=F('sku_count') + delta[0],
+        total_units=F('total_units') + delta[1],
+        stock_value=F('stock_value') + delta[2],
+        low_stock_count=F('low_stock_count') + delta[3],
+        **extra
+    )
+    # F() updates are atomic, the row is only created the first time
+    if not model.objects.filter(**lookup).update(**values):
+        model.objects.bulk_create([model(**lookup)], ignore_conflicts=True)
+        model.objects.filter(**lookup).update(**values)
+
+
+def update_summaries(owner_id, transitions):
+    """
+    Apply item writes to the owner's summary counters.
+
+    transitions: iterable of (before, after) item states (see item_state),
+    before is None for a created item and after is None for a deleted one
+    """
+    _apply_deltas(owner_id, _summary_delta(transitions))
+
+
+def _apply_deltas(owner_id, deltas):
+    # {category: [sku_count, total_units, stock_value, low_stock_count]} deltas
+    if not deltas:
+        return
+    total = [sum(column) for column in zip(*deltas.values())]
+    _apply_counters(InventorySummary, {'owner_id': owner_id}, total, updated_at=timezone.now())
+    for category, delta in sorted(deltas.items()):
+        _apply_counters(CategorySummary, {'owner_id': owner_id, 'category': category}, delta)
+        if category and delta[0]:
+            Category.objects.filter(owner_id=owner_id, key=category_key(category)).update(
+                item_count=F('item_count') + delta[0]
+            )
+
+
+def category_thresholds(owner_id, categories):
+    # {category: threshold} for the categories that have one configured
+    return dict(
+        CategoryThreshold.objects.filter(owner_id=owner_id, category__in=set(categories))
+        .values_list('category', 'threshold')
+    )
+
+
+def effective_threshold(item, thresholds):
+    if item.reorder_threshold is not None:
+        return item.reorder_threshold
+    return thresholds.get(item.category, LOW_STOCK_THRESHOLD)
+
+
+def sync_thresholds(user, items):
+    """
+    Bring below_threshold up to date for items that were just written.
+
+    `items` must carry their stored below_threshold. Items that cross their
+    threshold get the flag flipped (one UPDATE per direction), a StockAlert and
+    the summaries' low_stock_count moved. Returns the alerts.
+    """
+    items = [item for item in items if item.pk is not None]
+    needs_category = [item.category for item in items if item.reorder_threshold is None]
+    thresholds = category_thresholds(user.pk, needs_category) if needs_category else {}
+
+    flipped = {True: [], False: []}
+    # per category low_stock_count deltas
+    low_stock = {}
+    alerts = []
+    for item in items:
+        threshold = effective_threshold(item, thresholds)
+        below = item.quantity < threshold
+        if below != item.below_threshold:
+            item.below_threshold = below
+            flipped[below].append(item.pk)
+            low_stock[item.category] = low_stock.get(item.category, 0) + (1 if below else -1)
+            alerts.append(StockAlert(
+                owner=user, item=item, kind="low" if below else "restocked",
+                quantity=item.quantity, threshold=threshold,
+            ))
+    for below, ids in flipped.items():
+        if ids:
+            # update() leaves last_updated alone, the write that caused this already set it
+            InventoryItem.objects.filter(pk__in=ids).update(below_threshold=below)
+    _apply_deltas(user.pk, {category: [0, 0, Decimal(0), count] for category, count in low_stock.items() if count})
+    if alerts:
+        StockAlert.objects.bulk_create(alerts)
+    return alerts
+
+
+def refresh_category_thresholds(user, categories, chunk_size=1000):
+    # a category threshold changed: re-evaluate the items that inherit it
+    items = (
+        InventoryItem.objects.filter(owner=user, category__in=set(categories), reorder_threshold__isnull=True)
+        # name: the alert events show it
+        .only('id', 'name', 'category', 'quantity', 'reorder_threshold', 'below_threshold')
+        .order_by('pk')
+    )
+    chunk = []
+    alerts = []
+    for item in items.iterator(chunk_size=chunk_size):
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            alerts.extend(sync_thresholds(user, chunk))
+            chunk = []
+    alerts.extend(sync_thresholds(user, chunk))
+    invalidate_owner(user.pk)
+    publish_writes(user, alerts=alerts)
+
+
+def record_item_writes(user, transitions, changes, items=(), deleted=(), changed_by=None):
+    # everything that has to happen in the same transaction as an item write
+    # (the cache invalidation and the event stream run once it commits)
+    # user: the items' owner; changed_by: who made the change, when not the owner (admin)
+    # items: the created/updated instances, for the reorder threshold state
+    # deleted: ids of the deleted items
+    logs = log_changes(changed_by or user, changes)
+    update_summaries(user.pk, transitions)
+    alerts = sync_thresholds(user, items)
+    invalidate_owner(user.pk)
+    publish_writes(user, items, logs, alerts, deleted)
+
+
+def summary_rows(items):
+    """
+    Recompute summary counters from scratch for an item queryset.
+
+    Streams the items, returns {(owner_id, category): [sku_count, total_units, stock_value, low_stock_count]}
+    """
+    rows = {}
+    columns = items.values_list('owner_id', 'category', 'quantity', 'price', 'below_threshold')
+    for owner_id, category, quantity, price, below in columns.iterator(chunk_size=2000):
+        row = rows.setdefault((owner_id, category), [0, 0, Decimal(0), 0])
+        row[0] += 1
+        row[1] += quantity
+        row[2] += quantity * price
+        row[3] += below
+    return rows
+
+
+def apply_bulk(user, creates=(), updates=(), deletes=(), classify=change_type_for, changed_by=None):
+    """
+    Apply a validated batch of item writes in one transaction.
+
+    creates: list of validated field dicts
+    updates: list of (item, validated field dicts), items already fetched for `user`
+    deletes: list of items owned by `user`
+    classify: picks the change log type of an update from (old_quantity, new_quantity)
+    changed_by: logged as the author of the changes instead of `user` (admin edits)
+
+    The updated and deleted rows are locked and re-read first, so the change log and
+    the counters start from their current values rather than from the instances passed
+    in; raises NotFound if one of them is gone. Returns (created, updated, deleted ids).
+    """
+    now = timezone.now()
+    changes = []
+    transitions = []
+
+    with transaction.atomic():
+        # lock in pk order so two batches touching the same items can't deadlock
+        ids = sorted({item.pk for item, _ in updates} | {item.pk for item in deletes})
+        locked = {}
+        if ids:
+            locked = {
+                item.pk: item
+                for item in InventoryItem.objects.select_for_update().filter(owner=user, pk__in=ids).order_by('pk')
+            }
+            missing = set(ids) - set(locked)
+            if missing:
+                raise NotFound(detail=f"Item not found: {', '.join(str(i) for i in sorted(missing))}.")
+            for item in locked.values():
+                item.owner = user
+
+        # category strings -> the owner's categories, one lookup for the whole batch
+        categorize(user.pk, [*creates, *(data for _, data in updates)])
+        created = [InventoryItem(owner=user, **data) for data in creates]
+        if created:
+            InventoryItem.objects.bulk_create(created)
+            changes.extend((item, 0, item.quantity, "restock") for item in created)
+            transitions.extend((None, item_state(item)) for item in created)
+
+        updated = []
+        update_fields = {"last_updated"}
+        for stale, data in updates:
+            item = locked[stale.pk]
+            old_quantity = item.quantity
+            before = item_state(item)
+            for attr, value in data.items():
+                # only write columns that change, untouched text columns skip the search index triggers
+                if getattr(item, attr) != value:
+                    setattr(item, attr, value)
+                    update_fields.add(attr)
+            # bulk_update skips auto_now, so stamp last_updated here
+            item.last_updated = now
+            updated.append(item)
+            changes.append((item, old_quantity, item.quantity, classify(old_quantity, item.quantity)))
+            transitions.append((before, item_state(item)))
+        if updated:
+            # an UPDATE, never an upsert: it can't bring back a row deleted in the meantime
+            InventoryItem.objects.bulk_update(updated, sorted(update_fields), batch_size=BULK_UPDATE_BATCH_SIZE)
+
+        deletes = [locked[item.pk] for item in deletes]
+        deleted = [item.pk for item in deletes]
+        if deleted:
+            InventoryItem.objects.filter(owner=user, pk__in=deleted).delete()
+            transitions.extend((item_state(item), None) for item in deletes)
+
+        record_item_writes(user, transitions, changes, items=created + updated, deleted=deleted, changed_by=changed_by)
+
+    return created, updated, deleted
+
+
+def adjust_stock(user, adjustments):
+    """
+    Apply signed quantity deltas atomically.
+
+    adjustments: list of (item_id, delta, change_type), change_type may be None
+    The delta is applied in the database (F('quantity') + delta) while the rows
+    are locked, so concurrent workers never lose updates. Returns the items with
+    their new quantities; raises ValidationError if any quantity would go negative.
+    """
+    totals = {}
+    for item_id, delta, _ in adjustments:
+        totals[item_id] = totals.get(item_id, 0) + delta
+    ids = sorted(totals)
+
+    with transaction.atomic():
+        # lock in pk order so two batches touching the same items can't deadlock
+        locked = list(
+            InventoryItem.objects.select_for_update()
+            .filter(owner=user, pk__in=ids).order_by('pk').values_list('pk', flat=True)
+        )
+        missing = set(ids) - set(locked)
+        if missing:
+            raise NotFound(detail=f"Item not found: {', '.join(str(i) for i in sorted(missing))}.")
+
+        if len(ids) == 1:
+            delta = Value(totals[ids[0]])
+        else:
+            delta = Case(
+                *[When(pk=item_id, then=Value(total)) for item_id, total in totals.items()],
+                output_field=IntegerField(),
+            )
+        InventoryItem.objects.filter(pk__in=ids).update(quantity=F('quantity') + delta, last_updated=timezone.now())
+
+        # read back inside the same transaction, the rows are still ours
+        items = InventoryItem.objects.filter(pk__in=ids).in_bulk()
+        for item in items.values():
+            item.owner = user
+        negative = sorted(pk for pk, item in items.items() if item.quantity < 0)
+        if negative:
+            # raising rolls the update back
+            raise ValidationError({"quantity": [f"Quantity cannot go negative for item {pk}." for pk in negative]})
+
+        # replay the deltas in request order to get each log row's old/new values
+        running = {pk: items[pk].quantity - total for pk, total in totals.items()}
+        transitions = [
+            ((items[pk].category, running[pk], items[pk].price, items[pk].below_threshold), item_state(items[pk]))
+            for pk in ids
+        ]
+        changes = []
+        for item_id, delta, change_type in adjustments:
+            old_quantity = running[item_id]
+            running[item_id] = old_quantity + delta
+            changes.append((
+                items[item_id], old_quantity, running[item_id],
+                change_type or change_type_for(old_quantity, running[item_id]),
+            ))
+        record_item_writes(user, transitions, changes, items=items.values())
+
+    return [items[pk] for pk in ids]
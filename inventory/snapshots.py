@@ -0,0 +1,111 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.db import transaction
+from django.db.models import F, Subquery, OuterRef
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .cache import invalidate_owner
+from .models import InventoryItem, InventoryChangeLog, InventoryChangeRollup, InventoryCheckpoint, InventorySnapshot
+
+# Point-in-time quantities
+# The quantity of an item at T is, in order of preference:
+#   1. new_quantity of its last change between the owner's latest checkpoint before T and T
+#   2. closing_quantity of its last rolled-up day (rollup_changes) that ended by T, if
+#      that day ended after the checkpoint
+#   3. its quantity in that checkpoint
+#   4. opening_quantity of its first rolled-up day from T's day on
+#   5. old_quantity of its first change after T (no checkpoint yet)
+#   6. its current quantity (never changed since)
+# Pruned days only leave their rollups, so inside one of them the answer is the quantity
+# at the start of that day. Each step is one index seek per item (change_item_date_idx,
+# rollup_item_day_idx, unique_checkpoint_item), so a historical page costs the same as a
+# current one however long the history is. The checkpoint is looked up first, the rest
+# is subqueries of the item query.
+
+SNAPSHOT_CHUNK_SIZE = 2000
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def parse_as_of(value):
+    # ISO 8601 timestamp, or a date meaning the end of that day; naive values are local time
+    # (dates first: parse_datetime takes a bare date as its midnight on Python 3.11+)
+    try:
+        day = parse_date(value)
+        moment = datetime.combine(day, time.max) if day is not None else parse_datetime(value)
+    except ValueError:
+        # well formed but not a real date
+        return None
+    if moment is None:
+        return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def quantity_as_of(owner_id, at, exclude_checkpoint=None):
+    # expression for InventoryItem querysets of one owner
+    checkpoints = InventoryCheckpoint.objects.filter(owner_id=owner_id, taken_at__lte=at).order_by('-taken_at')
+    if exclude_checkpoint is not None:
+        # the checkpoint being built
+        checkpoints = checkpoints.exclude(pk=exclude_checkpoint.pk)
+    checkpoint = checkpoints.values_list('id', 'taken_at').first()
+    checkpoint_at = checkpoint[1] if checkpoint is not None else EPOCH
+    changes = InventoryChangeLog.objects.filter(item=OuterRef('pk'))
+    replayed = changes.filter(change_date__gt=checkpoint_at, change_date__lte=at).order_by('-change_date', '-id')
+    # the local days that ended by `at` (a date as_of is the last moment of its day)
+    rollups = InventoryChangeRollup.objects.filter(item=OuterRef('pk'))
+    rolled_up = rollups.filter(
+        day__gte=timezone.localdate(checkpoint_at), day__lt=timezone.localdate(at + timedelta(microseconds=1)),
+    ).order_by('-day')
+    following_day = rollups.filter(day__gte=timezone.localdate(at)).order_by('day')
+    following = changes.filter(change_date__gt=at).order_by('change_date', 'id')
+    steps = [Subquery(replayed.values('new_quantity')[:1]), Subquery(rolled_up.values('closing_quantity')[:1])]
+    if checkpoint is not None:
+        snapshot = InventorySnapshot.objects.filter(checkpoint_id=checkpoint[0], item=OuterRef('pk'))
+        steps.append(Subquery(snapshot.values('quantity')[:1]))
+    return Coalesce(
+        *steps,
+        Subquery(following_day.values('opening_quantity')[:1]),
+        Subquery(following.values('old_quantity')[:1]),
+        F('quantity'),
+    )
+
+
+def items_as_of(queryset, owner_id, at, exclude_checkpoint=None):
+    # items that existed at `at`, with their quantity then as `quantity_as_of`
+    return queryset.filter(date_added__lte=at).annotate(
+        quantity_as_of=quantity_as_of(owner_id, at, exclude_checkpoint)
+    )
+
+
+def build_checkpoint(owner_id, at=None, chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """
+    Store the quantities of an owner's items at `at` (default now) as a checkpoint.
+
+    Past checkpoints are computed from the previous checkpoint and the change log, so
+    backfill them oldest first. Returns the checkpoint, or None if one exists at `at`.
+    """
+    current = at is None
+    at = at or timezone.now()
+    items = InventoryItem.objects.filter(owner_id=owner_id).order_by('id')
+    with transaction.atomic():
+        checkpoint, created = InventoryCheckpoint.objects.get_or_create(owner_id=owner_id, taken_at=at)
+        if not created:
+            return None
+        if current:
+            rows = items.values_list('id', 'quantity')
+        else:
+            rows = items_as_of(items, owner_id, at, exclude_checkpoint=checkpoint).values_list('id', 'quantity_as_of')
+        snapshots = []
+        for item_id, quantity in rows.iterator(chunk_size=chunk_size):
+            snapshots.append(InventorySnapshot(checkpoint=checkpoint, item_id=item_id, quantity=quantity))
+            if len(snapshots) == chunk_size:
+                InventorySnapshot.objects.bulk_create(snapshots)
+                checkpoint.item_count += len(snapshots)
+                snapshots = []
+        InventorySnapshot.objects.bulk_create(snapshots)
+        checkpoint.item_count += len(snapshots)
+        checkpoint.save(update_fields=['item_count'])
+        # cached ?as_of= responses may resolve differently now
+        invalidate_owner(owner_id)
+    return checkpoint
@@ -1,3 +1,1320 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import date, datetime
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import AsyncClient, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework import mixins
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from . import exports
+from .analytics import moving_average
+from .authentication import TokenCache, token_cache
+from .async_views import websocket_events
+from .benchmarks import compare_results, seed_dataset
+from .categories import resolve_categories
+from .changelog import get_writer
+from .events import get_broker
+from .importers import import_items
+from .models import Category, InventoryItem, InventoryChangeLog, InventoryChangeOutbox, InventoryChangeRollup
+from .rows import ITEM_COLUMNS
+from .search import get_search_backend
+from .serializers import InventoryChangeLogSerializer, InventoryChangeRollupSerializer, InventoryItemSerializer
+from .services import adjust_stock, apply_bulk
+from .snapshots import build_checkpoint
+from .views import InventoryChangeLogViewSet, InventoryItemViewSet
+
+User = get_user_model()
+
+
+# Query plan regression tests
+# run EXPLAIN QUERY PLAN on the SQL each list/filter endpoint executes and make sure
+# the inventory tables are reached through an index (SEARCH), never a full table SCAN
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class QueryPlanTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='planner', password='password123')
+        other = User.objects.create_user(username='other', password='password123')
+        categories = {owner: resolve_categories(owner.pk, ['Electronics', 'Office']) for owner in (cls.user, other)}
+        items = InventoryItem.objects.bulk_create([
+            InventoryItem(
+                owner=cls.user if i % 2 else other, name=f'Item {i}', description='Test item',
+                quantity=i % 12, price=i, category='Electronics' if i % 3 else 'Office',
+                category_node=categories[cls.user if i % 2 else other]['Electronics' if i % 3 else 'Office'],
+            )
+            for i in range(200)
+        ])
+        InventoryChangeLog.objects.bulk_create([
+            InventoryChangeLog(item=item, changed_by=item.owner, old_quantity=0, new_quantity=item.quantity, change_type='restock')
+            for item in items
+        ])
+        cls.item = items[1]
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def query_plans(self, url):
+        # returns the plan lines of every inventory SELECT executed by the request
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if sql.startswith('SELECT') and 'inventory_' in sql:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                    plans.append([row[-1] for row in cursor.fetchall()])
+        self.assertTrue(plans, f'{url} did not query the inventory tables')
+        return response, plans
+
+    def assertUsesIndexes(self, url, *indexes):
+        response, plans = self.query_plans(url)
+        lines = [line for plan in plans for line in plan]
+        for line in lines:
+            # full-text MATCH shows up as a virtual table "scan" driven by the FTS index
+            self.assertFalse(
+                line.startswith('SCAN inventory_') and 'VIRTUAL TABLE INDEX' not in line,
+                f'{url} scans a table: {line}\nplan: {lines}'
+            )
+        for index in indexes:
+            self.assertTrue(any(index in line for line in lines), f'{url} does not use {index}: {lines}')
+        return response
+
+    def test_item_list_uses_owner_updated_index(self):
+        self.assertUsesIndexes('/api/items/', 'item_owner_updated_idx')
+
+    def test_item_list_next_page_uses_owner_updated_index(self):
+        response = self.client.get('/api/items/?page_size=5')
+        self.assertUsesIndexes(response.data['next'], 'item_owner_updated_idx')
+
+    def test_item_list_default_order_needs_no_sort(self):
+        _, plans = self.query_plans('/api/items/')
+        self.assertFalse(any('TEMP B-TREE' in line for plan in plans for line in plan), plans)
+
+    def test_price_range_uses_owner_price_index(self):
+        self.assertUsesIndexes('/api/items/?min_price=10&max_price=50', 'item_owner_price_idx')
+
+    def test_price_ordering_uses_owner_price_index(self):
+        self.assertUsesIndexes('/api/items/?ordering=-price', 'item_owner_price_idx')
+
+    def test_low_stock_uses_owner_below_threshold_index(self):
+        self.assertUsesIndexes('/api/items/?low_stock=true', 'item_owner_below_idx')
+
+    def test_low_stock_custom_threshold_uses_owner_quantity_index(self):
+        self.assertUsesIndexes('/api/items/?low_stock=true&low_stock_threshold=3', 'item_owner_quantity_idx')
+
+    def test_name_ordering_uses_owner_name_index(self):
+        self.assertUsesIndexes('/api/items/?ordering=name', 'item_owner_name_idx')
+
+    def test_category_filter_uses_owner_category_index(self):
+        response = self.assertUsesIndexes('/api/items/?category=electronics', 'item_owner_category_idx')
+        self.assertTrue(response.data['results'])
+        self.assertUsesIndexes('/api/items/?category_tree=electronics', 'category_owner_path_idx')
+
+    def test_search_uses_full_text_index(self):
+        response = self.assertUsesIndexes('/api/items/?search=item', 'inventory_item_fts')
+        self.assertTrue(response.data['results'])
+
+    def test_item_detail_uses_primary_key(self):
+        self.assertUsesIndexes(f'/api/items/{self.item.id}/')
+
+    def test_inventory_levels_use_indexes(self):
+        self.assertUsesIndexes('/api/inventory-levels/', 'item_owner_updated_idx')
+        self.assertUsesIndexes('/api/inventory-levels/?ordering=quantity', 'item_owner_quantity_idx')
+        self.assertUsesIndexes('/api/inventory-levels/?min_price=10&max_price=50', 'item_owner_price_idx')
+
+    def test_change_list_uses_indexes(self):
+        self.assertUsesIndexes('/api/changes/')
+
+    def test_item_history_uses_item_date_index(self):
+        self.assertUsesIndexes(f'/api/changes/?item={self.item.id}', 'change_item_date_idx')
+
+
+# Cached token authentication
+# the token lookup is served from the cache after the first request, and a token
+# that was deleted (logout) or whose user was deactivated is never accepted again
+class TokenCacheTests(APITestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username='tokenuser', password='password123')
+        self.admin = User.objects.create_superuser(username='admin', password='password123')
+        response = self.client.post('/api/login/', {'username': 'tokenuser', 'password': 'password123'})
+        self.key = response.data['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.key)
+
+    def token_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [q['sql'] for q in queries.captured_queries if 'authtoken_token' in q['sql']]
+
+    def test_token_lookup_is_cached(self):
+        response, queries = self.token_queries('/api/items/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        response, queries = self.token_queries('/api/items/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_logout_rejects_cached_token(self):
+        self.assertEqual(self.client.get('/api/items/').status_code, 200)
+        self.assertEqual(self.client.post('/api/logout/').status_code, 200)
+        self.assertEqual(self.client.get('/api/items/').status_code, 401)
+
+    def test_deactivated_user_rejects_cached_token(self):
+        self.assertEqual(self.client.get('/api/items/').status_code, 200)
+        admin_client = self.client_class()
+        admin_client.force_authenticate(self.admin)
+        response = admin_client.patch(f'/api/users/{self.user.pk}/', {'is_active': False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/items/').status_code, 401)
+
+    def test_deleted_user_rejects_cached_token(self):
+        self.assertEqual(self.client.get('/api/items/').status_code, 200)
+        admin_client = self.client_class()
+        admin_client.force_authenticate(self.admin)
+        self.assertEqual(admin_client.delete(f'/api/users/{self.user.pk}/').status_code, 204)
+        self.assertEqual(self.client.get('/api/items/').status_code, 401)
+
+    def test_token_deleted_outside_the_api(self):
+        self.assertEqual(self.client.get('/api/items/').status_code, 200)
+        Token.objects.filter(key=self.key).delete()
+        self.assertEqual(self.client.get('/api/items/').status_code, 401)
+
+    def test_cache_is_bounded(self):
+        cache = TokenCache(max_size=2, ttl=60)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('c'), 'c')
+
+    def test_entries_expire(self):
+        cache = TokenCache(max_size=2, ttl=0)
+        cache.set('a', 'a')
+        self.assertIsNone(cache.get('a'))
+
+
+# Query budgets
+# every endpoint must run the same, fixed number of queries whatever the number of
+# rows on the page, so an N+1 (a lazily loaded relation per row) fails here
+class QueryBudgetTests(APITestCase):
+    sizes = (1, 100, 1000)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='budget-admin', password='password123')
+        cls.users = []
+        for size in cls.sizes:
+            user = User.objects.create_user(username=f'budget{size}', password='password123')
+            items = InventoryItem.objects.bulk_create([
+                InventoryItem(owner=user, name=f'Item {i}', quantity=i % 12, price=i, category='Office')
+                for i in range(size)
+            ])
+            InventoryChangeLog.objects.bulk_create([
+                InventoryChangeLog(item=item, changed_by=user, old_quantity=0, new_quantity=item.quantity, change_type='restock')
+                for item in items
+            ])
+            user.first_item = items[0]
+            cls.users.append(user)
+
+    def assertQueryBudget(self, url, budget, admin=False):
+        for user in self.users:
+            self.client.force_login(self.admin) if admin else self.client.force_authenticate(user)
+            path = url.format(user=user, item=user.first_item)
+            with self.assertNumQueries(budget):
+                response = self.client.get(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.assertEqual(response.status_code, 200, path)
+
+    def test_item_list(self):
+        self.assertQueryBudget('/api/items/?page_size=100', 1)
+
+    def test_item_search(self):
+        get_search_backend()  # the backend availability check runs once per process
+        self.assertQueryBudget('/api/items/?page_size=100&search=item', 1)
+
+    def test_item_detail(self):
+        self.assertQueryBudget('/api/items/{item.id}/', 1)
+
+    def test_inventory_levels(self):
+        self.assertQueryBudget('/api/inventory-levels/?page_size=100', 1)
+
+    def test_inventory_level_detail(self):
+        self.assertQueryBudget('/api/inventory-levels/{item.id}/', 1)
+
+    def test_change_list(self):
+        self.assertQueryBudget('/api/changes/?page_size=100', 1)
+
+    def test_item_history(self):
+        self.assertQueryBudget('/api/changes/?item={item.id}', 1)
+
+    def test_exports(self):
+        self.assertQueryBudget('/api/items/export/?format=csv', 1)
+        self.assertQueryBudget('/api/changes/export/?format=ndjson', 1)
+
+    def test_admin_item_changelist(self):
+        self.assertQueryBudget('/admin/inventory/inventoryitem/?owner__id__exact={user.id}', 7, admin=True)
+
+    def test_admin_change_log_changelist(self):
+        self.assertQueryBudget('/admin/inventory/inventorychangelog/?changed_by__id__exact={user.id}', 6, admin=True)
+
+
+# Change event stream
+# writes publish their events once they commit, to the writing owner only, and a
+# client resuming with Last-Event-ID gets exactly what it missed
+class EventStreamTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='streamuser', password='password123')
+        self.other = User.objects.create_user(username='otheruser', password='password123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def events(self, last_event_id):
+        # under WSGI the stream answers with what is buffered and ends
+        response = self.client.get('/api/events/', HTTP_LAST_EVENT_ID=last_event_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return [
+            dict(line.split(': ', 1) for line in block.splitlines())
+            for block in response.content.decode().split('\n\n') if block.startswith('id: ')
+        ]
+
+    def test_resume_from_last_event_id(self):
+        broker = get_broker()
+        broker.publish(self.user.pk, [('change', '{}')])
+        last_event_id = broker.reload_event().id
+        with self.captureOnCommitCallbacks(execute=True):
+            item = self.client.post('/api/items/', {'name': 'Stapler', 'quantity': 20, 'price': '4.50'}).data
+            self.client.delete(f"/api/items/{item['id']}/")
+        other_client = self.client_class()
+        other_client.force_authenticate(self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            other_client.post('/api/items/', {'name': 'Other', 'quantity': 1, 'price': '1.00'})
+        events = self.events(last_event_id)
+        self.assertEqual([event['event'] for event in events], ['item', 'change', 'item_deleted'])
+        self.assertEqual(json.loads(events[0]['data'])['name'], 'Stapler')
+        self.assertEqual(self.events(events[-1]['id']), [])
+
+    def test_nothing_published_before_commit(self):
+        last_event_id = get_broker().reload_event().id
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.post('/api/items/', {'name': 'Stapler', 'quantity': 20, 'price': '4.50'})
+        self.assertEqual(self.events(last_event_id), [])
+
+    def test_unknown_event_id_asks_for_reload(self):
+        self.assertEqual([event['event'] for event in self.events('gone-1')], ['reload'])
+
+    async def test_websocket_rechecks_the_token(self):
+        received, sent = asyncio.Queue(), asyncio.Queue()
+        await received.put({'type': 'websocket.connect'})
+        scope = {'type': 'websocket', 'path': '/api/events/ws/', 'headers': [(b'authorization', f'Token {self.token.key}'.encode())]}
+        with self.settings(INVENTORY_EVENT_STREAM_TTL=0.1):
+            socket = asyncio.ensure_future(websocket_events(scope, received.get, sent.put))
+            self.assertEqual(await sent.get(), {'type': 'websocket.accept'})
+            # a valid token passes the checks and the socket stays open
+            await asyncio.sleep(0.35)
+            self.assertTrue(sent.empty())
+            await sync_to_async(self.token.delete)()
+            self.assertEqual(await asyncio.wait_for(sent.get(), 2), {'type': 'websocket.close', 'code': 4401})
+            await asyncio.wait_for(socket, 2)
+
+
+# Deferred change log writes (inventory/changelog.py)
+# the rows reach the change log only when the writer flushes, with the item write's
+# timestamp; rows of items deleted before that are dropped like the cascade would
+@override_settings(INVENTORY_CHANGELOG_WORKER=False)
+class DeferredChangeLogTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='audituser', password='password123')
+        self.client.force_authenticate(self.user)
+
+    @override_settings(INVENTORY_CHANGELOG_MODE='outbox')
+    def test_outbox_rows_are_moved_in_batches(self):
+        kept = self.client.post('/api/items/', {'name': 'Stapler', 'quantity': 20, 'price': '4.50'}).data
+        self.client.patch(f"/api/items/{kept['id']}/", {'quantity': 15})
+        gone = self.client.post('/api/items/', {'name': 'Tape', 'quantity': 5, 'price': '1.50'}).data
+        self.client.delete(f"/api/items/{gone['id']}/")
+        self.assertFalse(InventoryChangeLog.objects.exists())
+        written = dict(
+            InventoryChangeOutbox.objects.filter(item_id=kept['id']).values_list('change_type', 'change_date')
+        )
+        self.assertEqual(len(written), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(get_writer().flush(), 3)
+        self.assertFalse(InventoryChangeOutbox.objects.exists())
+        logged = dict(InventoryChangeLog.objects.values_list('change_type', 'change_date'))
+        self.assertEqual(logged, written)
+        self.assertEqual(self.client.get('/api/changes/').data['results'][0]['new_quantity'], 15)
+
+    @override_settings(INVENTORY_CHANGELOG_MODE='queue')
+    def test_queued_rows_are_written_after_commit(self):
+        last_event_id = get_broker().reload_event().id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/items/', {'name': 'Stapler', 'quantity': 20, 'price': '4.50'})
+        self.assertFalse(InventoryChangeLog.objects.exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(get_writer().flush(), 1)
+        self.assertEqual(InventoryChangeLog.objects.get().changed_by, self.user)
+        events = get_broker()._backlog(self.user.pk, last_event_id)
+        self.assertEqual([event.type for event in events], ['item', 'change'])
+
+
+# Request throttling (inventory/throttling.py)
+# one float per client and scope in the cache, whatever the rate; refused requests get 429 + Retry-After
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **rates},
+    })
+
+
+class ThrottleTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='throttleuser', password='password123')
+        # the async views only see the header
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+
+    @throttle_rates(read='3/min', write='1/min')
+    def test_scopes_are_counted_separately(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/items/').status_code, 200)
+        response = self.client.get('/api/async/items/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response['Retry-After']), 20)
+        self.assertEqual(self.client.post('/api/items/', {'name': 'Stapler', 'quantity': 2, 'price': '1.00'}).status_code, 201)
+        self.assertIsInstance(cache.get(f'inventory:throttle:read:{self.user.pk}'), float)
+
+    @throttle_rates(auth='2/min')
+    def test_login_is_limited_per_client_ip(self):
+        anonymous = self.client_class()
+        for _ in range(2):
+            self.assertEqual(anonymous.post('/api/login/', {'username': 'throttleuser', 'password': 'wrong'}).status_code, 400)
+        response = anonymous.post('/api/login/', {'username': 'throttleuser', 'password': 'password123'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.client_class().post('/api/login/', {}, REMOTE_ADDR='10.0.0.2').status_code, 400)
+
+
+# Sparse fieldsets (?fields=, ?omit=) and ?expand=item
+# both the payload and the page query shrink to the requested fields; the cursor keeps working
+class SparseFieldsTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='scanner', password='password123')
+        self.client.force_authenticate(self.user)
+        for i in range(3):
+            self.client.post('/api/items/', {'name': f'Item {i}', 'description': 'x' * 500, 'quantity': i, 'price': '1.00'})
+
+    def test_fields_trim_rows_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/items/?fields=id,name,quantity&page_size=2')
+        self.assertEqual([list(row) for row in response.data['results']], [['id', 'name', 'quantity']] * 2)
+        self.assertNotIn('description', queries.captured_queries[-1]['sql'])
+        self.assertEqual(len(self.client.get(response.data['next']).data['results']), 1)
+        self.assertNotIn('description', self.client.get('/api/inventory-levels/?omit=description').data['results'][0])
+        self.assertEqual(self.client.get('/api/items/?fields=sku').status_code, 400)
+
+    def test_expand_item_on_changes(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/changes/?expand=item&fields=id,item')
+        self.assertEqual(response.data['results'][0]['item'], {'id': response.data['results'][0]['item']['id'],
+                                                               'name': 'Item 2', 'category': ''})
+        self.assertEqual(len(queries), 1)
+        change_id = response.data['results'][0]['id']
+        self.assertEqual(self.client.get(f'/api/changes/{change_id}/?expand=item').data['item']['name'], 'Item 2')
+
+
+# Category hierarchy (inventory/categories.py)
+# every write path files items under the owner's normalized categories: the spellings
+# merge, the counts follow the writes and the filters match exactly or by subtree
+class CategoryTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='sorter', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def test_spellings_share_a_category(self):
+        for name, category in (('Phone', 'Electronics / Phones'), ('Case', 'electronics/phones '), ('Radio', 'ELECTRONICS')):
+            self.client.post('/api/items/', {'name': name, 'quantity': 1, 'price': '1.00', 'category': category})
+        self.assertEqual(
+            sorted(InventoryItem.objects.values_list('category', flat=True)),
+            ['Electronics', 'Electronics/Phones', 'Electronics/Phones'],
+        )
+        tree = {row['full_name']: row for row in self.client.get('/api/categories/').data}
+        self.assertEqual(tree['Electronics']['item_count'], 1)
+        self.assertEqual(tree['Electronics']['subtree_item_count'], 3)
+        self.assertEqual(tree['Electronics/Phones']['parent'], tree['Electronics']['id'])
+        self.assertEqual(len(self.client.get('/api/items/?category=electronics').data['results']), 1)
+        self.assertEqual(len(self.client.get('/api/items/?category_tree=electronics').data['results']), 3)
+        self.assertEqual(len(self.client.get('/api/items/?category=Electronics/Pho').data['results']), 0)
+
+        phone = InventoryItem.objects.get(name='Phone')
+        self.client.patch(f'/api/items/{phone.pk}/', {'category': 'Audio'})
+        self.client.delete(f"/api/items/{InventoryItem.objects.get(name='Radio').pk}/")
+        counts = dict(Category.objects.values_list('full_name', 'item_count'))
+        self.assertEqual(counts, {'Electronics': 0, 'Electronics/Phones': 1, 'Audio': 1})
+        call_command('rebuild_inventory_summary', verify=True, stdout=io.StringIO())
+
+    def test_deleting_a_user_takes_their_categories(self):
+        self.client.post('/api/items/', {'name': 'Phone', 'price': '1.00', 'category': 'Electronics/Phones'})
+        admin = User.objects.create_superuser(username='root', password='password123')
+        self.client.force_authenticate(admin)
+        self.assertEqual(self.client.delete(f'/api/users/{self.user.pk}/').status_code, 204)
+        self.assertFalse(Category.objects.exists())
+        self.assertFalse(InventoryItem.objects.exists())
+
+    def test_import_and_thresholds_use_the_same_categories(self):
+        self.client.post('/api/category-thresholds/', {'category': 'office supplies', 'threshold': 10})
+        self.assertEqual(self.client.post('/api/category-thresholds/', {'category': ' Office Supplies', 'threshold': 3}).status_code, 400)
+        import_items(self.user, [{'name': 'Stapler', 'quantity': '5', 'price': '2.00', 'category': 'OFFICE  supplies'}])
+        item = InventoryItem.objects.get(name='Stapler')
+        self.assertEqual((item.category, item.below_threshold), ('office supplies', True))
+        self.assertEqual(Category.objects.get(key='office supplies').item_count, 1)
+        deep = '/'.join(['level'] * 11)
+        self.assertEqual(self.client.post('/api/items/', {'name': 'Deep', 'price': '1.00', 'category': deep}).status_code, 400)
+
+
+# Bulk writes (POST /api/items/bulk/)
+# creates, updates and deletes land together with their change log and counters;
+# a bad row, an oversized batch or a failing write leaves everything as it was
+class BulkTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='batcher', password='password123')
+        self.client.force_authenticate(self.user)
+        self.bulk({'create': [
+            {'name': 'Kept', 'quantity': 10, 'price': '1.00'}, {'name': 'Gone', 'quantity': 3, 'price': '1.00'},
+        ]})
+        self.kept, self.gone = InventoryItem.objects.order_by('pk')
+
+    def bulk(self, payload):
+        return self.client.post('/api/items/bulk/', payload, format='json')
+
+    def state(self):
+        return sorted(InventoryItem.objects.values_list('name', 'quantity')), InventoryChangeLog.objects.count()
+
+    def test_create_update_delete(self):
+        response = self.bulk({
+            'create': [{'name': 'New', 'quantity': 4, 'price': '2.00'}],
+            'update': [{'id': self.kept.pk, 'quantity': 7}],
+            'delete': [self.gone.pk],
+        })
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['deleted'], [self.gone.pk])
+        self.assertEqual(self.state(), ([('Kept', 7), ('New', 4)], 3))
+        self.assertEqual(
+            sorted(InventoryChangeLog.objects.values_list('item__name', 'old_quantity', 'new_quantity', 'change_type')),
+            [('Kept', 0, 10, 'restock'), ('Kept', 10, 7, 'sale'), ('New', 0, 4, 'restock')],
+        )
+        self.assertEqual(self.client.get('/api/inventory-levels/summary/').data['sku_count'], 2)
+        call_command('rebuild_inventory_summary', verify=True, stdout=io.StringIO())
+
+    def test_a_bad_row_writes_nothing(self):
+        before = self.state()
+        response = self.bulk({
+            'create': [{'name': 'New', 'quantity': 4, 'price': '2.00'}],
+            'update': [{'id': self.kept.pk, 'price': '-1.00'}],
+            'delete': [self.gone.pk, 999999],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [(error['operation'], error['index']) for error in response.data['errors']], [('update', 0), ('delete', 1)]
+        )
+        self.assertEqual(self.state(), before)
+
+    def test_row_limit(self):
+        rows = [{'name': f'Item {i}', 'price': '1.00'} for i in range(1001)]
+        response = self.bulk({'create': rows})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('1000', response.data['error'])
+        self.assertEqual(self.bulk({'create': rows[:1000]}).status_code, 200)
+
+    def test_a_failed_write_rolls_the_batch_back(self):
+        before = self.state()
+        with mock.patch('inventory.services.sync_thresholds', side_effect=DatabaseError('disk full')):
+            with self.assertRaises(DatabaseError):
+                self.bulk({
+                    'create': [{'name': 'New', 'quantity': 4, 'price': '2.00'}],
+                    'update': [{'id': self.kept.pk, 'quantity': 7}],
+                    'delete': [self.gone.pk],
+                })
+        self.assertEqual(self.state(), before)
+        self.assertFalse(Category.objects.exists())
+
+    def test_writes_start_from_the_current_rows(self):
+        # the items the view validated against, then changed underneath it
+        stale_kept, stale_gone = InventoryItem.objects.order_by('pk')
+        adjust_stock(self.user, [(self.kept.pk, -4, None)])
+        apply_bulk(self.user, updates=[(stale_kept, {'quantity': 20})])
+        self.assertEqual(
+            list(self.kept.changes.order_by('id').values_list('old_quantity', 'new_quantity')), [(0, 10), (10, 6), (6, 20)]
+        )
+        self.assertEqual(self.client.get('/api/inventory-levels/summary/').data['total_units'], 23)
+        InventoryItem.objects.filter(pk=self.gone.pk).delete()
+        with self.assertRaises(NotFound):
+            apply_bulk(self.user, updates=[(stale_gone, {'quantity': 1})])
+        self.assertFalse(InventoryItem.objects.filter(pk=self.gone.pk).exists())
+
+
+# Stock movements (POST /api/items/<id>/adjust/, /api/items/adjust/, services.adjust_stock)
+# deltas apply in the database under row locks taken in pk order; a batch that would
+# take any item below zero is refused whole, the change type follows the sign
+class AdjustStockTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='mover', password='password123')
+        self.client.force_authenticate(self.user)
+        self.items = [InventoryItem.objects.create(owner=self.user, name=f'Box {i}', quantity=10, price=1) for i in range(3)]
+
+    def quantities(self):
+        return list(InventoryItem.objects.order_by('pk').values_list('quantity', flat=True))
+
+    def test_change_type_follows_the_sign(self):
+        first = self.items[0]
+        self.assertEqual(self.client.post(f'/api/items/{first.pk}/adjust/', {'delta': -4}).data['quantity'], 6)
+        self.client.post(f'/api/items/{first.pk}/adjust/', {'delta': 5})
+        self.client.post(f'/api/items/{first.pk}/adjust/', {'delta': -1, 'change_type': 'adjustment'})
+        self.assertEqual(
+            list(first.changes.order_by('id').values_list('old_quantity', 'new_quantity', 'change_type')),
+            [(10, 6, 'sale'), (6, 11, 'restock'), (11, 10, 'adjustment')],
+        )
+
+    def test_negative_quantities_are_refused(self):
+        first, second = self.items[:2]
+        self.assertEqual(self.client.post(f'/api/items/{first.pk}/adjust/', {'delta': -11}).status_code, 400)
+        response = self.client.post('/api/items/adjust/', {'adjustments': [
+            {'item': first.pk, 'delta': -5}, {'item': second.pk, 'delta': -6}, {'item': second.pk, 'delta': -6},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.quantities(), [10, 10, 10])
+        self.assertFalse(InventoryChangeLog.objects.exists())
+
+    def test_batches_lock_in_pk_order(self):
+        first, second, third = self.items
+        rows = [{'item': third.pk, 'delta': 1}, {'item': first.pk, 'delta': -2}, {'item': third.pk, 'delta': 3}]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/items/adjust/', {'adjustments': rows}, format='json')
+        self.assertEqual([row['id'] for row in response.data['items']], [first.pk, third.pk])
+        self.assertEqual(self.quantities(), [8, 10, 14])
+        lock = next(query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT "inventory_inventoryitem"."id"'))
+        self.assertTrue(lock.endswith('ORDER BY "inventory_inventoryitem"."id" ASC'), lock)
+        # each log row replays the batch in request order
+        self.assertEqual(
+            list(third.changes.order_by('id').values_list('old_quantity', 'new_quantity')), [(10, 11), (11, 14)]
+        )
+
+    def test_an_edit_keeps_a_concurrent_movement(self):
+        first = self.items[0]
+        get_object = InventoryItemViewSet.get_object
+
+        def read_then_sell(view):
+            # a sale lands between the PATCH reading the item and saving it
+            item = get_object(view)
+            adjust_stock(self.user, [(first.pk, -4, None)])
+            return item
+
+        with mock.patch.object(InventoryItemViewSet, 'get_object', read_then_sell):
+            response = self.client.patch(f'/api/items/{first.pk}/', {'price': '3.00'})
+        self.assertEqual((response.data['quantity'], response.data['price']), (6, '3.00'))
+        self.assertEqual(self.quantities()[0], 6)
+        self.assertEqual(
+            list(first.changes.order_by('id').values_list('old_quantity', 'new_quantity', 'change_type')),
+            [(10, 6, 'sale'), (6, 6, 'adjustment')],
+        )
+
+
+# Keyset pagination (inventory/pagination.py)
+# walking next (and back through previous) under each ordering returns every row
+# exactly once in order, however many rows tie on the ordering field
+class KeysetPaginationTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='pager', password='password123')
+        self.client.force_authenticate(self.user)
+        for i in range(23):
+            InventoryItem.objects.create(owner=self.user, name=f'Item {i % 4}', quantity=i, price=i % 3)
+        # every row on the same timestamp: the default ordering is all ties
+        InventoryItem.objects.update(last_updated=datetime.fromisoformat('2026-01-01T00:00:00+00:00'))
+
+    def walk(self, ordering):
+        url = f'/api/items/?page_size=4&ordering={ordering}'
+        pages = []
+        while url:
+            data = self.client.get(url).data
+            pages.append([row['id'] for row in data['results']])
+            url = data['next']
+        # and back from the last page
+        url, back = data['previous'], [pages[-1]]
+        while url:
+            data = self.client.get(url).data
+            back.append([row['id'] for row in data['results']])
+            url = data['previous']
+        self.assertEqual(back, pages[::-1])
+        return [pk for page in pages for pk in page]
+
+    def test_every_row_once_in_order(self):
+        items = list(InventoryItem.objects.all())
+        for ordering, key in (
+            ('-last_updated', lambda item: -item.pk),
+            ('price', lambda item: (item.price, item.pk)),
+            ('-price', lambda item: (-item.price, -item.pk)),
+            ('name', lambda item: (item.name, item.pk)),
+        ):
+            with self.subTest(ordering=ordering):
+                self.assertEqual(self.walk(ordering), [item.pk for item in sorted(items, key=key)])
+
+    def test_tampered_cursor(self):
+        # well-formed but edited cursors are refused like any other invalid cursor
+        for ordering, position in (
+            ('-last_updated', ['yesterday', '1']),
+            ('price', ['cheap', '1']),
+            ('-last_updated', [1, 2]),
+            ('-last_updated', [None, None]),
+            ('name', [['Item 1'], '1']),
+            ('-last_updated', ['2026-01-01 00:00:00+00:00']),
+        ):
+            cursor = base64.b64encode(urlencode({'p': json.dumps(position)}).encode()).decode()
+            with self.subTest(ordering=ordering, position=position):
+                response = self.client.get(f'/api/items/?ordering={ordering}&cursor={cursor}')
+                self.assertEqual(response.status_code, 404, response.content)
+                self.assertEqual(response.data['detail'], 'Invalid cursor')
+        # an untouched one still works
+        cursor = base64.b64encode(urlencode({'p': json.dumps(['2026-01-01 00:00:00+00:00', '1000'])}).encode()).decode()
+        self.assertEqual(len(self.client.get(f'/api/items/?page_size=50&cursor={cursor}').data['results']), 23)
+
+
+# Response cache and conditional GETs (inventory/cache.py)
+# a repeat request is served from the cache or answered 304 for its ETag, until a
+# write through the API or a plain ORM save moves the owner to a new generation
+@override_settings(INVENTORY_RESPONSE_CACHE=True)
+class ResponseCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='password123')
+        self.client.force_authenticate(self.user)
+        self.item = InventoryItem.objects.create(owner=self.user, name='Lamp', quantity=3, price=1)
+
+    def get(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/api/items/', **headers)
+
+    def test_repeat_requests(self):
+        etag = self.get()['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get().data['results'][0]['name'], 'Lamp')
+        self.assertFalse([query for query in queries.captured_queries if 'inventory_inventoryitem' in query['sql']])
+        response = self.get(etag)
+        self.assertEqual((response.status_code, response['ETag']), (304, etag))
+
+    def test_writes_invalidate(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/items/', {'name': 'Desk', 'price': '9.00'})
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        self.item.quantity = 8
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.save()
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({row['name']: row['quantity'] for row in response.data['results']}['Lamp'], 8)
+
+
+# Stock alert feed (/api/alerts/)
+# an alert each time an item crosses its threshold, either way; a waiting request
+# returns as soon as one is written, woken by the event broker
+class AlertFeedTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='watcher', password='password123')
+        self.auth = 'Token ' + Token.objects.create(user=self.user).key
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+
+    def feed(self, query=''):
+        return self.client.get('/api/alerts/?' + query).json()
+
+    def test_crossings_in_both_directions(self):
+        item = self.client.post('/api/items/', {'name': 'Rope', 'quantity': 2, 'price': '1.00'}).data
+        self.client.post(f"/api/items/{item['id']}/adjust/", {'delta': 1})
+        self.client.post(f"/api/items/{item['id']}/adjust/", {'delta': 10})
+        self.client.post('/api/category-thresholds/', {'category': '', 'threshold': 20})
+        data = self.feed('since=0')
+        self.assertEqual(
+            [(row['kind'], row['quantity'], row['threshold']) for row in data['results']],
+            [('low', 2, 5), ('restocked', 13, 5), ('low', 13, 20)],
+        )
+        self.assertEqual(len(self.feed(f"since={data['results'][0]['id']}")['results']), 2)
+        self.assertEqual(self.feed(f"since={data['since']}&wait=0")['results'], [])
+
+    async def test_long_poll_returns_new_alerts(self):
+        client = AsyncClient()
+        item = await InventoryItem.objects.acreate(owner=self.user, name='Rope', quantity=9, price=1)
+
+        async def sell():
+            await asyncio.sleep(0.2)
+
+            def write():
+                with self.captureOnCommitCallbacks(execute=True):
+                    adjust_stock(self.user, [(item.pk, -8, None)])
+            await sync_to_async(write)()
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        response, _ = await asyncio.gather(client.get('/api/alerts/?since=0&wait=10', headers={'Authorization': self.auth}), sell())
+        self.assertEqual([row['kind'] for row in response.json()['results']], ['low'])
+        # the broker's alert event, not the fallback poll, ended the wait
+        self.assertLess(loop.time() - started, 2)
+
+
+# Change log retention (python manage.py rollup_changes, inventory/rollups.py)
+# days past the retention window become one rollup per item and day, archived and
+# pruned; running again (after --keep-detail or an interruption) changes nothing
+class RollupTests(APITestCase):
+    # (item, day, opening, closing, net, changes, restocks, sales, adjustments)
+    expected = [
+        ('Desk', date(2026, 1, 10), 0, 1, 1, 1, 1, 0, 0),
+        ('Lamp', date(2026, 1, 10), 0, 5, 5, 3, 1, 1, 1),
+        ('Lamp', date(2026, 1, 11), 5, 7, 2, 1, 1, 0, 0),
+    ]
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='archivist', password='password123')
+        self.lamp = InventoryItem.objects.create(owner=self.user, name='Lamp', quantity=7, price=1)
+        self.desk = InventoryItem.objects.create(owner=self.user, name='Desk', quantity=1, price=1)
+        for item, when, old, new, change_type in (
+            (self.lamp, '2026-01-10T09:00:00+00:00', 0, 10, 'restock'),
+            (self.lamp, '2026-01-10T12:00:00+00:00', 10, 4, 'sale'),
+            (self.lamp, '2026-01-10T15:00:00+00:00', 4, 5, 'adjustment'),
+            (self.desk, '2026-01-10T10:00:00+00:00', 0, 1, 'restock'),
+            (self.lamp, '2026-01-11T10:00:00+00:00', 5, 7, 'restock'),
+        ):
+            InventoryChangeLog.objects.create(
+                item=item, changed_by=self.user, old_quantity=old, new_quantity=new,
+                change_type=change_type, change_date=datetime.fromisoformat(when),
+            )
+        # within the retention window
+        self.recent = InventoryChangeLog.objects.create(item=self.desk, old_quantity=1, new_quantity=1, change_type='adjustment')
+
+    def rollups(self):
+        return sorted(InventoryChangeRollup.objects.values_list(
+            'item__name', 'day', 'opening_quantity', 'closing_quantity', 'net_change',
+            'change_count', 'restock_count', 'sale_count', 'adjustment_count',
+        ))
+
+    def test_rollup_archive_and_prune(self):
+        with tempfile.TemporaryDirectory() as archive_dir:
+            call_command('rollup_changes', archive_dir=archive_dir, stdout=io.StringIO())
+            self.assertEqual(sorted(os.listdir(archive_dir)), ['changes-2026-01-10.ndjson.gz', 'changes-2026-01-11.ndjson.gz'])
+            with gzip.open(os.path.join(archive_dir, 'changes-2026-01-10.ndjson.gz'), 'rt') as handle:
+                archived = [json.loads(line) for line in handle]
+        self.assertEqual([row['change_type'] for row in archived], ['restock', 'restock', 'sale', 'adjustment'])
+        self.assertEqual(self.rollups(), self.expected)
+        self.assertEqual(list(InventoryChangeLog.objects.values_list('pk', flat=True)), [self.recent.pk])
+
+    def test_re_runs_change_nothing(self):
+        call_command('rollup_changes', keep_detail=True, stdout=io.StringIO())
+        call_command('rollup_changes', keep_detail=True, stdout=io.StringIO())
+        self.assertEqual(self.rollups(), self.expected)
+        self.assertEqual(InventoryChangeLog.objects.count(), 6)
+        call_command('rollup_changes', stdout=io.StringIO())
+        output = io.StringIO()
+        call_command('rollup_changes', stdout=output)
+        self.assertIn('Rolled up 0 change(s)', output.getvalue())
+        self.assertEqual(self.rollups(), self.expected)
+        self.assertEqual(InventoryChangeLog.objects.count(), 1)
+
+    def test_item_filter(self):
+        call_command('rollup_changes', keep_detail=True, stdout=io.StringIO())
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+        self.assertEqual(len(self.client.get(f'/api/changes/daily/?item={self.lamp.pk}').data['results']), 2)
+        self.assertEqual(len(self.client.get(f'/api/changes/?item={self.desk.pk}').data['results']), 2)
+        for url in (
+            '/api/changes/', '/api/changes/daily/', '/api/changes/analytics/', '/api/changes/export/', '/api/async/changes/',
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url + '?item=abc')
+                self.assertEqual(response.status_code, 400, response.content)
+                self.assertIn(b'A valid integer is required.', response.content)
+
+
+# Reorder thresholds (inventory/services.py sync_thresholds)
+# the summary's low stock count is the number of items below their own threshold,
+# through item writes, adjustments, deletes and category threshold changes
+class LowStockCountTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='keeper', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def low_stock(self):
+        summary = self.client.get('/api/inventory-levels/summary/').data
+        return summary['low_stock_count'], {row['category']: row['low_stock_count'] for row in summary['categories']}
+
+    def test_counts_follow_the_thresholds(self):
+        item = self.client.post('/api/items/', {'name': 'Drill', 'quantity': 8, 'price': '1.00', 'category': 'Tools', 'reorder_threshold': 10}).data
+        self.client.post('/api/items/', {'name': 'Saw', 'quantity': 6, 'price': '1.00', 'category': 'Tools'})
+        self.client.post('/api/items/', {'name': 'Tape', 'quantity': 2, 'price': '1.00', 'category': 'Office'})
+        self.assertEqual(self.low_stock(), (2, {'Office': 1, 'Tools': 1}))
+        threshold = self.client.post('/api/category-thresholds/', {'category': 'tools', 'threshold': 7}).data
+        self.assertEqual(self.low_stock(), (3, {'Office': 1, 'Tools': 2}))
+        self.client.post(f"/api/items/{item['id']}/adjust/", {'delta': 5})
+        self.client.patch(f"/api/items/{item['id']}/", {'category': 'Office'})
+        self.assertEqual(self.low_stock(), (2, {'Office': 1, 'Tools': 1}))
+        self.client.delete(f"/api/category-thresholds/{threshold['id']}/")
+        self.client.delete(f"/api/items/{InventoryItem.objects.get(name='Tape').pk}/")
+        self.assertEqual(self.low_stock(), (0, {'Office': 0, 'Tools': 0}))
+        call_command('rebuild_inventory_summary', verify=True, stdout=io.StringIO())
+
+    def test_delete_subtracts_the_current_row(self):
+        item = self.client.post('/api/items/', {'name': 'Rope', 'quantity': 10, 'price': '1.00'}).data
+        get_object = InventoryItemViewSet.get_object
+
+        def read_then_sell(view):
+            instance = get_object(view)
+            adjust_stock(self.user, [(item['id'], -7, None)])
+            return instance
+
+        with mock.patch.object(InventoryItemViewSet, 'get_object', read_then_sell):
+            self.assertEqual(self.client.delete(f"/api/items/{item['id']}/").status_code, 204)
+        summary = self.client.get('/api/inventory-levels/summary/').data
+        self.assertEqual((summary['sku_count'], summary['total_units'], summary['low_stock_count']), (0, 0, 0))
+
+    def test_admin_writes_keep_the_counters(self):
+        admin_client = self.client_class()
+        admin_client.force_login(User.objects.create_superuser(username='root', password='password123'))
+        form = {'name': 'Rope', 'description': '', 'quantity': 3, 'price': '2.00', 'category': 'tools '}
+        response = admin_client.post('/admin/inventory/inventoryitem/add/', {**form, 'owner': self.user.pk})
+        self.assertEqual(response.status_code, 302)
+        item = InventoryItem.objects.get(name='Rope')
+        self.assertEqual((item.category, item.below_threshold), ('tools', True))
+        admin_client.post(f'/admin/inventory/inventoryitem/{item.pk}/change/', {**form, 'quantity': 9})
+        admin_client.post('/admin/inventory/inventoryitem/add/', {**form, 'name': 'Tape', 'owner': self.user.pk})
+        self.assertEqual(self.low_stock(), (1, {'tools': 1}))
+        self.assertEqual(
+            list(item.changes.order_by('id').values_list('changed_by__username', 'old_quantity', 'new_quantity')),
+            [('root', 0, 3), ('root', 3, 9)],
+        )
+        call_command('rebuild_inventory_summary', verify=True, stdout=io.StringIO())
+        admin_client.post(f'/admin/inventory/inventoryitem/{item.pk}/delete/', {'post': 'yes'})
+        self.assertEqual(self.low_stock(), (1, {'tools': 1}))
+        admin_client.post('/admin/inventory/inventoryitem/', {
+            'action': 'delete_selected', '_selected_action': list(InventoryItem.objects.values_list('pk', flat=True)), 'post': 'yes',
+        })
+        self.assertFalse(InventoryItem.objects.exists())
+        self.assertEqual(self.low_stock(), (0, {}))
+        self.assertEqual(Category.objects.get(key='tools').item_count, 0)
+        call_command('rebuild_inventory_summary', verify=True, stdout=io.StringIO())
+
+
+# Streaming exports (/api/items/export/, /api/changes/export/, inventory/exports.py)
+# CSV and NDJSON carry the list endpoints' values; under ASGI the body is an async
+# iterator handed over chunk by chunk, not a sync one Django would read in one go
+class ExportTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='exporter', password='password123')
+        self.auth = 'Token ' + Token.objects.create(user=self.user).key
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+        for name, quantity, price in (('Pen, blue', 10, '1.50'), ('Ink', 2, '4.00'), ('Lamp', 0, '12.99')):
+            self.client.post('/api/items/', {'name': name, 'quantity': quantity, 'price': price, 'category': 'Office'})
+
+    def listed(self, url):
+        return sorted(self.client.get(url + '?page_size=100').json()['results'], key=lambda row: row['id'])
+
+    def test_csv_and_ndjson_content(self):
+        response = self.client.get('/api/items/export/?format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        header, rows = rows[0], sorted(rows[1:], key=lambda row: int(row[0]))
+        self.assertEqual(header, [name for name, _ in ITEM_COLUMNS])
+        self.assertEqual(rows, [
+            ['' if value is None else str(value) for value in row.values()]
+            for row in self.listed('/api/items/')
+        ])
+        self.assertEqual(rows[0][1], 'Pen, blue')
+
+        response = self.client.get('/api/changes/export/?format=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(sorted((json.loads(line) for line in lines), key=lambda row: row['id']), self.listed('/api/changes/'))
+
+    async def test_async_iterator_under_asgi(self):
+        response = await AsyncClient().get('/api/items/export/?format=ndjson', headers={'Authorization': self.auth})
+        self.assertTrue(response.is_async)
+        lines = b''.join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual([json.loads(line)['name'] for line in lines], ['Lamp', 'Ink', 'Pen, blue'])
+
+        # each chunk is fetched when it is sent, not the whole export up front
+        fetched = []
+        rows = exports._rows
+
+        def counted_rows(*args):
+            for row in rows(*args):
+                fetched.append(row)
+                yield row
+        queryset = InventoryItem.objects.filter(owner=self.user).order_by('id')
+        with mock.patch('inventory.exports._rows', counted_rows):
+            response = exports.streaming_export(
+                queryset, ITEM_COLUMNS, InventoryItemSerializer, 'csv', 'items', chunk_size=1, asynchronous=True,
+            )
+            chunks = response.streaming_content
+            first = await anext(chunks)
+            self.assertEqual(len(fetched), 1)
+            content = first + b''.join([chunk async for chunk in chunks])
+        self.assertEqual((len(fetched), len(content.decode().splitlines())), (3, 4))
+
+
+# Bulk import (POST /api/items/import/, inventory/importers.py)
+# rows upsert by name in file order; a file that isn't UTF-8 or valid CSV is refused
+# as a whole with the offending byte or line, before anything is written
+class ImportTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content, name='catalog.csv'):
+        return self.client.post('/api/items/import/', {'file': SimpleUploadedFile(name, content)}, format='multipart')
+
+    def test_creates_then_updates_by_name(self):
+        content = '\ufeffname,quantity,price,category\nPen,10,1.50,Office\nInk,2,4.00,Office\n'.encode()
+        response = self.upload(content)
+        self.assertEqual((response.status_code, response.data['created'], response.data['error_count']), (200, 2, 0))
+        response = self.upload(b'{"name": "Pen", "quantity": 3}\n{"name": "Ink", "quantity": -1}\n', 'catalog.ndjson')
+        self.assertEqual((response.data['updated'], response.data['errors'][0]['row']), (1, 2))
+        self.assertEqual(dict(InventoryItem.objects.values_list('name', 'quantity')), {'Pen': 3, 'Ink': 2})
+        self.assertEqual(self.client.get('/api/inventory-levels/summary/').data['sku_count'], 2)
+
+    def test_matches_are_read_in_the_write_transaction(self):
+        self.upload(b'name,quantity,price\nPen,10,1.50\n')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload(b'name,quantity,price\nPen,12,\nInk,2,4.00\n')
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        sql = [query['sql'] for query in queries.captured_queries]
+        match = next(i for i, query in enumerate(sql) if query.startswith('SELECT') and '"name" IN' in query)
+        # the innermost transaction open at the lookup is still open at the UPDATE
+        savepoint = next(query for query in reversed(sql[:match]) if query.startswith('SAVEPOINT')).split()[-1]
+        release = sql.index(f'RELEASE SAVEPOINT {savepoint}')
+        self.assertGreater(release, match)
+        self.assertTrue(any(query.startswith('UPDATE "inventory_inventoryitem"') for query in sql[match:release]))
+
+    def test_later_rows_for_a_name_apply_on_top(self):
+        # the second row has no price, the third is invalid: neither may drop the first
+        response = self.upload(b'name,quantity,price\nPen,10,1.50\nPen,12,\nPen,-1,2.00\n')
+        self.assertEqual((response.data['created'], response.data['error_count']), (1, 1))
+        item = InventoryItem.objects.get(name='Pen')
+        self.assertEqual((item.quantity, str(item.price)), (12, '1.50'))
+
+    def test_broken_files_are_refused(self):
+        response = self.upload('name,price\nCaf\u00e9,1\n'.encode('latin-1'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('byte 14', response.data['file'][0])
+        response = self.upload(b'name,price\nPen,1\n"' + b'x' * 200000 + b'",1\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Line 3', response.data['file'][0])
+        self.assertFalse(InventoryItem.objects.exists())
+
+
+# Stock movement analytics (/api/changes/analytics/)
+# buckets follow local days and Monday weeks (across DST changes too), the series
+# group by item or category and the rolling numbers come from the bucket sums
+class AnalyticsTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='analyst', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def sale(self, item, when, units=1):
+        InventoryChangeLog.objects.create(
+            item=item, changed_by=self.user, old_quantity=item.quantity + units, new_quantity=item.quantity,
+            change_type='sale', change_date=datetime.fromisoformat(when),
+        )
+
+    def analytics(self, query):
+        response = self.client.get('/api/changes/analytics/?' + query)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def buckets(self, data):
+        return {str(bucket['start']): bucket['sold'] for bucket in data['results'][0]['buckets']}
+
+    def test_weeks_start_on_monday(self):
+        item = InventoryItem.objects.create(owner=self.user, name='Mug', quantity=10, price=1)
+        self.sale(item, '2026-03-08T12:00:00+00:00')  # Sunday
+        self.sale(item, '2026-03-09T12:00:00+00:00', 2)  # Monday
+        data = self.analytics('bucket=week&since=2026-03-01&until=2026-03-15')
+        self.assertEqual(data['since'], date(2026, 2, 23))
+        self.assertEqual(self.buckets(data), {'2026-02-23': 0, '2026-03-02': 1, '2026-03-09': 2})
+
+    @override_settings(TIME_ZONE='Europe/Berlin')
+    def test_days_follow_local_midnight_across_dst(self):
+        item = InventoryItem.objects.create(owner=self.user, name='Mug', quantity=10, price=1)
+        # 2026-03-29 has 23 hours in Berlin, its local midnight is 22:00 UTC
+        self.sale(item, '2026-03-29T21:30:00+00:00')
+        self.sale(item, '2026-03-29T22:30:00+00:00', 2)
+        data = self.analytics('bucket=day&since=2026-03-29&until=2026-03-30')
+        self.assertEqual(self.buckets(data), {'2026-03-29': 1, '2026-03-30': 2})
+
+    def test_moving_average_and_category_series(self):
+        self.assertEqual(moving_average([1, 2, 3, 4], 2), [1, 1.5, 2.5, 3.5])
+        self.assertEqual(moving_average([4, 0], 7), [4, 2])
+        for name in ('Pen', 'Pencil'):
+            item = InventoryItem.objects.create(owner=self.user, name=name, quantity=5, price=1, category='Office')
+            self.sale(item, '2026-03-02T12:00:00+00:00', 3)
+        data = self.analytics('group=category&since=2026-03-01&until=2026-03-02&window=2')
+        row = data['results'][0]
+        self.assertEqual((row['category'], row['quantity'], row['sold'], row['sales']), ('Office', 10, 6, 2))
+        self.assertEqual([bucket['sold_avg'] for bucket in row['buckets']], [0, 3])
+
+    @override_settings(TIME_ZONE='Pacific/Honolulu')
+    def test_dates_out_of_range_are_refused(self):
+        for query, field in (
+            ('until=9999-12-31', 'until'),
+            ('since=0001-01-01&until=2026-01-01&bucket=week', 'since'),
+            ('until=0001-01-05', 'until'),
+            ('since=1899-12-31&until=1900-01-01', 'since'),
+        ):
+            with self.subTest(query=query):
+                response = self.client.get('/api/changes/analytics/?' + query)
+                self.assertEqual(response.status_code, 400, response.content)
+                self.assertIn(field, response.data)
+        # the edges themselves work, in a timezone behind UTC too
+        self.assertEqual(self.analytics('since=9999-12-01&until=9999-12-30&bucket=week')['since'], date(9999, 11, 29))
+        self.assertEqual(self.analytics('until=1900-01-03&bucket=week')['since'], date(1900, 1, 1))
+
+    def test_rolled_up_history_is_refused(self):
+        item = InventoryItem.objects.create(owner=self.user, name='Mug', quantity=10, price=1)
+        InventoryChangeRollup.objects.create(
+            owner=self.user, item=item, day=date(2026, 3, 4), opening_quantity=12, closing_quantity=10,
+            net_change=-2, change_count=1, sale_count=1,
+        )
+        response = self.client.get('/api/changes/analytics/?since=2026-03-04&until=2026-03-20')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('since=2026-03-05', str(response.data['since'][0]))
+        self.analytics('since=2026-03-05&until=2026-03-20')
+        # the first week bucket starts on Monday 2026-03-02
+        response = self.client.get('/api/changes/analytics/?bucket=week&since=2026-03-05&until=2026-03-20')
+        self.assertIn('since=2026-03-09', str(response.data['since'][0]))
+
+    def test_limits_and_far_stockout(self):
+        response = self.client.get('/api/changes/analytics/?since=2020-01-01&until=2026-01-01')
+        self.assertEqual(response.status_code, 400)
+        # one unit a week against a million: the stockout would be past the end of the calendar
+        item = InventoryItem.objects.create(owner=self.user, name='Bolt', quantity=1000000, price=1)
+        self.sale(item, '2026-03-02T12:00:00+00:00')
+        row = self.analytics('bucket=week&since=2026-03-02&until=2026-03-08&window=1')['results'][0]
+        self.assertIsNone(row['stockout_date'])
+        self.assertGreater(row['days_of_cover'], (date.max - date.today()).days)
+
+
+# Quantities as of a date (?as_of=, inventory/snapshots.py)
+# the same answers from the change log, from a checkpoint and, once rollup_changes
+# has pruned the detail rows, from the daily rollups
+class AsOfTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='historian', password='password123')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+        self.item = InventoryItem.objects.create(owner=self.user, name='Lamp', quantity=20, price=1)
+        InventoryItem.objects.filter(pk=self.item.pk).update(date_added=datetime.fromisoformat('2026-01-01T00:00:00+00:00'))
+        for when, old, new in (('2026-01-10T12:00:00+00:00', 0, 5), ('2026-01-20T12:00:00+00:00', 5, 20)):
+            InventoryChangeLog.objects.create(
+                item=self.item, changed_by=self.user, old_quantity=old, new_quantity=new,
+                change_type='restock', change_date=datetime.fromisoformat(when),
+            )
+
+    def quantities(self, *days):
+        result = []
+        for day in days:
+            response = self.client.get(f'/api/inventory-levels/{self.item.pk}/?as_of={day}')
+            self.assertEqual(response.status_code, 200, response.content)
+            result.append(response.data['quantity'])
+        # the async endpoint answers the same
+        response = self.client.get(f'/api/async/inventory-levels/?as_of={days[0]}')
+        self.assertEqual(response.json()['results'][0]['quantity'], result[0])
+        return result
+
+    def test_from_the_change_log_and_rollups(self):
+        self.assertEqual(self.quantities('2026-01-05', '2026-01-10', '2026-01-15', '2026-01-25'), [0, 5, 5, 20])
+        call_command('rollup_changes', stdout=io.StringIO())
+        self.assertFalse(InventoryChangeLog.objects.filter(item=self.item).exists())
+        self.assertEqual(self.quantities('2026-01-05', '2026-01-10', '2026-01-15', '2026-01-25'), [0, 5, 5, 20])
+
+    def test_rollups_newer_than_the_checkpoint(self):
+        build_checkpoint(self.user.pk, at=datetime.fromisoformat('2026-01-12T00:00:00+00:00'))
+        self.assertEqual(self.quantities('2026-01-15', '2026-01-25'), [5, 20])
+        call_command('rollup_changes', stdout=io.StringIO())
+        self.assertEqual(self.quantities('2026-01-15', '2026-01-25'), [5, 20])
+
+
+# Request profiling (INVENTORY_PROFILING=True, inventory/profiling.py)
+# the Server-Timing header carries every phase, the list fast path included; a
+# request repeating one SQL template is flagged and shows up in profile_report
+class ProfilingTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='profiler', password='password123')
+        self.client.force_authenticate(self.user)
+        items = InventoryItem.objects.bulk_create(
+            InventoryItem(owner=self.user, name=f'Item {i}', quantity=i, price=i) for i in range(100)
+        )
+        InventoryChangeLog.objects.bulk_create(
+            InventoryChangeLog(item=item, changed_by=self.user, old_quantity=0, new_quantity=item.quantity, change_type='restock')
+            for item in items[:10]
+        )
+
+    def timings(self, response):
+        phases = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, duration, *desc = entry.split(';')
+            phases[name] = (float(duration.removeprefix('dur=')), *desc)
+        return phases
+
+    def test_server_timing_and_n_plus_one(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                self.settings(INVENTORY_PROFILING=True, INVENTORY_PROFILE_DIR=directory), \
+                mock.patch('inventory.profiling.FLUSH_EVERY', 1):
+            response = self.client.get('/api/inventory-levels/?page_size=100')
+            phases = self.timings(response)
+            self.assertEqual(list(phases), ['db', 'serializer', 'render', 'total'])
+            self.assertEqual(phases['db'][1], 'desc="1 queries"')
+            # the fast path builds rows without a serializer, that is still the serializer phase
+            self.assertGreater(phases['serializer'][0], 0)
+            self.assertNotIn('X-Inventory-N-Plus-One', response)
+
+            # the change log list through the serializer, without its select_related: one user query per row
+            with mock.patch.object(InventoryChangeLogViewSet, 'list', mixins.ListModelMixin.list), \
+                    mock.patch.object(InventoryChangeLogSerializer, 'select_related_fields', ()):
+                response = self.client.get('/api/changes/?page_size=100')
+            self.assertEqual(len(response.data['results']), 10)
+            self.assertEqual(response['X-Inventory-N-Plus-One'], '10')
+            self.assertGreater(self.timings(response)['serializer'][0], 0)
+
+            output = io.StringIO()
+            call_command('profile_report', dir=directory, json=True, stdout=output)
+        report = json.loads(output.getvalue())
+        self.assertEqual(sorted(report), ['GET change-list', 'GET inventory-level-list'])
+        self.assertEqual(report['GET inventory-level-list']['n_plus_one_requests'], 0)
+        self.assertEqual(report['GET change-list']['n_plus_one_requests'], 1)
+        [(sql, count)] = report['GET change-list']['repeated_queries'].items()
+        self.assertIn('FROM "auth_user"', sql)
+        self.assertEqual(count, 10)
+
+
+# Benchmark harness
+# the seeded dataset must be consistent (counters, low stock flags) for the endpoint
+# numbers to mean anything, and --compare must flag slowdowns only
+class BenchmarkHarnessTests(APITestCase):
+
+    def test_seeded_dataset_is_consistent(self):
+        users = seed_dataset(2, 30, 2)
+        call_command('rebuild_inventory_summary', verify=True, stdout=io.StringIO())
+        self.assertEqual(InventoryItem.objects.filter(owner__in=users).count(), 60)
+        self.assertEqual(InventoryChangeLog.objects.filter(item__owner__in=users).count(), 120)
+        self.assertFalse(InventoryItem.objects.filter(owner__in=users, below_threshold=True, quantity__gte=5).exists())
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + users[0].auth_token.key)
+        self.assertEqual(self.client.get('/api/items/?low_stock=true').status_code, 200)
+
+    def test_compare_flags_slowdowns_only(self):
+        baseline = {'results': {'endpoints': {'items_list': {'p50_ms': 10.0, 'sql': {'median_ms': 1.0}}}}}
+        current = {'results': {'endpoints': {'items_list': {'p50_ms': 14.0, 'sql': {'median_ms': 0.5}}}}}
+        self.assertEqual(compare_results(baseline, current, 0.25), [('endpoints.items_list.p50_ms', 10.0, 14.0)])
+        self.assertEqual(compare_results(baseline, current, 0.5), [])
+
+
+# SQLite tuning applied to every new connection (inventory/database.py)
+@skipUnless(connection.vendor == 'sqlite', 'SQLite PRAGMAs')
+class SQLiteTuningTests(APITestCase):
+
+    def test_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 1)  # NORMAL
+            self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone()[0], 20000)
+            self.assertEqual(cursor.execute('PRAGMA cache_size').fetchone()[0], -32000)
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+# List fast path (inventory/rows.py)
+# list rows are built from values(), not the serializers; every list endpoint must
+# return exactly what the serializer returns for the same row, keys and order included
+class FastPathEquivalenceTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='equivalent', password='password123')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+        for payload in (
+            {'name': 'Lamp', 'description': 'Desk lamp', 'quantity': 3, 'price': '12.50', 'category': 'Lighting'},
+            {'name': 'Desk', 'quantity': 1, 'price': '99.99'},
+        ):
+            self.assertEqual(self.client.post('/api/items/', payload).status_code, 201)
+        self.lamp = InventoryItem.objects.get(name='Lamp')
+        self.client.patch(f'/api/items/{self.lamp.pk}/', {'reorder_threshold': 5})
+        # written outside the API (management commands, migrations): nobody to record
+        InventoryChangeLog.objects.create(
+            item=self.lamp, old_quantity=3, new_quantity=4, change_type='adjustment',
+            change_date=datetime.fromisoformat('2026-01-10T09:00:00+00:00'),
+        )
+        call_command('rollup_changes', '--keep-detail', stdout=io.StringIO())
+
+    def assertSameRows(self, list_url, detail_url=None, serialized=None):
+        rows = self.client.get(list_url).json()
+        rows = rows['results'] if isinstance(rows, dict) else rows
+        self.assertTrue(rows, list_url)
+        if serialized is None:
+            query = list_url.partition('?')[2]
+            serialized = [self.client.get(detail_url.format(row['id']) + ('?' + query if query else '')).json() for row in rows]
+        self.assertEqual([list(row.items()) for row in rows], [list(row.items()) for row in serialized], list_url)
+
+    def test_list_rows_match_the_serializer(self):
+        self.assertTrue(InventoryChangeLog.objects.filter(changed_by=None).exists())
+        for list_url, detail_url in (
+            ('/api/items/', '/api/items/{}/'),
+            ('/api/inventory-levels/', '/api/inventory-levels/{}/'),
+            (f'/api/inventory-levels/?as_of={date.today()}', '/api/inventory-levels/{}/'),
+            ('/api/changes/', '/api/changes/{}/'),
+            ('/api/changes/?expand=item', '/api/changes/{}/'),
+            ('/api/changes/?fields=id,changed_by', '/api/changes/{}/'),
+            ('/api/async/items/', '/api/items/{}/'),
+            ('/api/async/inventory-levels/', '/api/inventory-levels/{}/'),
+            ('/api/async/changes/', '/api/changes/{}/'),
+        ):
+            self.assertSameRows(list_url, detail_url)
+
+    def test_rollup_rows_match_the_serializer(self):
+        rollups = InventoryChangeRollup.objects.filter(owner=self.user).order_by('-day', '-id')
+        serialized = json.loads(JSONRenderer().render(InventoryChangeRollupSerializer(rollups, many=True).data))
+        self.assertSameRows('/api/changes/daily/', serialized=serialized)
 
-# Create your tests here.
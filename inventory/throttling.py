@@ -0,0 +1,79 @@
+import math
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+# Request throttling (REST_FRAMEWORK DEFAULT_THROTTLE_CLASSES)
+# DRF's rate throttles keep a list of request timestamps per client: every request
+# reads, trims and writes back a list as long as the rate allows (1200/min is 1200
+# floats pickled per call). These keep one float per client and scope instead, the
+# GCRA form of a token bucket: the time at which the client's bucket is full again.
+# A request adds 1/rate to it and is refused if that would put it more than one
+# period ahead, so a full period's worth of requests may come as a burst.
+#
+# Counters live in the INVENTORY_THROTTLE_CACHE cache alias; use a shared cache (Redis)
+# with several workers or each one counts on its own. The get and set aren't atomic,
+# concurrent requests of one client may slip a few over the rate.
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    cache_format = 'inventory:throttle:%(scope)s:%(ident)s'
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'INVENTORY_THROTTLE_CACHE', 'default')]
+
+    def get_rate(self):
+        # read per request, so rates follow settings changes; a scope without a rate isn't throttled
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        self.delay = None
+        if not getattr(settings, 'INVENTORY_THROTTLE', True) or self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        now = self.timer()
+        interval = self.duration / self.num_requests
+        full_at = max(self.cache.get(self.key, now), now) + interval
+        ahead = full_at - now - self.duration
+        if ahead > 0:
+            self.delay = ahead
+            return False
+        self.cache.set(self.key, full_at, math.ceil(full_at - now))
+        return True
+
+    def wait(self):
+        return self.delay
+
+
+class ScopedBucketThrottle(TokenBucketThrottle):
+    """
+    Token bucket per user (per client IP for anonymous requests) and scope.
+
+    The scope is the view's `throttle_scope` (auth for login/register, bulk for
+    imports, exports and batch writes), else read for GET/HEAD/OPTIONS and
+    write for everything else. The auth scope always counts per client IP.
+    """
+
+    def __init__(self):
+        # the rate depends on the view, see allow_request
+        pass
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        self.scope = scope or ('read' if request.method in SAFE_METHODS else 'write')
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        user = request.user
+        if self.scope != 'auth' and user and user.is_authenticated:
+            ident = user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -1,16 +1,24 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import InventoryItemViewSet, InventoryChangeLogViewSet, UserViewSet, LoginView, LogoutView, UserRegisterView, InventoryLevelViewSet
+from . import async_views
+from .views import InventoryItemViewSet, InventoryChangeLogViewSet, UserViewSet, LoginView, LogoutView, UserRegisterView, InventoryLevelViewSet, CategoryThresholdViewSet, CategoryViewSet, InventoryChangeRollupViewSet
 
 
 router = DefaultRouter()
 router.register(r'items', InventoryItemViewSet, basename='item')
+# before 'changes', or changes/<pk>/ would match 'daily'
+router.register(r'changes/daily', InventoryChangeRollupViewSet, basename='change-rollup')
 router.register(r'changes', InventoryChangeLogViewSet, basename='change')
 router.register(r'users', UserViewSet, basename='user')
 router.register(r'inventory-levels', InventoryLevelViewSet, basename='inventory-level')
+router.register(r'category-thresholds', CategoryThresholdViewSet, basename='category-threshold')
+router.register(r'categories', CategoryViewSet, basename='category')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('async/', include(async_views.urlpatterns)),
+    path('alerts/', async_views.alert_feed, name='alert-feed'),
+    path('events/', async_views.event_stream, name='event-stream'),
     path('login/', LoginView.as_view(), name='login'),
     path("logout/", LogoutView.as_view(), name="logout"),
     path('register/', UserRegisterView.as_view(), name='user-register'),
@@ -1,15 +1,42 @@
-from rest_framework import viewsets, permissions, status, generics
+from rest_framework import viewsets, mixins, permissions, status, generics
 from rest_framework.response import Response
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser, FormParser
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import OrderingFilter, SearchFilter
-from .models import InventoryItem, InventoryChangeLog
-from .serializers import InventoryItemSerializer, InventoryChangeLogSerializer, UserSerializer, UserRegisterSerializer
+from rest_framework.filters import OrderingFilter
+from .models import (
+    Category, InventoryItem, InventoryChangeLog, InventoryChangeRollup, InventorySummary, CategoryThreshold,
+)
+from .serializers import (
+    InventoryItemSerializer, InventoryItemBulkSerializer, StockAdjustmentSerializer, StockAdjustmentBatchSerializer,
+    InventoryChangeLogSerializer, InventoryChangeRollupSerializer, InventorySummarySerializer, CategoryThresholdSerializer,
+    CategorySerializer, UserSerializer, UserRegisterSerializer
+)
+from .services import (
+    adjust_stock, apply_bulk, change_type_for, item_state, record_item_writes, refresh_category_thresholds
+)
+from django.db import transaction
+from django.db.models import Subquery
+from django.utils.dateparse import parse_date
 from .permissions import IsOwner
 from .filters import InventoryItemFilter
+from .pagination import InventoryItemPagination, InventoryChangeLogPagination, InventoryChangeRollupPagination
+from .search import InventorySearchFilter
+from .snapshots import items_as_of, parse_as_of
+from .renderers import CSVRenderer, NDJSONRenderer
+from .exports import export_items, export_changes
+from .analytics import movement_analytics
+from .importers import check_upload, detect_format, import_items, iter_rows, text_stream
+from .cache import CachedResponseMixin
+from .categories import canonical_category, categorize, subtree_counts
+from .rows import (
+    SparseFieldsMixin, ValuesListMixin, ITEM_COLUMNS, AS_OF_ITEM_COLUMNS, CHANGE_COLUMNS, CHANGE_ITEM_COLUMNS,
+    ROLLUP_COLUMNS,
+)
 from django.contrib.auth import get_user_model
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, ValidationError
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 
@@ -31,56 +58,209 @@ User = get_user_model()
 # Inventory Item Management
 # handles CRUD operations for inventory items
 # only authenticated users can access, and users see only their own items
-class InventoryItemViewSet(viewsets.ModelViewSet):
+class InventoryItemViewSet(CachedResponseMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = InventoryItem.objects.all()
     serializer_class = InventoryItemSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner] # Ensure users can only access their items
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    pagination_class = InventoryItemPagination
+    filter_backends = [DjangoFilterBackend, OrderingFilter, InventorySearchFilter]
     filterset_class = InventoryItemFilter
     ordering_fields = ['name', 'quantity', 'price', 'last_updated']
     search_fields = ['name', 'description', 'category']
+    # rate limit scope (inventory/throttling.py), the bulk actions set theirs
+    throttle_scope = None
 
     def get_queryset(self):
         # only displays items owned by the current user.
-        return InventoryItem.objects.filter(owner=self.request.user)
+        return self.get_serializer_class().setup_eager_loading(InventoryItem.objects.filter(owner=self.request.user))
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'list' or self.get_requested_fields()[0] is None:
+            return queryset
+        # ?fields= / ?omit=: load only the kept columns (and the cursor's)
+        lookups = [lookup for _, lookup in self.sparse_columns(ITEM_COLUMNS)]
+        if 'owner__username' not in lookups:
+            queryset = queryset.select_related(None)
+        return queryset.only(*lookups, *self.get_key_lookups(queryset))
+
+    # upper bound on create + update + delete rows in one bulk request
+    bulk_max_rows = 1000
 
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
-        item = serializer.save(owner=self.request.user)
-        InventoryChangeLog.objects.create(
-            item=item,
-            changed_by=self.request.user,
-            old_quantity=0,
-            new_quantity=item.quantity,
-            change_type="restock"
-        )
+        with transaction.atomic():
+            categorize(self.request.user.pk, [serializer.validated_data])
+            item = serializer.save(owner=self.request.user)
+            record_item_writes(
+                self.request.user, [(None, item_state(item))], [(item, 0, item.quantity, "restock")], items=[item]
+            )
 
     def perform_update(self, serializer):
-        old_item = self.get_object()
-        old_qty = old_item.quantity
         if serializer.validated_data.get("quantity", None) is not None and serializer.validated_data["quantity"] < 0:
-            from rest_framework.exceptions import ValidationError
             raise ValidationError({"quantity": "Quantity cannot be negative"})
-        
-        # save update
-        item = serializer.save()
-        
-        # define change
-        if item.quantity > old_qty:
-            change_type = "restock"
-        elif item.quantity < old_qty:
-            change_type = "sale"
-        else:
-            change_type = "adjustment"
-        
-        # Save change
-        InventoryChangeLog.objects.create(
-            item=item,
-            changed_by=self.request.user,
-            old_quantity=old_qty,
-            new_quantity=item.quantity,
-            change_type=change_type
+
+        with transaction.atomic():
+            # re-read the item under a row lock and apply the request to that: the instance
+            # get_object() loaded may predate a concurrent stock movement, saving it would undo it
+            instance = self.locked_object(serializer.instance.pk)
+            before = item_state(instance)
+            old_qty = instance.quantity
+            serializer.instance = instance
+
+            # save update
+            categorize(self.request.user.pk, [serializer.validated_data])
+            item = serializer.save()
+
+            # Save change
+            record_item_writes(
+                self.request.user, [(before, item_state(item))],
+                [(item, old_qty, item.quantity, change_type_for(old_qty, item.quantity))], items=[item]
+            )
+
+    def locked_object(self, pk):
+        # the owner's item, locked until the transaction ends
+        try:
+            instance = InventoryItem.objects.select_for_update().get(pk=pk, owner=self.request.user)
+        except InventoryItem.DoesNotExist:
+            raise NotFound(detail="Item not found.")
+        instance.owner = self.request.user
+        return instance
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # the counters subtract what is stored now, not what get_object() read
+            instance = self.locked_object(instance.pk)
+            before = item_state(instance)
+            # delete() clears the pk on the instance
+            pk = instance.pk
+            instance.delete()
+            record_item_writes(self.request.user, [(before, None)], [], deleted=[pk])
+
+    # Streaming export
+    # the whole filtered inventory as CSV or NDJSON (?format=csv|ndjson), honours the list filters
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer], throttle_scope='bulk')
+    def export(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_items(queryset, request.accepted_renderer.format, asynchronous=hasattr(request, 'scope'))
+
+    # Bulk import
+    # multipart upload of a CSV or NDJSON file ("file"), rows are upserted by name;
+    # dry_run=true validates everything and reports without writing
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser],
+            throttle_scope='bulk')
+    def import_file(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"file": ["No file was submitted."]}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = detect_format(upload.name, request.data.get('file_format'))
+        if file_format not in ('csv', 'ndjson'):
+            return Response({"file_format": ["Expected csv or ndjson."]}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = str(request.data.get('dry_run', request.query_params.get('dry_run', ''))).lower() in ('1', 'true', 'yes')
+
+        check_upload(upload, file_format)
+        result = import_items(request.user, iter_rows(text_stream(upload), file_format), dry_run=dry_run)
+        return Response(result.as_dict(), status=status.HTTP_200_OK)
+
+    # Stock movement for one item
+    # applies a signed delta in the database instead of saving an absolute quantity
+    @action(detail=True, methods=['post'])
+    def adjust(self, request, pk=None):
+        serializer = StockAdjustmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            item_id = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(detail="Item not found.")
+        items = adjust_stock(request.user, [
+            (item_id, serializer.validated_data['delta'], serializer.validated_data.get('change_type'))
+        ])
+        items[0].owner = request.user
+        return Response(self.get_serializer(items[0]).data, status=status.HTTP_200_OK)
+
+    # Stock movement for several items in one transaction
+    @action(detail=False, methods=['post'], url_path='adjust', throttle_scope='bulk')
+    def adjust_many(self, request):
+        serializer = StockAdjustmentBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        adjustments = serializer.validated_data['adjustments']
+        if len(adjustments) > self.bulk_max_rows:
+            return Response(
+                {"error": f"A bulk request can contain at most {self.bulk_max_rows} rows."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        items = adjust_stock(request.user, [
+            (row['item'], row['delta'], row.get('change_type')) for row in adjustments
+        ])
+        for item in items:
+            item.owner = request.user
+        return Response({"items": self.get_serializer(items, many=True).data}, status=status.HTTP_200_OK)
+
+    # Bulk create/update/delete
+    # validates every row first, then applies the whole batch in one transaction
+    # with a constant number of queries; nothing is written if any row fails
+    @action(detail=False, methods=['post'], url_path='bulk', throttle_scope='bulk')
+    def bulk(self, request):
+        envelope = InventoryItemBulkSerializer(data=request.data)
+        envelope.is_valid(raise_exception=True)
+        creates = envelope.validated_data['create']
+        updates = envelope.validated_data['update']
+        deletes = envelope.validated_data['delete']
+
+        if len(creates) + len(updates) + len(deletes) > self.bulk_max_rows:
+            return Response(
+                {"error": f"A bulk request can contain at most {self.bulk_max_rows} rows."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        errors = []
+        valid_creates = []
+        for index, row in enumerate(creates):
+            serializer = self.get_serializer(data=row)
+            if serializer.is_valid():
+                valid_creates.append(serializer.validated_data)
+            else:
+                errors.append({"operation": "create", "index": index, "errors": serializer.errors})
+
+        # fetch every item touched by the batch in one query
+        ids = [row.get('id') for row in updates] + deletes
+        existing = InventoryItem.objects.filter(owner=request.user, pk__in=[i for i in ids if isinstance(i, int)]).in_bulk()
+        for item in existing.values():
+            item.owner = request.user  # avoid one owner lookup per row when serializing
+
+        valid_updates = []
+        seen = set()
+        for index, row in enumerate(updates):
+            item_id = row.get('id')
+            item = existing.get(item_id)
+            if item is None:
+                errors.append({"operation": "update", "index": index, "id": item_id, "errors": {"id": ["Item not found."]}})
+                continue
+            if item_id in seen or item_id in deletes:
+                errors.append({"operation": "update", "index": index, "id": item_id, "errors": {"id": ["Item appears more than once in this batch."]}})
+                continue
+            seen.add(item_id)
+            data = {key: value for key, value in row.items() if key != 'id'}
+            serializer = self.get_serializer(item, data=data, partial=True)
+            if serializer.is_valid():
+                valid_updates.append((item, serializer.validated_data))
+            else:
+                errors.append({"operation": "update", "index": index, "id": item_id, "errors": serializer.errors})
+
+        for index, item_id in enumerate(deletes):
+            if item_id not in existing:
+                errors.append({"operation": "delete", "index": index, "id": item_id, "errors": {"id": ["Item not found."]}})
+
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        created, updated, deleted = apply_bulk(
+            request.user, valid_creates, valid_updates, [existing[item_id] for item_id in dict.fromkeys(deletes)]
         )
+        return Response({
+            "created": self.get_serializer(created, many=True).data,
+            "updated": self.get_serializer(updated, many=True).data,
+            "deleted": deleted,
+        }, status=status.HTTP_200_OK)
 
     # PermissionDenied when user tries modeify or delete item not owned  
     def get_object(self):
@@ -88,23 +268,146 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
             obj = InventoryItem.objects.get(pk=self.kwargs["pk"], owner=self.request.user)
         except InventoryItem.DoesNotExist:
             raise NotFound(detail="Item not found.")
+        # the owner is the requesting user, no need to load it again for the serializer
+        obj.owner = self.request.user
         return obj
 
+def item_param(request):
+    # ?item=<id> on the change log endpoints (list, export, analytics, daily rollups)
+    item_id = request.query_params.get("item")
+    if not item_id:
+        return None
+    try:
+        return int(item_id)
+    except ValueError:
+        raise ValidationError({"item": ["A valid integer is required."]})
+
 # Inventory Change Log
 # read-only view of all inventory changes, for auditing purposes
 # accessible only by authenticated users
-class InventoryChangeLogViewSet(viewsets.ReadOnlyModelViewSet):
+class InventoryChangeLogViewSet(CachedResponseMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = InventoryChangeLogSerializer
+    # list rows are built from values() (see rows.py), same output as the serializer
+    list_columns = CHANGE_COLUMNS
+    cached_actions = ('list', 'retrieve', 'analytics')
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = InventoryChangeLogPagination
+    throttle_scope = None
+    # ?expand=item: the item's id, name and category instead of its id
+    expanded_columns = {'item': CHANGE_ITEM_COLUMNS}
 
     def get_queryset(self):
         queryset = InventoryChangeLog.objects.all()
         # allow filtering by item
-        item_id = self.request.query_params.get("item")
-        if item_id:
+        item_id = item_param(self.request)
+        if item_id is not None:
             queryset = queryset.filter(item__id=item_id)
         # show only changes related to items owned by the current user
-        return queryset.filter(item__owner=self.request.user)
+        queryset = self.get_serializer_class().setup_eager_loading(queryset.filter(item__owner=self.request.user))
+        if self.action == 'retrieve' and 'item' in self.get_requested_fields()[1]:
+            queryset = queryset.select_related('item')
+        if self.action == 'list':
+            # lets the last page link on to the daily rollups (see InventoryChangeLogPagination)
+            rollups = InventoryChangeRollup.objects.filter(owner=self.request.user)
+            if item_id is not None:
+                rollups = rollups.filter(item_id=item_id)
+            queryset = queryset.annotate(oldest_rollup_day=Subquery(rollups.order_by('day').values('day')[:1]))
+        return queryset
+
+    # Streaming export of the change history (?format=csv|ndjson), honours ?item=
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer], throttle_scope='bulk')
+    def export(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_changes(queryset, request.accepted_renderer.format, asynchronous=hasattr(request, 'scope'))
+
+    # Stock movement analytics (see analytics.py), honours ?item=
+    # ?bucket=day|week &group=item|category &category= &since= &until= &window= &limit=
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        return self.cached_response(
+            request, lambda request: Response(movement_analytics(request.user, self.get_queryset(), request.query_params))
+        )
+
+# Daily change log rollups
+# history older than the retention window, one row per item and day
+# (python manage.py rollup_changes); ?item= and ?before=<YYYY-MM-DD> filter it
+class InventoryChangeRollupViewSet(CachedResponseMixin, ValuesListMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    serializer_class = InventoryChangeRollupSerializer
+    list_columns = ROLLUP_COLUMNS
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = InventoryChangeRollupPagination
+
+    def get_queryset(self):
+        queryset = InventoryChangeRollup.objects.filter(owner=self.request.user)
+        item_id = item_param(self.request)
+        if item_id is not None:
+            queryset = queryset.filter(item_id=item_id)
+        before = self.request.query_params.get("before")
+        if before:
+            try:
+                day = parse_date(before)
+            except ValueError:
+                day = None
+            if day is None:
+                raise ValidationError({"before": ["Use the YYYY-MM-DD format."]})
+            queryset = queryset.filter(day__lt=day)
+        return queryset
+
+# Category reorder thresholds
+# inherited by the items of the category that don't set their own reorder_threshold;
+# every change re-evaluates those items (and raises alerts for the ones that cross)
+class CategoryThresholdViewSet(viewsets.ModelViewSet):
+    serializer_class = CategoryThresholdSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return CategoryThreshold.objects.filter(owner=self.request.user)
+
+    def check_unique(self, category, instance=None):
+        existing = CategoryThreshold.objects.filter(owner=self.request.user, category=category)
+        if instance is not None:
+            existing = existing.exclude(pk=instance.pk)
+        if existing.exists():
+            raise ValidationError({"category": ["This category already has a threshold."]})
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            # stored under the category's full name, like the items' category
+            category = canonical_category(self.request.user.pk, serializer.validated_data.get("category", ""))
+            self.check_unique(category)
+            serializer.save(owner=self.request.user, category=category)
+            refresh_category_thresholds(self.request.user, [category])
+
+    def perform_update(self, serializer):
+        old_category = serializer.instance.category
+        with transaction.atomic():
+            category = canonical_category(self.request.user.pk, serializer.validated_data.get("category", old_category))
+            self.check_unique(category, serializer.instance)
+            serializer.save(category=category)
+            refresh_category_thresholds(self.request.user, [old_category, category])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            refresh_category_thresholds(self.request.user, [instance.category])
+
+# Item categories (read-only)
+# created from the category strings items are written with; the whole tree in path
+# order, with the stored per-category item counts and their subtree totals
+class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = CategorySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    # one owner's categories, served whole so that each one's subtree is on the page
+    pagination_class = None
+
+    def get_queryset(self):
+        return Category.objects.filter(owner=self.request.user)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if getattr(self.request, 'user', None) is not None and self.request.user.is_authenticated:
+            context['subtree_counts'] = subtree_counts(self.request.user.pk)
+        return context
 
 # Users
 class UserViewSet(viewsets.ModelViewSet):
@@ -117,6 +420,8 @@ class UserViewSet(viewsets.ModelViewSet):
 # handles user authentication and returns a token for API access
 class LoginView(APIView):
     permission_classes = [permissions.AllowAny]
+    # per client IP, against password guessing
+    throttle_scope = 'auth'
 
     def post(self, request):
         username = request.data.get('username')
@@ -146,17 +451,54 @@ class LogoutView(APIView):
 class UserRegisterView(generics.CreateAPIView):
     serializer_class = UserRegisterSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'auth'
 
 
-class InventoryLevelViewSet(viewsets.ReadOnlyModelViewSet):
+class InventoryLevelViewSet(CachedResponseMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
 
     # List-only endpoint that returns the current user's inventory items (with quantities).    
     serializer_class = InventoryItemSerializer
+    # list rows are built from values() (see rows.py), same output as the serializer
+    list_columns = ITEM_COLUMNS
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    pagination_class = InventoryItemPagination
+    filter_backends = [DjangoFilterBackend, OrderingFilter, InventorySearchFilter]
     filterset_class = InventoryItemFilter
     search_fields = ['name', 'description', 'category']
     ordering_fields = ['price', 'quantity', 'last_updated']
 
     def get_queryset(self):
-        return InventoryItem.objects.filter(owner=self.request.user).order_by('-last_updated')
\ No newline at end of file
+        queryset = InventoryItem.objects.filter(owner=self.request.user).order_by('-last_updated')
+        as_of = self.get_as_of()
+        if as_of is not None:
+            queryset = items_as_of(queryset, self.request.user.pk, as_of)
+        return self.get_serializer_class().setup_eager_loading(queryset)
+
+    # ?as_of=<timestamp or date>: quantities at that time, from the nearest checkpoint
+    # plus the change log after it (inventory/snapshots.py); other fields are current
+    def get_as_of(self):
+        value = self.request.query_params.get('as_of')
+        if not value or self.action not in ('list', 'retrieve'):
+            return None
+        as_of = parse_as_of(value)
+        if as_of is None:
+            raise ValidationError({"as_of": ["Use an ISO 8601 timestamp or a YYYY-MM-DD date."]})
+        if 'quantity' in self.request.query_params.get('ordering', ''):
+            raise ValidationError({"ordering": ["Ordering by quantity is not supported with as_of."]})
+        return as_of
+
+    def get_list_columns(self):
+        return AS_OF_ITEM_COLUMNS if self.get_as_of() is not None else self.list_columns
+
+    def get_object(self):
+        obj = super().get_object()
+        if hasattr(obj, 'quantity_as_of'):
+            obj.quantity = obj.quantity_as_of
+        return obj
+
+    # Inventory summary
+    # totals and per-category breakdown read from the precomputed counters (no aggregation)
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        summary = InventorySummary.objects.filter(owner=request.user).first() or InventorySummary(owner=request.user)
+        return Response(InventorySummarySerializer(summary).data)
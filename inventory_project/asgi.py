@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# after setup, needs the app registry
+from inventory.async_views import websocket_events  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # Django serves HTTP; WebSocket connections go to the change event stream
+    if scope['type'] == 'websocket':
+        await websocket_events(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -100,27 +100,54 @@ async function loadItems() {
 
   const items = data.results || data;
 
-  items.forEach(item => {
-    const row = document.createElement("tr");
-    row.innerHTML = `
-      <td>${item.name}</td>
-      <td>${item.description}</td>
-      <td>${item.quantity}</td>
-      <td>${item.price}</td>
-      <td>${item.category}</td>
-      <td>
-        <button onclick="editItem(${item.id})">Edit</button>
-        <button onclick="deleteItem(${item.id})">Delete</button>
-        <button onclick="viewHistory(${item.id})">History</button>
-      </td>
+  items.forEach(renderItem);
+}
+
+// add the item's row, or replace it when it is already shown
+function renderItem(item) {
+  const tableBody = document.querySelector("#items-table tbody");
+  if (!tableBody) return;
+  const row = document.createElement("tr");
+  row.dataset.id = item.id;
+  row.innerHTML = `
+    <td>${item.name}</td>
+    <td>${item.description}</td>
+    <td>${item.quantity}</td>
+    <td>${item.price}</td>
+    <td>${item.category}</td>
+    <td>
+      <button onclick="editItem(${item.id})">Edit</button>
+      <button onclick="deleteItem(${item.id})">Delete</button>
+      <button onclick="viewHistory(${item.id})">History</button>
+    </td>
+  `;
+  const existing = tableBody.querySelector(`tr[data-id="${item.id}"]`);
+  if (existing) existing.replaceWith(row);
+  else tableBody.appendChild(row);
+}
+
+
+async function loadSummary() {
+  const summaryDiv = document.getElementById("summary");
+  if (!summaryDiv) return;
+
+  const res = await fetch(`${API_URL}/inventory-levels/summary/`, {
+    headers: { "Authorization": `Token ${getToken()}` }
+  });
+  const summary = await res.json();
+  summaryDiv.innerHTML = `
+    <p>Items: ${summary.sku_count} | Units: ${summary.total_units} | Stock value: ${summary.stock_value} | Low stock: ${summary.low_stock_count}</p>
+  `;
+  summary.categories.forEach(category => {
+    summaryDiv.innerHTML += `
+      <p>${category.category || "Uncategorized"}: ${category.sku_count} items, ${category.total_units} units, ${category.stock_value}</p>
     `;
-    tableBody.appendChild(row);
   });
 }
 
-
 // Load items on dashboard
 if (document.querySelector("#items-table")) loadItems();
+if (document.querySelector("#summary")) loadSummary();
 
 // ------------------ CRUD ------------------
 const itemForm = document.getElementById("item-form");
@@ -150,6 +177,7 @@ if (itemForm) {
       document.getElementById("item-id").value = "";
       itemForm.reset();
       loadItems();
+      loadSummary();
     } else {
       alert("Error: " + JSON.stringify(await res.json()));
     }
@@ -178,19 +206,93 @@ async function deleteItem(id) {
       }
   });
   loadItems();
+  loadSummary();
 }
 
 // ------------------ History ------------------
+let historyItemId = null;
+
 async function viewHistory(itemId) {
   const res = await fetch(`${API_URL}/changes/?item=${itemId}`, {
     headers: { "Authorization": `Token ${getToken()}` }
   });
   const data = await res.json();
   const historyDiv = document.getElementById("history");
+  historyItemId = itemId;
   historyDiv.innerHTML = `<h3>History for item ${itemId}</h3>`;
   data.results.forEach(change => {
-    historyDiv.innerHTML += `
+    historyDiv.innerHTML += historyEntry(change);
+  });
+}
+
+function historyEntry(change) {
+  return `
       <p>${change.change_date}: ${change.change_type} | Old: ${change.old_quantity} | New: ${change.new_quantity}</p>
     `;
+}
+
+// ------------------ Live updates ------------------
+// Server-Sent Events from /api/events/ instead of re-fetching on a timer. EventSource
+// can't send the Token header, so the stream is read with fetch; on reconnect the
+// last event id is sent back and the server replays what was missed (or says reload).
+let lastEventId = null;
+let summaryTimer = null;
+
+function refreshSummary() {
+  // one summary fetch per burst of events
+  clearTimeout(summaryTimer);
+  summaryTimer = setTimeout(loadSummary, 500);
+}
+
+function handleEvent(block) {
+  const fields = {};
+  block.split("\n").forEach(line => {
+    const separator = line.indexOf(": ");
+    if (separator > 0) fields[line.slice(0, separator)] = line.slice(separator + 2);
   });
-}
\ No newline at end of file
+  // retry hints and keep-alive comments carry no event
+  if (!fields.event) return;
+  lastEventId = fields.id;
+  const data = JSON.parse(fields.data);
+  if (fields.event === "item") {
+    renderItem(data);
+  } else if (fields.event === "item_deleted") {
+    const row = document.querySelector(`#items-table tr[data-id="${data.id}"]`);
+    if (row) row.remove();
+  } else if (fields.event === "change" && data.item === historyItemId) {
+    const header = document.querySelector("#history h3");
+    if (header) header.insertAdjacentHTML("afterend", historyEntry(data));
+  } else if (fields.event === "reload") {
+    loadItems();
+    if (historyItemId !== null) viewHistory(historyItemId);
+  }
+  refreshSummary();
+}
+
+async function streamEvents() {
+  while (getToken()) {
+    try {
+      const headers = { "Authorization": `Token ${getToken()}` };
+      if (lastEventId) headers["Last-Event-ID"] = lastEventId;
+      const res = await fetch(`${API_URL}/events/`, { headers });
+      if (res.status === 401) return;
+      const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+      let buffer = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += value;
+        let end;
+        while ((end = buffer.indexOf("\n\n")) >= 0) {
+          handleEvent(buffer.slice(0, end));
+          buffer = buffer.slice(end + 2);
+        }
+      }
+    } catch (error) {
+      console.log("Event stream interrupted:", error);
+    }
+    await new Promise(resolve => setTimeout(resolve, 3000));
+  }
+}
+
+if (document.querySelector("#items-table")) streamEvents();
\ No newline at end of file